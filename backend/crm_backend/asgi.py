@@ -3,6 +3,9 @@ ASGI config for crm_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Los eventos en vivo (/api/events/, Server-Sent Events) solo se sirven por ASGI, p. ej.:
+    uvicorn crm_backend.asgi:application --host 0.0.0.0 --port 8001
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -2,6 +2,9 @@
 
 from leads.signals import set_current_user # Importa la función para establecer el usuario actual
 from django.utils.deprecation import MiddlewareMixin # Clase base para middlewares
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+from leads import monitoring, perf, profiling, replica
 
 # Middleware para capturar el usuario autenticado y pasarlo a las señales
 class CurrentUserMiddleware(MiddlewareMixin):
@@ -16,4 +19,123 @@ class CurrentUserMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
         # Es importante limpiar el usuario actual después de procesar la peticion
         set_current_user(None)
-        return response
\ No newline at end of file
+        return response
+
+# Middleware de instrumentación: consultas, tiempo en base de datos, serialización y latencia
+# de cada petición, agregados por ruta en /api/_perf/ (ver leads/perf.py). Admite vistas
+# síncronas y asíncronas sin cambiar de hilo: la medición viaja en una contextvar.
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = perf.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.end_request(token)
+        self.finish(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = perf.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.end_request(token)
+        self.finish(request, response, stats)
+        return response
+
+    def finish(self, request, response, stats):
+        total_ms = perf.finish_request(request, response, stats)
+        # Las mismas mediciones, en formato Prometheus (/metrics)
+        monitoring.observe_request(
+            perf.view_name(request), request.method, response.status_code,
+            total_ms / 1000, stats.queries, stats.db_seconds,
+        )
+
+# Lectura de lo propio con réplica (ver leads/replica.py): si la petición escribió, el usuario
+# lee del primario durante REPLICA_STICKY_SECONDS. Sin réplica configurada no se instala.
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica.is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replica.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = replica.end_request(token)
+        self.finish(request, wrote)
+        return response
+
+    async def __acall__(self, request):
+        token = replica.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = replica.end_request(token)
+        if wrote:
+            # La marca va a la caché, que puede ser la base de datos: solo entonces cambia de hilo
+            await sync_to_async(self.finish)(request, wrote)
+        return response
+
+    def finish(self, request, wrote):
+        user = getattr(request, 'user', None)
+        if wrote and user is not None and user.is_authenticated:
+            replica.mark_sticky(user.pk)
+
+# Perfilado bajo demanda (ver leads/profiling.py): ejecuta la vista bajo cProfile cuando la
+# petición lo pide con PROFILING_TOKEN o cae en el muestreo. Va el último para que los demás
+# middlewares (CSRF, usuario actual) hayan hecho ya su process_view. En modo async,
+# process_view es una corrutina: sin perfilado no cambia de hilo.
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        motivo = profiling.should_profile(request)
+        if motivo is None:
+            return None
+        return profiling.profile_view(request, motivo, view_func, view_args, view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        motivo = profiling.should_profile(request)
+        if motivo is None:
+            return None
+        if iscoroutinefunction(view_func):
+            return await profiling.aprofile_view(request, motivo, view_func, view_args, view_kwargs)
+        # Mismo hilo en el que Django ejecutaría la vista síncrona
+        return await sync_to_async(profiling.profile_view, thread_sensitive=True)(
+            request, motivo, view_func, view_args, view_kwargs,
+        )
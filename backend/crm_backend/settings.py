@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta # Añadir esta importación
 import os
+import importlib.util
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Índices específicos de PostgreSQL (OpClass)
     'corsheaders',              # Para manejar las politicas CORS
     'rest_framework',           # Django REST Framework
     'leads',                    # Tu aplicacion de leads
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'crm_backend.middleware.PerformanceMiddleware', # Primero: mide la petición completa (ver /api/_perf/)
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Debe ir lo mas alto posible, despues de SecurityMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,6 +59,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'crm_backend.middleware.CurrentUserMiddleware', # Tu middleware personalizado para el usuario actual
+    'crm_backend.middleware.ReplicaMiddleware', # Lectura de lo propio con réplica (solo si hay alias 'replica')
+    'crm_backend.middleware.ProfilingMiddleware', # Último: perfila solo la vista (ver /api/_profiles/)
 ]
 
 ROOT_URLCONF = 'crm_backend.urls'
@@ -96,6 +101,67 @@ DATABASES = {
     }
 }
 
+# Pool de conexiones (psycopg_pool, ver /metrics en leads/monitoring.py): cada proceso mantiene
+# entre DATABASE_POOL_MIN_SIZE y DATABASE_POOL_MAX_SIZE conexiones por alias. Las peticiones,
+# los hilos de sync_to_async y los del executor de métricas toman una al consultar y la
+# devuelven al terminar (request_finished); si no hay ninguna libre esperan hasta
+# DATABASE_POOL_TIMEOUT segundos y después fallan. Se cierran las que pasan DATABASE_POOL_MAX_IDLE
+# segundos sin usarse (por encima del mínimo) y las que cumplen DATABASE_POOL_MAX_LIFETIME.
+# El máximo por proceso debe cubrir METRICS_PARALLEL_WORKERS, y procesos x máximo (x2 con
+# réplica) debe caber en max_connections del servidor.
+# Con DATABASE_POOL_MAX_SIZE=0, o sin psycopg_pool, cada hilo conserva su conexión
+# DATABASE_CONN_MAX_AGE segundos (0 = una por petición). Solo conviene con WSGI y en los
+# comandos: bajo ASGI cada hilo del executor guardaría la suya.
+# En los dos casos se comprueba la conexión antes de usarla (CONN_HEALTH_CHECKS).
+DATABASE_POOL_MAX_SIZE = int(os.environ.get('DATABASE_POOL_MAX_SIZE', 20))
+if DATABASE_POOL_MAX_SIZE and importlib.util.find_spec('psycopg_pool'):
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': min(int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)), DATABASE_POOL_MAX_SIZE),
+        'max_size': DATABASE_POOL_MAX_SIZE,
+        'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+        'max_idle': float(os.environ.get('DATABASE_POOL_MAX_IDLE', 300)),
+        'max_lifetime': float(os.environ.get('DATABASE_POOL_MAX_LIFETIME', 1800)),
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DATABASE_CONN_MAX_AGE', 0))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Réplica de lectura (leads/replica.py): con DATABASE_REPLICA_HOST o DATABASE_REPLICA_NAME se
+# define el alias 'replica' (el resto de parámetros, como el primario si no se indican) y las
+# vistas marcadas con @read_from_replica (métricas, exportación, lookups) leen de ella. Tras
+# escribir, un usuario lee del primario durante REPLICA_STICKY_SECONDS
+if os.environ.get('DATABASE_REPLICA_HOST') or os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get('DATABASE_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+        'NAME': os.environ.get('DATABASE_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DATABASE_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DATABASE_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        # En los tests la réplica es la misma base de pruebas que el primario
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['leads.replica.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Caché (django.core.cache): marca de lectura del primario tras escribir (réplica), tokens
+# revocados y usuario del JWT (leads/authentication.py), conteos de la paginación y lookups.
+# Tiene que ser compartida por todos los procesos: en la memoria de cada uno, una escritura o
+# una revocación solo la vería el worker que atendió la petición.
+# - Con REDIS_URL (p. ej. redis://localhost:6379/1) y el paquete redis: Redis.
+# - Si no, la tabla CACHE_TABLE de la base de datos primaria (python manage.py createcachetable).
+# - CACHE_BACKEND=locmem: memoria del proceso, solo para desarrollo con un único proceso.
+REDIS_URL = os.environ.get('REDIS_URL')
+if os.environ.get('CACHE_BACKEND') == 'locmem':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+elif REDIS_URL and importlib.util.find_spec('redis'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('CACHE_TABLE', 'crm_cache'),
+    }}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -147,12 +213,16 @@ AUTH_USER_MODEL = 'leads.User'  # Uses custom User model from leads app
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT API authentication
+        'leads.authentication.ClaimsJWTAuthentication',  # JWT API authentication (usuario desde los claims)
         'rest_framework.authentication.SessionAuthentication',        # Django Admin panel
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',  # Authentication required by default
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'leads.perf.TimedJSONRenderer',  # JSONRenderer que mide el tiempo de serialización
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',  # Enable API filters
     ),
@@ -160,6 +230,62 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10, # Define el número de elementos por página por defecto (ej. 10 leads)
 }
 
+# Paginación con conteo aproximado (leads y acciones)
+# Por encima de este número de filas estimadas por el planificador se devuelve la estimación
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('PAGINATION_COUNT_ESTIMATE_THRESHOLD', 10000))
+# Segundos que se cachea el COUNT exacto de un mismo conjunto de filtros
+PAGINATION_COUNT_CACHE_TTL = int(os.environ.get('PAGINATION_COUNT_CACHE_TTL', 30))
+
+# Segundos que se cachean los conjuntos de referencia de /api/lookup/ (usuarios, personal OPC)
+LOOKUP_CACHE_TTL = int(os.environ.get('LOOKUP_CACHE_TTL', 300))
+
+# Tamaño de bloque (ids por UPDATE/transacción) de las operaciones masivas sobre leads
+LEADS_BULK_CHUNK_SIZE = int(os.environ.get('LEADS_BULK_CHUNK_SIZE', 2000))
+
+# Cola de llamadas (/api/work-queue/): minutos que un operador reserva el lead que tomó
+# (se libera al registrar una tipificación) y horas mínimas antes de volver a llamar
+# a un lead que no contestó
+WORK_QUEUE_LEASE_MINUTES = int(os.environ.get('WORK_QUEUE_LEASE_MINUTES', 15))
+WORK_QUEUE_RETRY_HOURS = int(os.environ.get('WORK_QUEUE_RETRY_HOURS', 4))
+
+# Autenticación JWT sin leer el usuario (leads/authentication.py): segundos que se cachea la
+# fila de User cuando una vista la necesita y la lista de tokens revocados. Cada revocación
+# borra la lista de la caché compartida, así que se aplica al momento en todos los procesos;
+# JWT_DENYLIST_CACHE_SECONDS es el retraso máximo si falla ese borrado (p. ej. Redis caído un
+# instante). Con CACHE_BACKEND=locmem no se cachean: cada petición lee TokenRevocation.
+JWT_USER_CACHE_SECONDS = int(os.environ.get('JWT_USER_CACHE_SECONDS', 60))
+JWT_DENYLIST_CACHE_SECONDS = int(os.environ.get('JWT_DENYLIST_CACHE_SECONDS', 30))
+
+# Hilos (y conexiones) con los que las vistas async de métricas (/api/async/...) ejecutan sus
+# consultas en paralelo, compartidos por todas las peticiones del proceso
+METRICS_PARALLEL_WORKERS = int(os.environ.get('METRICS_PARALLEL_WORKERS', 8))
+
+# Instrumentación por petición (crm_backend.middleware.PerformanceMiddleware): las peticiones
+# que tardan al menos estos milisegundos se registran en el log 'leads.perf' con sus
+# consultas más costosas
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', 500))
+
+# Métricas Prometheus (/metrics, ver leads/monitoring.py). Con varios workers define también
+# PROMETHEUS_MULTIPROC_DIR (directorio local compartido, vacío al arrancar). Si se define
+# este token, el scraper debe enviarlo como 'Authorization: Bearer <token>'
+PROMETHEUS_METRICS_TOKEN = os.environ.get('PROMETHEUS_METRICS_TOKEN', '')
+
+# Perfilado bajo demanda (crm_backend.middleware.ProfilingMiddleware, ver leads/profiling.py):
+# se perfila la petición que envía este token en la cabecera X-Profile (o en ?_profile=) y,
+# al azar, esta fracción de las peticiones (0 = ninguna). Los perfiles se guardan en
+# PROFILING_DIR (se conservan los PROFILING_MAX_FILES más recientes) y se consultan en /api/_profiles/
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', 200))
+
+# Consultas lentas (leads/slow_queries.py): las que tardan al menos estos milisegundos se
+# acumulan por huella y día en SlowQuery (0 = desactivado), con el plan de su primera
+# aparición en cada proceso. EXPLAIN ANALYZE vuelve a ejecutar la consulta: se corta a los
+# SLOW_QUERY_EXPLAIN_TIMEOUT_MS (0 = sin plan). Ver /api/_slow-queries/ y el comando slow_queries
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.environ.get('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', 10000))
+
 
 
 # CORS Configuration
@@ -196,10 +322,10 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
-    'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_USER_CLASS': 'leads.authentication.ClaimsUser',
     # APUNTA A TU SERIALIZADOR PERSONALIZADO AQUÍ
     'TOKEN_OBTAIN_SERIALIZER': 'leads.serializers.MyTokenObtainPairSerializer',
-    'TOKEN_REFRESH_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenRefreshSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'leads.serializers.ClaimsTokenRefreshSerializer',
     'TOKEN_VERIFY_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenVerifySerializer',
     'TOKEN_BLACKLIST_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenBlacklistSerializer',
 }
@@ -5,7 +5,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 # Importar el nuevo OPCPersonnelViewSet
-from leads.views import LeadViewSet, UserViewSet, AppointmentViewSet, ActionViewSet, dashboard_metrics, opc_leads_metrics, OPCPersonnelViewSet, LeadDuplicateViewSet, test_webhook_integration
+from leads.views import LeadViewSet, UserViewSet, AppointmentViewSet, ActionViewSet, dashboard_metrics, opc_leads_metrics, OPCPersonnelViewSet, LeadDuplicateViewSet, test_webhook_integration, lookup, work_queue_next, work_queue_release, changes_feed, events_stream, token_revoke, dashboard_metrics_async, opc_leads_metrics_async, perf_stats, prometheus_metrics, profiles_list, profile_detail, slow_queries_list, slow_query_detail
 
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -26,7 +26,21 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/revoke/', token_revoke, name='token_revoke'),
     path('api/dashboard-metrics/', dashboard_metrics, name='dashboard_metrics'),
     path('api/opc-leads-metrics/', opc_leads_metrics, name='opc_leads_metrics'),
+    path('api/async/dashboard-metrics/', dashboard_metrics_async, name='dashboard_metrics_async'),
+    path('api/async/opc-leads-metrics/', opc_leads_metrics_async, name='opc_leads_metrics_async'),
     path('api/test-webhook/', test_webhook_integration, name='test_webhook_integration'),
+    path('api/lookup/<str:entity>/', lookup, name='lookup'),
+    path('api/work-queue/next/', work_queue_next, name='work_queue_next'),
+    path('api/work-queue/release/', work_queue_release, name='work_queue_release'),
+    path('api/changes/', changes_feed, name='changes_feed'),
+    path('api/events/', events_stream, name='events_stream'),
+    path('api/_perf/', perf_stats, name='perf_stats'),
+    path('api/_profiles/', profiles_list, name='profiles_list'),
+    path('api/_profiles/<str:profile_id>/', profile_detail, name='profile_detail'),
+    path('api/_slow-queries/', slow_queries_list, name='slow_queries_list'),
+    path('api/_slow-queries/<str:huella>/', slow_query_detail, name='slow_query_detail'),
+    path('metrics', prometheus_metrics, name='prometheus_metrics'),
 ]
\ No newline at end of file
@@ -7,4 +7,17 @@ class LeadsConfig(AppConfig):
     def ready(self):
         # Importa tus señales aquí para que Django las descubra y las conecte
         # Esto asegura que las funciones de log_lead_changes y log_lead_deletion se activen.
-        import leads.signals  # Importar signals para que se registren
\ No newline at end of file
+        import leads.signals  # Importar signals para que se registren
+
+        # Mide las consultas de cada conexión para PerformanceMiddleware
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+        from leads.monitoring import count_connection, observe_pools
+        from leads.perf import install_query_recorder
+        from leads.slow_queries import install_slow_query_recorder
+        connection_created.connect(install_query_recorder, dispatch_uid='leads.perf.install_query_recorder')
+        connection_created.connect(install_slow_query_recorder, dispatch_uid='leads.slow_queries.install_slow_query_recorder')
+        connection_created.connect(count_connection, dispatch_uid='leads.monitoring.count_connection')
+        # Uso del pool de conexiones; en request_finished, después de que Django devuelva las conexiones
+        connection_created.connect(observe_pools, dispatch_uid='leads.monitoring.observe_pools')
+        request_finished.connect(observe_pools, dispatch_uid='leads.monitoring.observe_pools_request')
\ No newline at end of file
@@ -0,0 +1,213 @@
+# backend/leads/authentication.py
+"""
+Autenticación JWT sin consultar la tabla de usuarios en cada petición.
+
+ClaimsJWTAuthentication construye request.user (ClaimsUser) con los claims del token:
+user_id, username, rol, opc_profile_id, is_staff e is_superuser (ver set_user_claims). Las
+vistas que necesitan la fila completa la piden con get_full_user(), que la guarda en caché
+JWT_USER_CACHE_SECONDS segundos.
+
+Como el usuario ya no se lee, la revocación se comprueba contra TokenRevocation: la lista
+vigente se guarda en caché JWT_DENYLIST_CACHE_SECONDS segundos y cada revocación la borra, así
+que con la caché compartida (ver CACHES en settings) se aplica al momento en todos los procesos.
+Si la caché es la memoria de cada proceso (LocMemCache), ni la lista ni la fila del usuario se
+cachean: cada petición lee TokenRevocation. Se revocan todos los tokens de un
+usuario al cambiar su contraseña, rol, permisos o estado (o al eliminarlo), y un token concreto
+al cerrar sesión.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from . import monitoring
+from .models import OPCPersonnel, TokenRevocation, User
+
+DENYLIST_CACHE_KEY = 'auth:denylist'
+
+# Campos de User que viajan en el token o que deben invalidar las sesiones abiertas
+REVOKING_FIELDS = ('password', 'is_active', 'rol', 'is_staff', 'is_superuser', 'username')
+
+
+def get_user_cache_seconds():
+    return getattr(settings, 'JWT_USER_CACHE_SECONDS', 60)
+
+
+def get_denylist_cache_seconds():
+    return getattr(settings, 'JWT_DENYLIST_CACHE_SECONDS', 30)
+
+
+def cache_is_shared():
+    """False si la caché es la memoria del proceso: lo que borra una revocación en otro no se vería."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def set_user_claims(token, user):
+    """Claims con los que ClaimsUser resuelve el usuario sin ir a la base de datos."""
+    # 'iat' tiene resolución de segundos: no distingue un token emitido justo antes de una
+    # revocación de uno emitido justo después
+    token['emitido_en'] = timezone.now().timestamp()
+    token['username'] = user.username
+    token['rol'] = user.rol
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    try:
+        token['opc_profile_id'] = user.opc_profile.id
+    except OPCPersonnel.DoesNotExist:
+        token['opc_profile_id'] = None
+    return token
+
+
+def _claim_user_id(token):
+    return int(token[api_settings.USER_ID_CLAIM])
+
+
+def _user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_full_user(user):
+    """
+    Fila de User del usuario autenticado. Con ClaimsUser se lee de la caché (o de la base de
+    datos, con su perfil OPC); un User ya cargado se devuelve tal cual. None si ya no existe.
+    """
+    if isinstance(user, User):
+        return user
+    if not cache_is_shared():
+        return User.objects.select_related('opc_profile').filter(pk=user.pk).first()
+    key = _user_cache_key(user.pk)
+    full_user = cache.get(key)
+    monitoring.cache_lookup('auth_usuario', full_user is not None)
+    if full_user is None:
+        full_user = User.objects.select_related('opc_profile').filter(pk=user.pk).first()
+        if full_user is not None:
+            cache.set(key, full_user, get_user_cache_seconds())
+    return full_user
+
+
+class ClaimsUser(TokenUser):
+    """
+    Usuario construido con los claims del token. Los tokens emitidos antes de añadir 'rol'
+    no traen el claim: en ese caso se lee de la fila (caché incluida).
+    """
+
+    @cached_property
+    def id(self):
+        # simplejwt guarda el id como texto en el claim; como entero se compara igual que User.pk
+        return _claim_user_id(self.token)
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def rol(self):
+        if 'rol' in self.token:
+            return self.token['rol']
+        full_user = get_full_user(self)
+        return full_user.rol if full_user else None
+
+    @property
+    def opc_profile_id(self):
+        return self.token.get('opc_profile_id')
+
+
+def _load_denylist():
+    desde = timezone.now() - max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    users, jtis = {}, set()
+    for user_id, jti, fecha in TokenRevocation.objects.filter(fecha__gte=desde).values_list('user_id', 'jti', 'fecha'):
+        if jti:
+            jtis.add(jti)
+        else:
+            users[user_id] = max(users.get(user_id, 0), fecha.timestamp())
+    return users, jtis
+
+
+def get_denylist():
+    """(revocado_en por user_id, jtis revocados) de las revocaciones aún relevantes."""
+    if not cache_is_shared():
+        return _load_denylist()
+    denylist = cache.get(DENYLIST_CACHE_KEY)
+    monitoring.cache_lookup('auth_denylist', denylist is not None)
+    if denylist is None:
+        denylist = _load_denylist()
+        cache.set(DENYLIST_CACHE_KEY, denylist, get_denylist_cache_seconds())
+    return denylist
+
+
+def is_revoked(token):
+    users, jtis = get_denylist()
+    if token.get(api_settings.JTI_CLAIM) in jtis:
+        return True
+    revocado_en = users.get(_claim_user_id(token))
+    if revocado_en is None:
+        return False
+    # Sin 'emitido_en' (tokens no emitidos por el login) se usa 'iat', que revoca también los
+    # emitidos en el mismo segundo tras la revocación
+    emitido_en = token.get('emitido_en', token.get('iat', 0))
+    return emitido_en < revocado_en
+
+
+def revoke_user(user_id, motivo):
+    """Revoca todos los tokens del usuario emitidos hasta ahora."""
+    TokenRevocation.objects.create(user_id=user_id, motivo=motivo)
+    cache.delete_many([DENYLIST_CACHE_KEY, _user_cache_key(user_id)])
+
+
+def revoke_token(token, motivo):
+    """Revoca un token concreto (access o refresh) por su jti."""
+    TokenRevocation.objects.create(
+        user_id=_claim_user_id(token), jti=token[api_settings.JTI_CLAIM], motivo=motivo
+    )
+    cache.delete(DENYLIST_CACHE_KEY)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que devuelve un ClaimsUser y comprueba la lista de revocación."""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('El token no identifica al usuario.')
+        if is_revoked(validated_token):
+            raise InvalidToken('El token fue revocado.')
+        return ClaimsUser(validated_token)
+
+
+def authenticate_request(request, raw_token=None):
+    """
+    Usuario del JWT de la cabecera Authorization (o de 'raw_token') para vistas que no son de
+    DRF (vistas async). None si falta o no es válido.
+    """
+    authenticator = ClaimsJWTAuthentication()
+    try:
+        if raw_token:
+            return authenticator.get_user(authenticator.get_validated_token(raw_token))
+        result = authenticator.authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def async_jwt_required(view):
+    """Decorador de vistas async de solo lectura: GET con JWT válido, o 405 / 401."""
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return JsonResponse({'error': 'Método no permitido.'}, status=405)
+        user = await sync_to_async(authenticate_request)(request)
+        if user is None:
+            return JsonResponse({'error': 'Token inválido o ausente.'}, status=401)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return inner
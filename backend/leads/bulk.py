@@ -0,0 +1,249 @@
+# backend/leads/bulk.py
+"""
+Operaciones masivas sobre leads basadas en conjuntos (UPDATE ... WHERE id IN).
+
+Trabajan por bloques de ids, cada uno en su propia transacción, y registran la auditoría
+y la secuencia de cambios (/api/changes/) con un único bulk_create por bloque. No llaman a
+Lead.save(), por lo que no se disparan las señales post_save por cada fila; los eventos en
+vivo (/api/events/) se publican con un evento por bloque, dirigido a los asesores (anterior
+y nuevo) de sus leads igual que los de las señales.
+
+'user' puede ser un User o el usuario de los claims del token (ClaimsUser): solo se usa su pk.
+delete_leads acepta además None (comandos sin --user): la auditoría queda sin usuario.
+
+Todas aceptan un 'queryset' base: en cada bloque se vuelve a aplicar, de modo que un lead
+que dejó de cumplir los filtros entre la vista previa y la ejecución no se modifica.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from . import changes, events
+from .models import Action, Appointment, Lead, LeadDuplicate, OPCPersonnel
+
+
+def get_chunk_size():
+    return getattr(settings, 'LEADS_BULK_CHUNK_SIZE', 2000)
+
+
+def chunked(ids, size=None):
+    """Divide un iterable de ids en listas de como máximo 'size' elementos."""
+    size = size or get_chunk_size()
+    chunk = []
+    for item in ids:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _locked_rows(queryset, ids, *fields):
+    # Solo se leen columnas simples (ids de FK incluidos): nunca se cargan las relaciones
+    return queryset.filter(id__in=ids).order_by().select_for_update(of=('self',)).values_list('id', *fields)
+
+
+def _run_chunks(lead_ids, chunk_fn, chunk_size=None, on_progress=None):
+    """
+    Ejecuta chunk_fn(ids) por bloques y devuelve el progreso: [{'bloque', 'leads', 'modificados'}].
+    on_progress (opcional) recibe cada entrada de progreso en cuanto se confirma su bloque.
+    Si un bloque falla, los anteriores quedan confirmados y la excepción se propaga
+    con el progreso acumulado en 'exc.progreso'.
+    """
+    progreso = []
+    for numero, ids in enumerate(chunked(lead_ids, chunk_size), start=1):
+        try:
+            with transaction.atomic():
+                modificados = chunk_fn(ids)
+        except Exception as exc:
+            exc.progreso = progreso
+            raise
+        progreso.append({'bloque': numero, 'leads': len(ids), 'modificados': modificados})
+        if on_progress:
+            on_progress(progreso[-1])
+    return progreso
+
+
+def reassign_leads(lead_ids, user, nuevo_asesor=None, nuevo_captador=None, queryset=None, chunk_size=None):
+    """Reasigna asesor y/o captador OPC de los leads indicados."""
+    queryset = Lead.objects.all() if queryset is None else queryset
+
+    def reassign_chunk(ids):
+        now = timezone.now()
+        asesor_ids, captador_ids, actions = [], [], []
+        asesores_asesor, asesores_captador = set(), set()
+        opc_asesor = False
+        rows = _locked_rows(queryset, ids, 'asesor_id', 'personal_opc_captador_id', 'es_lead_opc')
+        for lead_id, asesor_id, captador_id, es_lead_opc in rows:
+            cambios = []
+            if nuevo_asesor and asesor_id != nuevo_asesor.id:
+                asesor_ids.append(lead_id)
+                asesores_asesor.update((asesor_id, nuevo_asesor.id))
+                opc_asesor = opc_asesor or es_lead_opc
+                cambios.append(f'asesor a {nuevo_asesor.username}')
+            if nuevo_captador and captador_id != nuevo_captador.id:
+                captador_ids.append(lead_id)
+                asesores_captador.add(nuevo_asesor.id if nuevo_asesor else asesor_id)
+                cambios.append(f'captador a {nuevo_captador.nombre}')
+            if cambios:
+                actions.append(Action(
+                    lead_id=lead_id,
+                    user_id=user.pk,
+                    tipo_accion='Reasignación masiva',
+                    detalle_accion=f'Lead reasignado: {", ".join(cambios)}.'
+                ))
+
+        if asesor_ids:
+            Lead.objects.filter(id__in=asesor_ids).update(asesor=nuevo_asesor, ultima_actualizacion=now)
+        if captador_ids:
+            # Equivalente a lo que hace Lead.save() al asignar personal OPC
+            Lead.objects.filter(id__in=captador_ids).update(
+                personal_opc_captador=nuevo_captador, es_lead_opc=True, ultima_actualizacion=now
+            )
+        Action.objects.bulk_create(actions)
+        changes.record(Lead, [action.lead_id for action in actions], 'actualizar')
+        if asesor_ids:
+            events.publish_on_commit(
+                'lead', asesor_ids, 'actualizar', campos=['asesor'], asesores=asesores_asesor, es_lead_opc=opc_asesor
+            )
+        if captador_ids:
+            events.publish_on_commit(
+                'lead', captador_ids, 'actualizar', campos=['es_lead_opc', 'personal_opc_captador'],
+                asesores=asesores_captador, es_lead_opc=True
+            )
+        return len(actions)
+
+    return _run_chunks(lead_ids, reassign_chunk, chunk_size)
+
+
+def set_tipificacion(lead_ids, user, tipificacion, queryset=None, chunk_size=None):
+    """Cambia la tipificación de los leads indicados que no la tengan ya."""
+    queryset = Lead.objects.all() if queryset is None else queryset
+
+    def tipificar_chunk(ids):
+        rows = [
+            row for row in _locked_rows(queryset, ids, 'tipificacion', 'asesor_id', 'es_lead_opc')
+            if row[1] != tipificacion
+        ]
+        actions = [
+            Action(
+                lead_id=lead_id,
+                user_id=user.pk,
+                tipo_accion='Tipificación masiva',
+                detalle_accion=f'Tipificación cambiada de "{anterior or "-"}" a "{tipificacion}".'
+            )
+            for lead_id, anterior, _, _ in rows
+        ]
+        if actions:
+            # Igual que al tipificar desde el formulario, se libera la reserva de la cola de llamadas
+            Lead.objects.filter(id__in=[a.lead_id for a in actions]).update(
+                tipificacion=tipificacion, ultima_actualizacion=timezone.now(),
+                reservado_por=None, reservado_hasta=None
+            )
+            Action.objects.bulk_create(actions)
+            changes.record(Lead, [action.lead_id for action in actions], 'actualizar')
+            events.publish_on_commit(
+                'lead', [action.lead_id for action in actions], 'actualizar',
+                campos=['reservado_hasta', 'reservado_por', 'tipificacion'],
+                asesores={row[2] for row in rows}, es_lead_opc=any(row[3] for row in rows)
+            )
+        return len(actions)
+
+    return _run_chunks(lead_ids, tipificar_chunk, chunk_size)
+
+
+def set_directeo(lead_ids, user, es_directeo, queryset=None, chunk_size=None):
+    """
+    Marca o desmarca leads como directeo. Igual que LeadViewSet.perform_update, al marcar
+    un directeo el asesor pasa a ser el usuario del personal OPC captador (si tiene).
+    """
+    queryset = Lead.objects.all() if queryset is None else queryset
+
+    def directeo_chunk(ids):
+        rows = [
+            row for row in _locked_rows(queryset, ids, 'es_directeo', 'asesor_id', 'es_lead_opc')
+            if row[1] != es_directeo
+        ]
+        if not rows:
+            return 0
+        changed = [row[0] for row in rows]
+        asesores = {row[2] for row in rows}
+        now = timezone.now()
+        Lead.objects.filter(id__in=changed).update(es_directeo=es_directeo, ultima_actualizacion=now)
+        if es_directeo:
+            Lead.objects.filter(id__in=changed, personal_opc_captador__user__isnull=False).update(
+                asesor_id=Subquery(
+                    OPCPersonnel.objects.filter(id=OuterRef('personal_opc_captador_id')).values('user_id')[:1]
+                )
+            )
+            # El nuevo asesor (usuario del captador) también recibe el evento
+            asesores.update(Lead.objects.filter(id__in=changed).values_list('asesor_id', flat=True))
+        detalle = 'Lead marcado como directeo.' if es_directeo else 'Lead desmarcado como directeo.'
+        Action.objects.bulk_create([
+            Action(lead_id=lead_id, user_id=user.pk, tipo_accion='Directeo masivo', detalle_accion=detalle)
+            for lead_id in changed
+        ])
+        changes.record(Lead, changed, 'actualizar')
+        events.publish_on_commit(
+            'lead', changed, 'actualizar', campos=['asesor', 'es_directeo'] if es_directeo else ['es_directeo'],
+            asesores=asesores, es_lead_opc=any(row[3] for row in rows)
+        )
+        return len(changed)
+
+    return _run_chunks(lead_ids, directeo_chunk, chunk_size)
+
+
+def delete_leads(lead_ids, user, queryset=None, chunk_size=None, on_progress=None):
+    """
+    Elimina leads junto con sus citas, acciones y duplicados con sentencias DELETE por bloque.
+
+    Se usa SQL directo porque QuerySet.delete() recorre las filas para enviar post_delete
+    (log_appointment_deletion / log_lead_deletion). En su lugar se escribe una única acción
+    'Eliminación masiva' por bloque con el resumen de lo eliminado. Los tombstones de
+    /api/changes/ se escriben en la misma sentencia DELETE (ver changes.delete_returning_sql).
+    """
+    queryset = Lead.objects.all() if queryset is None else queryset
+    action_table = Action._meta.db_table
+    appointment_table = Appointment._meta.db_table
+    duplicate_table = LeadDuplicate._meta.db_table
+    lead_table = Lead._meta.db_table
+
+    def delete_chunk(ids):
+        rows = list(_locked_rows(queryset, ids, 'asesor_id', 'es_lead_opc'))
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {action_table} WHERE lead_id = ANY(%s)', [ids])
+            acciones = cursor.rowcount
+            # Acciones de otros leads que apuntan a estas citas: mismo efecto que on_delete=SET_NULL
+            cursor.execute(
+                f'UPDATE {action_table} SET appointment_id = NULL WHERE appointment_id IN '
+                f'(SELECT id FROM {appointment_table} WHERE lead_id = ANY(%s))', [ids]
+            )
+            cursor.execute(changes.delete_returning_sql(Appointment, appointment_table, 'lead_id = ANY(%s)'), [ids])
+            citas = cursor.rowcount
+            cursor.execute(changes.delete_returning_sql(LeadDuplicate, duplicate_table, 'original_lead_id = ANY(%s)'), [ids])
+            duplicados = cursor.rowcount
+            cursor.execute(changes.delete_returning_sql(Lead, lead_table, 'id = ANY(%s)'), [ids])
+            leads = cursor.rowcount
+
+        Action.objects.create(
+            lead=None,
+            user_id=user.pk if user else None,
+            tipo_accion='Eliminación masiva',
+            detalle_accion=(
+                f'{leads} leads eliminados junto con {citas} citas, {acciones} acciones y '
+                f'{duplicados} duplicados. IDs: {", ".join(str(lead_id) for lead_id in ids)}.'
+            )
+        )
+        # Las citas de estos leads no tienen evento propio: el cliente las descarta con su lead
+        events.publish_on_commit(
+            'lead', ids, 'eliminar', asesores={row[1] for row in rows}, es_lead_opc=any(row[2] for row in rows)
+        )
+        return leads
+
+    return _run_chunks(lead_ids, delete_chunk, chunk_size, on_progress)
@@ -0,0 +1,136 @@
+# backend/leads/changes.py
+"""
+Secuencia de cambios de leads, citas y duplicados (ChangeLog) para sincronización incremental.
+
+Escritura: las señales post_save/post_delete registran los cambios fila a fila y las operaciones
+masivas de leads/bulk.py los registran por bloque (las eliminaciones con DELETE ... RETURNING,
+en la misma sentencia). Cada fila guarda el id de la transacción que la escribió.
+
+Lectura: changes_since() devuelve las filas posteriores al cursor (transaccion, id) cuya
+transacción es anterior al xmin del snapshot actual, es decir, de transacciones ya confirmadas
+y que ya no pueden aparecer por detrás del cursor. Una transacción larga retrasa el feed, pero
+nunca hace que un cliente se salte un cambio.
+"""
+
+from django.db import connection
+
+from . import serializers
+from .models import Appointment, ChangeLog, Lead, LeadDuplicate
+
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 1000
+
+ENTIDADES = {
+    Lead: 'lead',
+    Appointment: 'appointment',
+    LeadDuplicate: 'duplicate',
+}
+
+
+def record(entidad, ids, operacion):
+    """Registra un cambio por cada id. 'entidad' es una clave de ENTIDADES o el modelo."""
+    entidad = ENTIDADES.get(entidad, entidad)
+    ChangeLog.objects.bulk_create([
+        ChangeLog(entidad=entidad, objeto_id=objeto_id, operacion=operacion) for objeto_id in ids
+    ])
+
+
+def delete_returning_sql(entidad, table, where):
+    """
+    DELETE que deja su tombstone en la misma sentencia: el rowcount es el de filas eliminadas.
+    Solo para tablas y condiciones construidas en el código, nunca con texto del usuario.
+    """
+    changelog_table = ChangeLog._meta.db_table
+    return (
+        f'WITH eliminadas AS (DELETE FROM {table} WHERE {where} RETURNING id) '
+        f'INSERT INTO {changelog_table} (entidad, objeto_id, operacion, fecha) '
+        f"SELECT '{ENTIDADES.get(entidad, entidad)}', id, 'eliminar', now() FROM eliminadas"
+    )
+
+
+def encode_cursor(transaccion, change_id):
+    return f'{transaccion}.{change_id}'
+
+
+def decode_cursor(value):
+    """'<transaccion>.<id>' -> (transaccion, id). Lanza ValueError si no es válido."""
+    transaccion, change_id = value.split('.')
+    return int(transaccion), int(change_id)
+
+
+def _visible_changes(where, params, order, limit):
+    table = ChangeLog._meta.db_table
+    return list(ChangeLog.objects.raw(
+        f'SELECT * FROM {table} '
+        f'WHERE {where} AND transaccion < txid_snapshot_xmin(txid_current_snapshot()) '
+        f'ORDER BY transaccion {order}, id {order} LIMIT %s',
+        [*params, limit]
+    ))
+
+
+def head_cursor():
+    """Cursor del último cambio confirmado: para empezar a sincronizar desde ahora."""
+    last = _visible_changes('TRUE', [], 'DESC', 1)
+    return encode_cursor(last[0].transaccion, last[0].id) if last else encode_cursor(0, 0)
+
+
+def changes_since(cursor, limit):
+    """Hasta 'limit' cambios confirmados posteriores a 'cursor' y el cursor siguiente."""
+    changes = _visible_changes('(transaccion, id) > (%s, %s)', list(cursor), 'ASC', limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_cursor = encode_cursor(changes[-1].transaccion, changes[-1].id) if changes else encode_cursor(*cursor)
+    return changes, next_cursor, has_more
+
+
+def _current_data(changes, request):
+    """Representación actual de los objetos no eliminados, con una consulta por entidad."""
+    ids = {entidad: set() for entidad in ENTIDADES.values()}
+    for change in changes:
+        if change.operacion != 'eliminar':
+            ids[change.entidad].add(change.objeto_id)
+    context = {'request': request, 'flat': True, 'expand': []}
+    data = {}
+    if ids['lead']:
+        leads = Lead.objects.filter(id__in=ids['lead']).select_related(
+            'asesor', 'personal_opc_captador', 'supervisor_opc_captador'
+        )
+        data['lead'] = {lead.id: serializers.LeadSerializer(lead, context=context).data for lead in leads}
+    if ids['appointment']:
+        appointments = Appointment.objects.filter(id__in=ids['appointment']).select_related(
+            'lead', 'asesor_comercial', 'asesor_presencial', 'opc_personal_atendio'
+        )
+        data['appointment'] = {
+            appointment.id: serializers.AppointmentListSerializer(appointment).data for appointment in appointments
+        }
+    if ids['duplicate']:
+        duplicates = LeadDuplicate.objects.filter(id__in=ids['duplicate']).select_related(
+            'asesor__opc_profile', 'captador__supervisor', 'captador__user'
+        )
+        data['duplicate'] = {
+            duplicate.id: serializers.LeadDuplicateCompactSerializer(duplicate).data for duplicate in duplicates
+        }
+    return data
+
+
+def serialize_changes(changes, request):
+    """
+    Un elemento por objeto (su último cambio en la página), en el orden de ese último cambio.
+    'datos' es el estado actual del objeto; None si se eliminó.
+    """
+    last = {}
+    for change in changes:
+        last.pop((change.entidad, change.objeto_id), None)
+        last[(change.entidad, change.objeto_id)] = change
+    data = _current_data(last.values(), request)
+    return [
+        {
+            'cursor': encode_cursor(change.transaccion, change.id),
+            'entidad': change.entidad,
+            'id': change.objeto_id,
+            'operacion': change.operacion,
+            'fecha': change.fecha,
+            'datos': data.get(change.entidad, {}).get(change.objeto_id),
+        }
+        for change in last.values()
+    ]
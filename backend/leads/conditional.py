@@ -0,0 +1,147 @@
+# backend/leads/conditional.py
+"""
+GET condicional (ETag / Last-Modified) para respuestas de la API.
+
+Los validadores se calculan con consultas baratas (máximos de fechas y conteos) antes de
+serializar nada: si el cliente ya tiene la versión vigente se responde 304 sin cuerpo.
+"""
+
+import asyncio
+import datetime
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import Appointment, ChangeLog, Lead, OPCPersonnel, User
+
+# Tablas pequeñas: su COUNT(*) es barato y detecta eliminaciones, que no dejan fecha
+REFERENCE_MODELS = (User, OPCPersonnel)
+# Toda alta, edición o eliminación de leads y citas queda en la secuencia de cambios (señales
+# y operaciones masivas): su MAX(id) cambia también cuando se elimina una fila
+AUDITED_MODELS = (Lead, Appointment)
+
+
+def make_etag(*parts):
+    """ETag (débil) a partir de los valores que determinan la respuesta."""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def latest(*values):
+    """La fecha más reciente entre las indicadas, ignorando los None."""
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if not timezone.is_aware(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return int(value.timestamp())
+
+
+def conditional_get(request, build_response, etag=None, last_modified=None):
+    """
+    Devuelve 304 si If-None-Match / If-Modified-Since coinciden con los validadores; si no,
+    llama a build_response() y le añade ETag, Last-Modified y las cabeceras de revalidación.
+    """
+    last_modified = _timestamp(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+    if request.method in ('GET', 'HEAD') and (200 <= response.status_code < 300 or response.status_code == 304):
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Respuestas por usuario: el navegador las guarda pero siempre revalida
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def data_version(*models):
+    """
+    Versión de los datos de 'models' en una sola consulta, sin tocar las filas:
+    MAX(ultima_actualizacion) de cada tabla (por índice), COUNT(*) de las tablas de referencia
+    y MAX(id) de ChangeLog si hay leads o citas. Devuelve (partes para el ETag, última fecha).
+    """
+    # La misma base de la que leerá la vista (la réplica en las vistas de leads/replica.py)
+    connection = connections[router.db_for_read(models[0] if models else ChangeLog)]
+    columns = []
+    for model in models:
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns.append(f'(SELECT MAX(ultima_actualizacion) FROM {table})')
+        if model in REFERENCE_MODELS:
+            columns.append(f'(SELECT COUNT(*) FROM {table})')
+    if any(model in AUDITED_MODELS for model in models):
+        columns.append(f'(SELECT MAX(id) FROM {connection.ops.quote_name(ChangeLog._meta.db_table)})')
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {", ".join(columns)}')
+        parts = cursor.fetchone()
+    return parts, latest(*(part for part in parts if isinstance(part, datetime.datetime)))
+
+
+def request_validators(request, name, models, *extra):
+    """ETag y Last-Modified de una respuesta que depende de 'models' y de los parámetros de la petición."""
+    parts, last_modified = data_version(*models)
+    user_id = request.user.pk if request.user and request.user.is_authenticated else None
+    etag = make_etag(name, user_id, request.get_full_path(), *extra, *parts)
+    return etag, last_modified
+
+
+def conditional_view(name, *models):
+    """
+    Decorador de vistas de función (síncronas o async): GET condicional según data_version(*models).
+    La fecha del día entra en el ETag porque las métricas usan rangos relativos a hoy.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def ainner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                etag, last_modified = await sync_to_async(request_validators)(
+                    request, name, models, timezone.localdate()
+                )
+                response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return conditional_get(request, lambda: response, etag=etag, last_modified=last_modified)
+            return ainner
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            etag, last_modified = request_validators(request, name, models, timezone.localdate())
+            return conditional_get(
+                request, lambda: view(request, *args, **kwargs), etag=etag, last_modified=last_modified
+            )
+        return inner
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional para list y retrieve de un ViewSet. 'conditional_models' son las tablas
+    de las que depende la representación (incluidas las relaciones anidadas).
+    """
+    conditional_models = ()
+
+    def _conditional(self, request, build_response):
+        name = f'{self.basename}-{self.action}'
+        etag, last_modified = request_validators(request, name, self.conditional_models)
+        return conditional_get(request, build_response, etag=etag, last_modified=last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,141 @@
+# backend/leads/events.py
+"""
+Eventos de cambio en vivo (Server-Sent Events) para leads y citas.
+
+Las señales y las operaciones masivas publican, al confirmarse la transacción, un evento
+compacto (entidad, id, operación y campos modificados) en el Broadcaster del proceso. Cada
+conexión a /api/events/ es una suscripción con su propia cola acotada; si el cliente no la
+vacía a tiempo se descartan sus eventos pendientes y recibe un único 'resync' para recargar.
+
+El Broadcaster vive en memoria del proceso ASGI: con varios procesos (workers) cada uno
+reparte solo los cambios que se guardaron en él.
+"""
+
+import asyncio
+import json
+import threading
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+
+# Eventos pendientes por suscriptor antes de pedirle que recargue
+SSE_QUEUE_SIZE = 100
+# Comentario periódico para que proxies y navegador no cierren la conexión ociosa
+SSE_HEARTBEAT_SECONDS = 15
+# Reintento del EventSource tras un corte (ms)
+SSE_RETRY_MS = 5000
+
+RESYNC = 'event: resync\ndata: {}\n\n'
+
+
+def format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscription:
+    """
+    Una conexión SSE. 'solo_opc' limita a leads OPC (y sus citas); 'asesor_id' a los
+    objetos de ese usuario (asesor del lead, asesor comercial o presencial de la cita).
+    """
+
+    def __init__(self, loop, solo_opc=False, asesor_id=None):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.solo_opc = solo_opc
+        self.asesor_id = asesor_id
+
+    def matches(self, asesores, es_lead_opc):
+        # asesores None: evento sin destinatarios conocidos, va a todos
+        if asesores is None:
+            return True
+        if self.solo_opc and not es_lead_opc:
+            return False
+        return self.asesor_id is None or self.asesor_id in asesores
+
+    def put(self, message):
+        """Se ejecuta en el event loop de la suscripción."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class Broadcaster:
+    """Reparte eventos desde cualquier hilo a las suscripciones de los event loops."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self, solo_opc=False, asesor_id=None):
+        subscription = Subscription(asyncio.get_running_loop(), solo_opc=solo_opc, asesor_id=asesor_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, data, asesores=None, es_lead_opc=False):
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.matches(asesores, es_lead_opc)]
+        if not subscriptions:
+            return
+        message = format_event('cambio', data)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # El loop ya se cerró: la conexión terminó sin desuscribirse
+                self.unsubscribe(subscription)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+broadcaster = Broadcaster()
+
+
+def publish_on_commit(entidad, ids, operacion, campos=None, asesores=None, es_lead_opc=False):
+    """
+    Publica el cambio cuando se confirme la transacción (nunca cambios que acaban revertidos).
+    'campos' None significa que no se conocen (alta, eliminación o guardado sin estado previo).
+    """
+    data = {'entidad': entidad, 'operacion': operacion, 'campos': campos}
+    if len(ids) == 1:
+        data['id'] = ids[0]
+    else:
+        data['ids'] = list(ids)
+    asesores = None if asesores is None else frozenset(a for a in asesores if a is not None)
+    transaction.on_commit(lambda: broadcaster.publish(data, asesores=asesores, es_lead_opc=es_lead_opc))
+
+
+def changed_fields(instance):
+    """Campos cuyo valor difiere del cargado de la base de datos (ver TrackLoadedValuesMixin)."""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        return None
+    names = {field.attname: field.name for field in instance._meta.concrete_fields}
+    return sorted(
+        names[attname] for attname, value in loaded.items()
+        if attname != 'ultima_actualizacion' and getattr(instance, attname) != value
+    )
+
+
+def lead_audience(lead):
+    """(asesores, es_lead_opc) de un lead: el asesor actual y el que tenía al cargarse."""
+    loaded = getattr(lead, '_loaded_values', None) or {}
+    return {lead.asesor_id, loaded.get('asesor_id')}, lead.es_lead_opc
+
+
+def appointment_audience(appointment):
+    asesores = {appointment.asesor_comercial_id, appointment.asesor_presencial_id}
+    try:
+        lead = appointment.lead
+    except ObjectDoesNotExist:
+        return asesores, False
+    return asesores | {lead.asesor_id}, lead.es_lead_opc
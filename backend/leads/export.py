@@ -0,0 +1,77 @@
+# backend/leads/export.py
+"""
+Exportación de leads en CSV y XLSX sin cargar el resultado en memoria.
+
+Las filas se leen con un cursor del lado del servidor (QuerySet.iterator) como tuplas
+(values_list), sin instanciar modelos. Las columnas son las que acepta upload_csv, de modo
+que un archivo exportado se puede volver a importar tal cual.
+"""
+
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+# Columnas de Lead que lee upload_csv (nombre, celular y ubicacion son obligatorias)
+EXPORT_COLUMNS = [
+    'nombre', 'celular', 'ubicacion', 'medio', 'distrito', 'tipificacion',
+    'observacion', 'observacion_opc', 'proyecto_interes', 'calle_o_modulo',
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de acumularla."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    return queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_filename(extension):
+    return f'leads_{timezone.localtime():%Y%m%d_%H%M}.{extension}'
+
+
+def csv_response(queryset):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_COLUMNS)
+        for row in export_rows(queryset):
+            yield writer.writerow(['' if value is None else value for value in row])
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename("csv")}"'
+    return response
+
+
+def xlsx_response(queryset):
+    """
+    XLSX con un libro write-only: cada fila se vuelca a disco al añadirla. El archivo se arma
+    en un temporal (un .xlsx es un zip y no puede emitirse antes de cerrarlo) y se envía por partes.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Leads')
+    sheet.append(EXPORT_COLUMNS)
+    for row in export_rows(queryset):
+        sheet.append([
+            ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+            for value in row
+        ])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=export_filename('xlsx'), content_type=XLSX_CONTENT_TYPE
+    )
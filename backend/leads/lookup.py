@@ -0,0 +1,25 @@
+# backend/leads/lookup.py
+"""
+Conjuntos de referencia pequeños de /api/lookup/<entity>/ (usuarios y personal OPC) que se
+cachean completos. La vista los lee de la caché con lookup_cache_key() y las señales de User y
+OPCPersonnel borran la clave al cambiar una fila (ver signals.invalidate_lookup_cache).
+"""
+
+from .models import OPCPersonnel, User
+
+LOOKUP_CACHED_ENTITIES = {
+    'users': lambda: [
+        {'id': u['id'], 'label': f"{u['first_name']} {u['last_name']}".strip() or u['username'],
+         'username': u['username'], 'rol': u['rol']}
+        for u in User.objects.filter(is_active=True).order_by('username')
+        .values('id', 'username', 'first_name', 'last_name', 'rol')
+    ],
+    'opc-personnel': lambda: [
+        {'id': p['id'], 'label': f"{p['nombre']} ({p['rol']})", 'rol': p['rol']}
+        for p in OPCPersonnel.objects.order_by('nombre').values('id', 'nombre', 'rol')
+    ],
+}
+
+
+def lookup_cache_key(entity):
+    return f'lookup:{entity}'
@@ -0,0 +1,105 @@
+# backend/leads/management/commands/benchmark_dashboard.py
+
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+# (nombre, ruta síncrona, ruta asíncrona) relativas a --base-url
+ENDPOINTS = [
+    ('dashboard-metrics', '/dashboard-metrics/', '/async/dashboard-metrics/'),
+    ('opc-leads-metrics', '/opc-leads-metrics/', '/async/opc-leads-metrics/'),
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara peticiones por segundo y latencias (p50/p95) de las vistas de métricas síncronas y '
+        'asíncronas bajo carga concurrente, contra un servidor en marcha (p. ej. uvicorn crm_backend.asgi:application). '
+        'Ejemplo: benchmark_dashboard --username admin --password secreto --concurrency 20 --requests 200'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8001/api', help='URL base de la API.')
+        parser.add_argument('--username', help='Usuario con el que obtener el token en /token/.')
+        parser.add_argument('--password', help='Contraseña del usuario.')
+        parser.add_argument('--token', help='Access token JWT (en lugar de usuario y contraseña).')
+        parser.add_argument('--concurrency', type=int, default=10, help='Peticiones simultáneas.')
+        parser.add_argument('--requests', type=int, default=100, help='Peticiones por variante.')
+        parser.add_argument('--param', action='append', default=[], metavar='CAMPO=VALOR',
+                            help='Query param de las peticiones (p. ej. context=gestion). Se puede repetir.')
+        parser.add_argument('--output', help='Guarda los resultados en este archivo JSON.')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        token = options['token'] or self.login(base_url, options['username'], options['password'])
+        params = dict(item.split('=', 1) for item in options['param'] if '=' in item)
+        # Sin If-None-Match: cada petición calcula las métricas completas
+        headers = {'Authorization': f'Bearer {token}'}
+
+        results = []
+        for name, sync_path, async_path in ENDPOINTS:
+            for variante, path in (('sync', sync_path), ('async', async_path)):
+                result = self.run(f'{base_url}{path}', params, headers, options['concurrency'], options['requests'])
+                result.update({'endpoint': name, 'variante': variante})
+                results.append(result)
+                self.stdout.write(
+                    f"{name:<20} {variante:<6} {result['rps']:>8.1f} req/s  "
+                    f"p50 {result['p50_ms']:>7.1f} ms  p95 {result['p95_ms']:>7.1f} ms  errores {result['errores']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'base_url': base_url, 'concurrency': options['concurrency'],
+                    'requests': options['requests'], 'params': params, 'results': results,
+                }, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+
+    def login(self, base_url, username, password):
+        if not username or not password:
+            raise CommandError('Indica --token o --username y --password.')
+        response = requests.post(f'{base_url}/token/', json={'username': username, 'password': password}, timeout=10)
+        if response.status_code != 200:
+            raise CommandError(f'No se pudo iniciar sesión ({response.status_code}): {response.text[:200]}')
+        return response.json()['access']
+
+    def run(self, url, params, headers, concurrency, total):
+        local = threading.local()
+
+        def call(_):
+            # Una sesión (conexión keep-alive) por hilo: requests.Session no es thread-safe
+            session = getattr(local, 'session', None) or requests.Session()
+            local.session = session
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, params=params, headers=headers, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Calentamiento: conexiones abiertas y cachés del servidor cargadas
+            list(executor.map(call, range(concurrency)))
+            start = time.perf_counter()
+            samples = list(executor.map(call, range(total)))
+            elapsed = time.perf_counter() - start
+
+        latencies = [latency * 1000 for latency, ok in samples if ok]
+        if not latencies:
+            raise CommandError(f'Todas las peticiones a {url} fallaron.')
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies),
+            'p95_ms': percentile(latencies, 0.95),
+            'errores': sum(1 for _, ok in samples if not ok),
+        }
@@ -0,0 +1,242 @@
+# backend/leads/management/commands/benchmark_suite.py
+
+import csv
+import datetime
+import io
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from leads.models import Action, Appointment, Lead, LeadDuplicate, OPCPersonnel, User
+
+
+class Rollback(Exception):
+    """Deshace lo escrito por un caso de escritura (importación, reasignación)."""
+
+
+class QueryCounter:
+    """execute_wrapper que cuenta las consultas y su tiempo (sin guardarlas, como CaptureQueriesContext)."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide en proceso (sin servidor) los caminos críticos de la API contra la base de datos actual: '
+        'listado de leads con filtros y búsqueda, dashboard_metrics, opc_leads_metrics, upload_csv, '
+        'reasignar y listado de citas. Las escrituras se deshacen al terminar cada iteración. '
+        'Guarda los resultados en JSON (--output) para compararlos entre commits (--compare). '
+        'Para volúmenes de producción, generar antes los datos con generate_synthetic_data.'
+    )
+
+    # Casos que escriben (y se deshacen): caros, se repiten menos
+    WRITE_CASES = ('upload_csv', 'reasignar')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5, help='Iteraciones medidas por caso.')
+        parser.add_argument('--warmup', type=int, default=1, help='Iteraciones previas sin medir.')
+        parser.add_argument('--write-iterations', type=int, default=1,
+                            help='Iteraciones de los casos de escritura (upload_csv, reasignar), sin calentamiento.')
+        parser.add_argument('--user', help='Username con el que se hacen las peticiones (por defecto un superusuario).')
+        parser.add_argument('--case', action='append', default=[], help='Solo estos casos. Se puede repetir.')
+        parser.add_argument('--csv-rows', type=int, default=50000, help='Filas del CSV de upload_csv.')
+        parser.add_argument('--reassign-size', type=int, default=5000, help='Leads por reasignación.')
+        parser.add_argument('--cold', action='store_true', help='Vacía la caché antes de cada iteración.')
+        parser.add_argument('--output', help='Archivo JSON donde guardar los resultados.')
+        parser.add_argument('--compare', help='JSON de una ejecución anterior con la que comparar.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        # Cada caso ya se mide aquí: sin el aviso de petición lenta de PerformanceMiddleware
+        logging.getLogger('leads.perf').setLevel(logging.ERROR)
+        self.user = self.get_user(options['user'])
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_authenticate(self.user)
+
+        cases = self.cases()
+        if options['case']:
+            unknown = set(options['case']) - set(cases)
+            if unknown:
+                raise CommandError(f'Casos desconocidos: {", ".join(sorted(unknown))}. Disponibles: {", ".join(cases)}')
+            cases = {name: cases[name] for name in options['case']}
+
+        results = {}
+        for name, case in cases.items():
+            if name in self.WRITE_CASES:
+                results[name] = self.measure(case, options['write_iterations'], warmup=0)
+            else:
+                results[name] = self.measure(case, options['iterations'], options['warmup'])
+            r = results[name]
+            self.stdout.write(
+                f"{name:<24} mediana {r['mediana_ms']:>9.1f} ms  p95 {r['p95_ms']:>9.1f} ms  "
+                f"consultas {r['consultas']:>5}  estado {r['estado']}"
+            )
+
+        report = {
+            'fecha': timezone.now().isoformat(),
+            'commit': git_revision(),
+            'python': platform.python_version(),
+            'base_de_datos': f'{connection.vendor} {connection.pg_version if connection.vendor == "postgresql" else ""}'.strip(),
+            'volumen': {
+                'leads': Lead.objects.count(),
+                'acciones': Action.objects.count(),
+                'citas': Appointment.objects.count(),
+                'duplicados': LeadDuplicate.objects.count(),
+                'usuarios': User.objects.count(),
+                'personal_opc': OPCPersonnel.objects.count(),
+            },
+            'parametros': {
+                key: options[key]
+                for key in ('iterations', 'warmup', 'write_iterations', 'csv_rows', 'reassign_size', 'cold')
+            },
+            'resultados': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if not user:
+                raise CommandError(f'No existe el usuario "{username}".')
+            return user
+        user = User.objects.filter(is_superuser=True).order_by('id').first() or User.objects.order_by('id').first()
+        if not user:
+            raise CommandError('No hay usuarios: genera datos con generate_synthetic_data.')
+        return user
+
+    def cases(self):
+        """nombre -> función que hace la petición y devuelve la respuesta."""
+        hace_un_mes = (timezone.localdate() - datetime.timedelta(days=30)).isoformat()
+        get = lambda url: lambda: self.client.get(url)
+        return {
+            'leads_lista': get('/api/leads/'),
+            'leads_filtros': get(
+                f'/api/leads/?context=gestion&tipificacion=NO%20CONTESTA&fecha_creacion_after={hace_un_mes}'
+            ),
+            'leads_busqueda': get('/api/leads/?search=Quispe'),
+            'leads_opc': get('/api/leads/?is_opc_lead=true&ordering=-fecha_captacion'),
+            'dashboard_metrics': get('/api/dashboard-metrics/'),
+            'dashboard_metrics_rango': get(f'/api/dashboard-metrics/?fecha_desde={hace_un_mes}'),
+            'opc_leads_metrics': get('/api/opc-leads-metrics/'),
+            'citas_lista': get('/api/appointments/'),
+            'upload_csv': self.rolled_back(self.upload_csv),
+            'reasignar': self.rolled_back(self.reassign),
+        }
+
+    def rolled_back(self, request):
+        def run():
+            try:
+                with transaction.atomic():
+                    response = request()
+                    raise Rollback
+            except Rollback:
+                return response
+        return run
+
+    def csv_file(self):
+        """CSV con la mitad de filas nuevas y la mitad con celulares existentes (duplicados)."""
+        if not hasattr(self, '_csv'):
+            rows = self.options['csv_rows']
+            existentes = list(Lead.objects.order_by('?').values_list('celular', flat=True)[:rows // 2])
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['nombre', 'celular', 'ubicacion', 'medio', 'distrito', 'tipificacion'])
+            for i in range(rows):
+                celular = existentes[i] if i < len(existentes) else f'7{i:08d}'
+                writer.writerow([f'Importado {i}', celular, 'Feria Inmobiliaria', 'Web', 'Huacho', ''])
+            self._csv = buffer.getvalue().encode('utf-8')
+        return self._csv
+
+    def upload_csv(self):
+        archivo = SimpleUploadedFile('benchmark.csv', self.csv_file(), content_type='text/csv')
+        return self.client.post('/api/leads/upload_csv/', {'csv_file': archivo}, format='multipart')
+
+    def reassign(self):
+        size = self.options['reassign_size']
+        lead_ids = list(Lead.objects.order_by('-id').values_list('id', flat=True)[:size])
+        asesor = User.objects.filter(is_active=True).order_by('?').values_list('id', flat=True).first()
+        return self.client.post(
+            '/api/leads/reasignar/', {'lead_ids': lead_ids, 'nuevo_asesor_id': asesor}, format='json'
+        )
+
+    def measure(self, case, iterations, warmup):
+        for _ in range(warmup):
+            case()
+        tiempos, db_ms, response = [], [], None
+        for _ in range(max(iterations, 1)):
+            if self.options['cold']:
+                cache.clear()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                response = case()
+                tiempos.append((time.perf_counter() - start) * 1000)
+            db_ms.append(counter.seconds * 1000)
+        return {
+            'iteraciones': len(tiempos),
+            'min_ms': round(min(tiempos), 2),
+            'mediana_ms': round(statistics.median(tiempos), 2),
+            'p95_ms': round(percentile(tiempos, 0.95), 2),
+            'media_ms': round(statistics.mean(tiempos), 2),
+            'max_ms': round(max(tiempos), 2),
+            'db_mediana_ms': round(statistics.median(db_ms), 2),
+            'consultas': counter.queries,
+            'estado': response.status_code,
+            'bytes': len(response.content),
+        }
+
+    def compare(self, report, path):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(f"\nComparación con {path} (commit {previous.get('commit')}):")
+        for name, result in report['resultados'].items():
+            before = previous.get('resultados', {}).get(name)
+            if not before:
+                self.stdout.write(f'{name:<24} sin datos previos')
+                continue
+            delta = (result['mediana_ms'] - before['mediana_ms']) / before['mediana_ms'] * 100 if before['mediana_ms'] else 0
+            self.stdout.write(
+                f"{name:<24} {before['mediana_ms']:>9.1f} -> {result['mediana_ms']:>9.1f} ms ({delta:+.1f} %)  "
+                f"consultas {before['consultas']} -> {result['consultas']}"
+            )
@@ -0,0 +1,81 @@
+# backend/leads/management/commands/delete_leads.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from leads import bulk
+from leads.models import Lead, User
+from leads.views import LeadFilter
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina leads y sus citas, acciones y duplicados por bloques, sin disparar las señales por fila. '
+        'Ejemplos: delete_leads --ids 10,11,12 | delete_leads --filter medio=Web --filter fecha_creacion_after=2025-01-01'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', help='IDs separados por coma.')
+        parser.add_argument('--ids-file', help='Archivo con un ID por línea.')
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='CAMPO=VALOR',
+            help='Filtro de LeadFilter (igual que en /api/leads/). Se puede repetir.'
+        )
+        parser.add_argument('--user', help='Username al que se atribuye la auditoría.')
+        parser.add_argument('--chunk-size', type=int, help='Leads por bloque (por defecto LEADS_BULK_CHUNK_SIZE).')
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra cuántos leads se eliminarían.')
+
+    def handle(self, *args, **options):
+        queryset = Lead.objects.all()
+        ids = []
+        try:
+            if options['ids']:
+                ids += [int(i) for i in options['ids'].split(',') if i.strip()]
+            if options['ids_file']:
+                with open(options['ids_file']) as f:
+                    ids += [int(line) for line in f if line.strip()]
+        except ValueError as e:
+            raise CommandError(f'IDs inválidos: {e}')
+        if ids:
+            queryset = queryset.filter(id__in=ids)
+
+        if options['filter']:
+            params = QueryDict(mutable=True)
+            for item in options['filter']:
+                if '=' not in item:
+                    raise CommandError(f'Filtro inválido "{item}", usa CAMPO=VALOR.')
+                key, value = item.split('=', 1)
+                if key not in LeadFilter.param_names():
+                    raise CommandError(f'Filtro desconocido "{key}". Disponibles: {", ".join(sorted(LeadFilter.param_names()))}.')
+                params.appendlist(key, value)
+            filterset = LeadFilter(params, queryset=queryset)
+            if not filterset.is_valid():
+                raise CommandError(f'Filtros inválidos:\n{filterset.errors.as_text()}')
+            # LeadFilter ignora los valores vacíos: --filter asesor= no debe acabar eliminando todo
+            if not filterset.is_filtering():
+                raise CommandError('Los filtros indicados no restringen nada: revisa que tengan valor.')
+            queryset = filterset.qs
+
+        if not ids and not options['filter']:
+            raise CommandError('Indica --ids, --ids-file o al menos un --filter.')
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f'No existe el usuario "{options["user"]}".')
+
+        queryset = queryset.order_by()
+        lead_ids = list(queryset.order_by('id').values_list('id', flat=True))
+        if options['dry_run']:
+            self.stdout.write(f'Se eliminarían {len(lead_ids)} leads.')
+            return
+
+        def report(paso):
+            self.stdout.write(f"Bloque {paso['bloque']}: {paso['modificados']} de {paso['leads']} leads eliminados.")
+
+        progreso = bulk.delete_leads(
+            lead_ids, user, queryset=queryset, chunk_size=options['chunk_size'], on_progress=report
+        )
+        eliminados = sum(paso['modificados'] for paso in progreso)
+        self.stdout.write(self.style.SUCCESS(f'{eliminados} leads eliminados en total.'))
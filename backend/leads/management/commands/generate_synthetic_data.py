@@ -0,0 +1,307 @@
+# backend/leads/management/commands/generate_synthetic_data.py
+
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from leads import bulk
+from leads.models import Action, Appointment, ChangeLog, Lead, LeadDuplicate, OPCPersonnel, User
+
+# Identifican los datos sintéticos (ver --clear): usuarios con este prefijo y leads con un
+# celular de 9 dígitos que empieza por '8' (los reales empiezan por '9') sin asesor ni captador
+# que no sean sintéticos
+USERNAME_PREFIX = 'sint_'
+CELULAR_BASE = 800000000
+CELULAR_SINTETICO_RE = r'^8[0-9]{8}$'
+
+NOMBRES = [
+    'María', 'José', 'Luis', 'Carmen', 'Juan', 'Rosa', 'Carlos', 'Ana', 'Jorge', 'Lucía', 'Miguel',
+    'Sofía', 'Pedro', 'Elena', 'Víctor', 'Patricia', 'Diego', 'Gabriela', 'Raúl', 'Milagros',
+]
+APELLIDOS = [
+    'Quispe', 'Flores', 'Sánchez', 'Rodríguez', 'García', 'Rojas', 'Mendoza', 'Huamán', 'Chávez',
+    'Vásquez', 'Ramos', 'Torres', 'Castillo', 'Díaz', 'Mamani', 'Espinoza', 'Ruiz', 'Gutiérrez',
+]
+DISTRITOS = [
+    'Huacho', 'Huaral', 'Aucallama', 'Chancay', 'San Martín de Porres', 'Los Olivos', 'Comas',
+    'Independencia', 'Carabayllo', 'Puente Piedra', 'San Juan de Lurigancho', 'Ate', 'Santa Anita',
+]
+UBICACIONES_OPC = ['Plaza Norte', 'Mega Plaza', 'Mall Aventura', 'Real Plaza Huacho', 'Plaza Vea Huaral', 'Mercado Central']
+CAMPANIAS = ['Campaña Facebook Oasis', 'Campaña Instagram', 'Feria Inmobiliaria', 'Web Oasis', 'Referidos 2025']
+MEDIOS = [
+    'Redes Sociales (Facebook)', 'Redes Sociales (Instagram)', 'Redes Sociales (WhatsApp)', 'Referidos', 'Web',
+]
+# (tipificación, peso): la mayoría de los leads de un CRM de llamadas está sin tipificar o no contesta
+TIPIFICACIONES = [
+    ('', 30), ('NO CONTESTA', 20), ('VOLVER A LLAMAR', 8), ('SEGUIMIENTO', 8), ('APAGADO', 5),
+    ('NO INTERESADO - POR PROYECTO', 4), ('NO INTERESADO - MEDIOS ECONOMICOS', 4), ('DATO FALSO', 3),
+    ('FUERA DE SERVICIO', 2), ('INFORMACION WSP/CORREO', 3), ('CITA - SALA', 3), ('CITA - PROYECTO', 2),
+    ('CITA - ZOOM', 1), ('CITA - POR CONFIRMAR', 2), ('CITA - HxH', 1), ('YA ASISTIO', 2), ('NO CALIFICA', 2),
+]
+ESTADOS_CITA = [('Pendiente', 35), ('Confirmada', 20), ('Realizada', 25), ('Cancelada', 12), ('Reprogramada', 8)]
+TIPOS_ACCION = [
+    ('Tipificación', 'Tipificación cambiada a NO CONTESTA.'),
+    ('Edición de lead', 'Campos modificados: observacion.'),
+    ('Llamada', 'Llamada registrada por el operador.'),
+    ('Cita agendada', 'Cita agendada para el lead.'),
+    ('Reasignación masiva', 'Lead reasignado: asesor.'),
+]
+LUGARES = ['Sala de ventas', 'Proyecto Oasis 2', 'ZOOM', 'Oficina Huacho']
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return lambda: rng.choices(values, weights)[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos realistas (usuarios, jerarquía OPC, leads, citas, acciones y duplicados) '
+        'con inserciones masivas, para reproducir volúmenes de producción en local. '
+        'Ejemplo: generate_synthetic_data --leads 1000000 --actions 5000000 --appointments 200000 --duplicates 20000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leads', type=int, default=10000)
+        parser.add_argument('--actions', type=int, default=50000)
+        parser.add_argument('--appointments', type=int, default=2000)
+        parser.add_argument('--duplicates', type=int, default=200)
+        parser.add_argument('--asesores', type=int, default=40, help='Operadores (rol OPERADOR).')
+        parser.add_argument('--presenciales', type=int, default=8, help='Asesores presenciales.')
+        parser.add_argument('--supervisores', type=int, default=10, help='Supervisores OPC.')
+        parser.add_argument('--opc-por-supervisor', type=int, default=12)
+        parser.add_argument('--opc-ratio', type=float, default=0.4, help='Fracción de leads captados por OPC.')
+        parser.add_argument('--days', type=int, default=365, help='Antigüedad máxima de las fechas generadas.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas por INSERT.')
+        parser.add_argument('--password', default='sintetico123', help='Contraseña de los usuarios generados.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Elimina antes los datos sintéticos existentes.')
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help='No pide confirmación antes de --clear.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El generador requiere PostgreSQL.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.days = options['days']
+        self.now = timezone.now()
+
+        if options['clear']:
+            self.clear(options['interactive'])
+        elif User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('Ya hay datos sintéticos: usa --clear para regenerarlos.')
+
+        inicio = time.perf_counter()
+        self.create_users(options)
+        self.lead_ids, self.lead_asesor, self.lead_opc = [], [], []
+        self.step('leads', options['leads'], lambda n: self.create_leads(n, options['opc_ratio']))
+        if self.lead_ids:
+            self.step('citas', options['appointments'], self.create_appointments)
+            self.step('acciones', options['actions'], self.create_actions)
+            self.step('duplicados', options['duplicates'], self.create_duplicates)
+        self.spread_dates()
+        self.stdout.write(self.style.SUCCESS(f'Datos sintéticos generados en {time.perf_counter() - inicio:.1f} s.'))
+
+    def step(self, nombre, total, create):
+        inicio = time.perf_counter()
+        creados = 0
+        while creados < total:
+            n = min(self.batch_size, total - creados)
+            with transaction.atomic():
+                create(n)
+            creados += n
+        if total:
+            segundos = time.perf_counter() - inicio
+            self.stdout.write(f'{total} {nombre} en {segundos:.1f} s ({total / max(segundos, 1e-6):.0f} filas/s).')
+
+    def clear(self, interactive):
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        # Un lead con asesor o captador reales no es sintético aunque su celular empiece por '8'
+        leads = Lead.objects.filter(celular__regex=CELULAR_SINTETICO_RE).filter(
+            Q(asesor__isnull=True) | Q(asesor__in=users),
+            Q(personal_opc_captador__isnull=True) | Q(personal_opc_captador__user__in=users),
+        )
+        lead_ids = list(leads.order_by('id').values_list('id', flat=True))
+        if interactive:
+            respuesta = input(
+                f'Se eliminarán {len(lead_ids)} leads (con sus citas, acciones y duplicados) y '
+                f'{users.count()} usuarios sintéticos de la base de datos '
+                f'"{connection.settings_dict["NAME"]}". Escribe "si" para continuar: '
+            )
+            if respuesta.strip().lower() != 'si':
+                raise CommandError('Cancelado: no se ha eliminado nada.')
+        # Bloques sin señales por fila (mismo camino que el comando delete_leads)
+        bulk.delete_leads(lead_ids, None, chunk_size=self.batch_size)
+        OPCPersonnel.objects.filter(user__in=users).delete()
+        users.delete()
+        self.stdout.write(f'Eliminados {len(lead_ids)} leads y los usuarios sintéticos.')
+
+    def create_users(self, options):
+        password = make_password(options['password'])
+
+        def users(prefijo, n, rol):
+            return User.objects.bulk_create([
+                User(
+                    username=f'{USERNAME_PREFIX}{prefijo}{i}', password=password, rol=rol,
+                    first_name=self.rng.choice(NOMBRES), last_name=self.rng.choice(APELLIDOS),
+                ) for i in range(n)
+            ])
+
+        with transaction.atomic():
+            self.asesores = [u.id for u in users('asesor', options['asesores'], 'OPERADOR')]
+            self.presenciales = [u.id for u in users('presencial', options['presenciales'], 'ASESOR_PRESENCIAL')]
+            supervisor_users = users('supervisor', options['supervisores'], 'OPC')
+            supervisores = OPCPersonnel.objects.bulk_create([
+                OPCPersonnel(nombre=f'{u.first_name} {u.last_name}', rol='SUPERVISOR', user=u) for u in supervisor_users
+            ])
+            opc_users = users('opc', options['supervisores'] * options['opc_por_supervisor'], 'OPC')
+            opc = OPCPersonnel.objects.bulk_create([
+                OPCPersonnel(
+                    nombre=f'{u.first_name} {u.last_name}', rol='OPC', user=u,
+                    supervisor=supervisores[i // options['opc_por_supervisor']],
+                ) for i, u in enumerate(opc_users)
+            ])
+        # (id del OPC, id de su supervisor)
+        self.opc = [(p.id, p.supervisor_id) for p in opc]
+        self.stdout.write(
+            f'{len(self.asesores)} asesores, {len(self.presenciales)} presenciales, '
+            f'{len(supervisores)} supervisores OPC con {len(opc)} captadores.'
+        )
+
+    def nombre(self):
+        return f'{self.rng.choice(NOMBRES)} {self.rng.choice(APELLIDOS)} {self.rng.choice(APELLIDOS)}'
+
+    def create_leads(self, n, opc_ratio):
+        rng = self.rng
+        tipificacion = weighted(rng, TIPIFICACIONES)
+        proyectos = [value for value, _ in Lead.PROYECTO_INTERES_CHOICES]
+        inicio = CELULAR_BASE + len(self.lead_ids)
+        leads = []
+        for i in range(n):
+            es_opc = bool(self.opc) and rng.random() < opc_ratio
+            captador, supervisor = rng.choice(self.opc) if es_opc else (None, None)
+            leads.append(Lead(
+                nombre=self.nombre(),
+                celular=str(inicio + i),
+                asesor_id=rng.choice(self.asesores) if self.asesores and rng.random() < 0.85 else None,
+                ubicacion=rng.choice(UBICACIONES_OPC if es_opc else CAMPANIAS),
+                medio='OPC' if es_opc else rng.choice(MEDIOS),
+                distrito=rng.choice(DISTRITOS) if rng.random() < 0.8 else None,
+                tipificacion=tipificacion(),
+                observacion='Interesado en lote de 120 m2.' if rng.random() < 0.2 else None,
+                personal_opc_captador_id=captador,
+                supervisor_opc_captador_id=supervisor,
+                es_lead_opc=es_opc,
+                es_directeo=es_opc and rng.random() < 0.1,
+                fecha_captacion=(self.now - timezone.timedelta(days=rng.randrange(self.days))).date() if es_opc else None,
+                calle_o_modulo=rng.choice(['CALLE', 'MODULO']) if es_opc else None,
+                proyecto_interes=rng.choice(proyectos) if rng.random() < 0.7 else None,
+            ))
+        for lead in Lead.objects.bulk_create(leads):
+            self.lead_ids.append(lead.id)
+            self.lead_asesor.append(lead.asesor_id)
+            self.lead_opc.append(lead.personal_opc_captador_id)
+
+    def random_lead(self):
+        """(índice, id, asesor, captador OPC) de un lead generado; su celular es CELULAR_BASE + índice."""
+        index = self.rng.randrange(len(self.lead_ids))
+        return index, self.lead_ids[index], self.lead_asesor[index], self.lead_opc[index]
+
+    def create_appointments(self, n):
+        rng = self.rng
+        estado = weighted(rng, ESTADOS_CITA)
+        citas = []
+        for _ in range(n):
+            _, lead_id, asesor_id, captador_id = self.random_lead()
+            valor = estado()
+            citas.append(Appointment(
+                lead_id=lead_id,
+                asesor_comercial_id=asesor_id or (rng.choice(self.asesores) if self.asesores else None),
+                asesor_presencial_id=rng.choice(self.presenciales) if self.presenciales else None,
+                fecha_hora=self.now + timezone.timedelta(hours=rng.randrange(-24 * self.days, 24 * 60)),
+                lugar=rng.choice(LUGARES),
+                estado=valor,
+                has_ever_been_confirmed=valor in ('Confirmada', 'Realizada') or rng.random() < 0.1,
+                opc_personal_atendio_id=captador_id,
+            ))
+        Appointment.objects.bulk_create(citas)
+
+    def create_actions(self, n):
+        rng = self.rng
+        acciones = []
+        for _ in range(n):
+            _, lead_id, asesor_id, _ = self.random_lead()
+            tipo, detalle = rng.choice(TIPOS_ACCION)
+            acciones.append(Action(lead_id=lead_id, user_id=asesor_id, tipo_accion=tipo, detalle_accion=detalle))
+        Action.objects.bulk_create(acciones)
+
+    def create_duplicates(self, n):
+        rng = self.rng
+        duplicados = []
+        for _ in range(n):
+            index, lead_id, asesor_id, captador_id = self.random_lead()
+            # Mismo celular que el original: así los detecta la importación de CSV
+            duplicados.append(LeadDuplicate(
+                original_lead_id=lead_id,
+                nombre=self.nombre(),
+                celular=str(CELULAR_BASE + index),
+                asesor_id=asesor_id,
+                captador_id=captador_id,
+                medio=rng.choice(MEDIOS),
+                distrito=rng.choice(DISTRITOS),
+                estado='pendiente' if rng.random() < 0.7 else rng.choice(['fusionado', 'ignorado']),
+            ))
+        LeadDuplicate.objects.bulk_create(duplicados)
+
+    def spread_dates(self):
+        """
+        bulk_create fija auto_now/auto_now_add al momento actual: se reparten las fechas de alta
+        en los últimos --days días y se registran las altas en la secuencia de cambios
+        (/api/changes/ y ETags), como si se hubieran creado por la API.
+        """
+        if not self.lead_ids:
+            return
+        desde = min(self.lead_ids)
+        tablas = [
+            (Lead, 'fecha_creacion', 'ultima_actualizacion', 'lead_id'),
+            (Appointment, 'fecha_creacion', 'ultima_actualizacion', 'lead_id'),
+            (Action, 'fecha_accion', None, 'lead_id'),
+            (LeadDuplicate, 'fecha_importacion', None, 'original_lead_id'),
+        ]
+        inicio = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT setseed(%s)', [(self.rng.random() * 2) - 1])
+            for model, fecha, actualizacion, lead_fk in tablas:
+                tabla = model._meta.db_table
+                lead_col = 'id' if model is Lead else lead_fk
+                sets = [f"{fecha} = %s - random() * %s * interval '1 day'"]
+                if actualizacion:
+                    sets.append(f"{actualizacion} = %s - random() * %s * interval '1 day'")
+                cursor.execute(
+                    f'UPDATE {tabla} SET {", ".join(sets)} WHERE {lead_col} >= %s',
+                    [self.now, self.days] * len(sets) + [desde],
+                )
+            # Que la última actualización nunca sea anterior al alta
+            for model in (Lead, Appointment):
+                cursor.execute(
+                    f'UPDATE {model._meta.db_table} SET ultima_actualizacion = fecha_creacion '
+                    f'WHERE ultima_actualizacion < fecha_creacion AND {"id" if model is Lead else "lead_id"} >= %s',
+                    [desde],
+                )
+            changelog = ChangeLog._meta.db_table
+            for entidad, model, lead_col in (('lead', Lead, 'id'), ('appointment', Appointment, 'lead_id')):
+                cursor.execute(
+                    f"INSERT INTO {changelog} (entidad, objeto_id, operacion, fecha) "
+                    f"SELECT %s, id, 'crear', fecha_creacion FROM {model._meta.db_table} "
+                    f"WHERE {lead_col} >= %s ORDER BY fecha_creacion",
+                    [entidad, desde],
+                )
+        self.stdout.write(f'Fechas repartidas y altas registradas en {time.perf_counter() - inicio:.1f} s.')
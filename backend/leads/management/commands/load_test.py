@@ -0,0 +1,370 @@
+# backend/leads/management/commands/load_test.py
+
+import base64
+import datetime
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.management.commands.benchmark_dashboard import percentile
+from leads.models import Lead, User
+
+TIPIFICACIONES = [value for value, _ in Lead.TIPIFICACION_CHOICES]
+APELLIDOS_BUSQUEDA = ['Quispe', 'Flores', 'García', 'Rojas', 'Torres']
+
+# Pasos de cada tipo de sesión: (peso, nombre, método de VirtualUser, escribe)
+SCENARIOS = {
+    'operador': [
+        (30, 'leads_pagina', 'operador_leads', False),
+        (15, 'leads_filtro', 'operador_filtro', False),
+        (25, 'lead_detalle', 'lead_detalle', False),
+        (15, 'retipificar', 'retipificar', True),
+        (5, 'crear_cita', 'crear_cita', True),
+        (10, 'citas', 'operador_citas', False),
+    ],
+    'opc': [
+        (40, 'leads_opc', 'opc_leads', False),
+        (25, 'lead_detalle', 'lead_detalle', False),
+        (15, 'editar_observacion', 'editar_observacion', True),
+        (20, 'metricas_opc', 'opc_metricas', False),
+    ],
+    'supervisor': [
+        (35, 'dashboard', 'dashboard', False),
+        (25, 'metricas_opc', 'supervisor_metricas', False),
+        (25, 'citas', 'citas', False),
+        (10, 'leads_pagina', 'leads', False),
+        (5, 'subir_csv', 'subir_csv', True),
+    ],
+}
+
+
+def token_claims(token):
+    payload = token.split('.')[1]
+    return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+
+
+class Stats:
+    """Latencias y errores por (escenario, paso), compartidas por todos los hilos."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, scenario, step, seconds, ok):
+        with self.lock:
+            self.latencies[(scenario, step)].append(seconds * 1000)
+            if not ok:
+                self.errors[(scenario, step)] += 1
+
+
+class VirtualUser:
+    """Una sesión: inicia sesión en /token/ y repite pasos de su escenario con pausas entre ellos."""
+
+    def __init__(self, command, scenario, username, rng):
+        self.command = command
+        self.options = command.options
+        self.base_url = command.base_url
+        self.scenario = scenario
+        self.username = username
+        self.rng = rng
+        self.session = requests.Session()
+        self.lead_ids = []
+        # Páginas alcanzadas por listado (se avanza como un usuario, siguiendo 'next')
+        self.pages = defaultdict(lambda: 1)
+        steps = [step for step in SCENARIOS[scenario] if not (step[3] and self.options['read_only'])]
+        self.weights = [step[0] for step in steps]
+        self.steps = steps
+
+    def request(self, step, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', timeout=self.options['timeout'], **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.command.stats.record(self.scenario, step, time.perf_counter() - start, ok)
+        if response is not None and response.status_code == 401 and step != 'login':
+            self.login()
+        return response if ok else None
+
+    def login(self):
+        response = self.request('login', 'POST', '/token/', json={
+            'username': self.username, 'password': self.options['password'],
+        })
+        if response is None:
+            return False
+        token = response.json()['access']
+        claims = token_claims(token)
+        self.user_id = int(claims['user_id'])
+        self.opc_profile_id = claims.get('opc_profile_id')
+        self.session.headers['Authorization'] = f'Bearer {token}'
+        return True
+
+    def run(self, deadline, stop):
+        if not self.login():
+            return
+        think_time = self.options['think_time']
+        while time.monotonic() < deadline and not stop.is_set():
+            _, step, method, _ = self.rng.choices(self.steps, self.weights)[0]
+            getattr(self, method)(step)
+            if think_time > 0:
+                stop.wait(self.rng.expovariate(1 / think_time))
+
+    def page(self, step):
+        return self.rng.randint(1, self.pages[step])
+
+    def list_leads(self, step, params):
+        response = self.request(step, 'GET', '/leads/', params=params)
+        if response is not None:
+            data = response.json()
+            if data.get('next'):
+                self.pages[step] = max(self.pages[step], params['page'] + 1)
+            ids = [lead['id'] for lead in data.get('results', [])]
+            if ids:
+                self.lead_ids = ids
+
+    def lead_id(self):
+        return self.rng.choice(self.lead_ids) if self.lead_ids else None
+
+    # --- Pasos ---
+
+    def leads(self, step):
+        self.list_leads(step, {'page': self.page(step)})
+
+    def operador_leads(self, step):
+        self.list_leads(step, {'context': 'gestion', 'asesor': self.user_id, 'page': self.page(step)})
+
+    def operador_filtro(self, step):
+        params = {
+            'context': 'gestion', 'tipificacion': self.rng.choice(TIPIFICACIONES[:8]),
+            'search': self.rng.choice(APELLIDOS_BUSQUEDA), 'page': 1,
+        }
+        self.list_leads(step, params)
+
+    def lead_detalle(self, step):
+        lead_id = self.lead_id()
+        if lead_id:
+            self.request(step, 'GET', f'/leads/{lead_id}/full/')
+
+    def retipificar(self, step):
+        lead_id = self.lead_id()
+        if lead_id:
+            self.request(step, 'PATCH', f'/leads/{lead_id}/', json={'tipificacion': self.rng.choice(TIPIFICACIONES[:8])})
+
+    def crear_cita(self, step):
+        lead_id = self.lead_id()
+        if lead_id:
+            fecha = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=self.rng.randint(1, 14))
+            self.request(step, 'POST', '/appointments/', json={
+                'lead_id': lead_id, 'fecha_hora': fecha.isoformat(), 'lugar': 'Sala de ventas', 'estado': 'Pendiente',
+            })
+
+    def operador_citas(self, step):
+        self.request(step, 'GET', '/appointments/', params={'asesor_comercial': self.user_id, 'compact': 'true'})
+
+    def citas(self, step):
+        page = self.page(step)
+        response = self.request(step, 'GET', '/appointments/', params={'page': page})
+        if response is not None and response.json().get('next'):
+            self.pages[step] = max(self.pages[step], page + 1)
+
+    def opc_leads(self, step):
+        params = {'is_opc_lead': 'true', 'page': self.page(step)}
+        if self.opc_profile_id:
+            params['personal_opc_captador'] = self.opc_profile_id
+        self.list_leads(step, params)
+
+    def editar_observacion(self, step):
+        lead_id = self.lead_id()
+        if lead_id:
+            self.request(step, 'PATCH', f'/leads/{lead_id}/', json={'observacion_opc': f'Visita {self.rng.randint(1, 999)}'})
+
+    def opc_metricas(self, step):
+        params = {'personal_opc_id': self.opc_profile_id} if self.opc_profile_id else {}
+        self.request(step, 'GET', '/opc-leads-metrics/', params=params)
+
+    def supervisor_metricas(self, step):
+        params = {'supervisor_opc_id': self.opc_profile_id} if self.opc_profile_id else {}
+        self.request(step, 'GET', '/opc-leads-metrics/', params=params)
+
+    def dashboard(self, step):
+        self.request(step, 'GET', '/dashboard-metrics/')
+
+    def subir_csv(self, step):
+        lines = ['nombre,celular,ubicacion,medio,distrito']
+        for i in range(self.options['csv_rows']):
+            lines.append(f'Carga {i},7{self.rng.randrange(10 ** 8):08d},Feria Inmobiliaria,Web,Huacho')
+        files = {'csv_file': ('carga.csv', '\n'.join(lines).encode('utf-8'), 'text/csv')}
+        self.request(step, 'POST', '/leads/upload_csv/', files=files)
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP con sesiones realistas de operadores, OPC y supervisores contra un servidor '
+        'local (runserver, gunicorn o uvicorn). Cada usuario virtual inicia sesión en /token/ y repite los '
+        'pasos de su rol con pausas. Informa rendimiento, percentiles de latencia y errores por escenario y '
+        'paso; con --max-p95-ms, --max-error-rate o --min-rps termina con error si no se cumplen. '
+        'Los usuarios se eligen de la base de datos por rol (por defecto los de generate_synthetic_data) y '
+        'los pasos de escritura modifican datos reales salvo con --read-only. '
+        'Ejemplo: load_test --users 30 --duration 120 --mix operador=70,opc=20,supervisor=10 --max-p95-ms 800'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8001/api', help='URL base de la API.')
+        parser.add_argument('--users', type=int, default=10, help='Usuarios virtuales simultáneos.')
+        parser.add_argument('--mix', default='operador=70,opc=20,supervisor=10',
+                            help='Reparto de usuarios por escenario (pesos).')
+        parser.add_argument('--duration', type=float, default=60, help='Segundos de carga.')
+        parser.add_argument('--ramp-up', type=float, default=5, help='Segundos en los que arrancan todos los usuarios.')
+        parser.add_argument('--think-time', type=float, default=1.0,
+                            help='Pausa media entre pasos (s, exponencial). 0 = sin pausas.')
+        parser.add_argument('--user-prefix', default='sint_', help='Solo usuarios cuyo username empieza así.')
+        parser.add_argument('--password', default='sintetico123', help='Contraseña de los usuarios virtuales.')
+        parser.add_argument('--csv-rows', type=int, default=200, help='Filas de cada CSV subido por supervisores.')
+        parser.add_argument('--read-only', action='store_true', help='Sin pasos de escritura.')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada petición (s).')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='Guarda los resultados en este archivo JSON.')
+        parser.add_argument('--max-p95-ms', type=float, help='Falla si el p95 de algún paso (salvo login) lo supera.')
+        parser.add_argument('--max-error-rate', type=float, help='Falla si el %% de errores de algún paso lo supera.')
+        parser.add_argument('--min-rps', type=float, help='Falla si el total de peticiones por segundo es menor.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.base_url = options['base_url'].rstrip('/')
+        self.stats = Stats()
+        rng = random.Random(options['seed'])
+
+        sessions = self.plan_sessions(options, rng)
+        stop = threading.Event()
+        start = time.monotonic()
+        deadline = start + options['ramp_up'] + options['duration']
+        threads = []
+        for index, (scenario, username) in enumerate(sessions):
+            user = VirtualUser(self, scenario, username, random.Random(rng.random()))
+            thread = threading.Thread(target=user.run, args=(deadline, stop), daemon=True)
+            threads.append(thread)
+            # Arranque escalonado a lo largo de --ramp-up
+            stop.wait(options['ramp_up'] / len(sessions) if index else 0)
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join(max(0, deadline - time.monotonic()) + options['timeout'])
+        except KeyboardInterrupt:
+            stop.set()
+        elapsed = time.monotonic() - start
+
+        report = self.report(elapsed, sessions)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+        self.check_thresholds(report)
+
+    def plan_sessions(self, options, rng):
+        """(escenario, username) de cada usuario virtual, repartidos según --mix."""
+        try:
+            mix = {name: float(weight) for name, weight in (item.split('=') for item in options['mix'].split(','))}
+        except ValueError:
+            raise CommandError('--mix debe tener el formato escenario=peso,escenario=peso.')
+        unknown = set(mix) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Escenarios desconocidos: {", ".join(sorted(unknown))}. Disponibles: {", ".join(SCENARIOS)}')
+
+        users = User.objects.filter(is_active=True, username__startswith=options['user_prefix'])
+        candidates = {
+            'operador': users.filter(rol='OPERADOR'),
+            'opc': users.filter(opc_profile__rol='OPC'),
+            'supervisor': users.filter(opc_profile__rol='SUPERVISOR'),
+        }
+        # Reparto por restos mayores: la suma es exactamente --users
+        total = sum(mix.values())
+        shares = {scenario: options['users'] * weight / total for scenario, weight in mix.items()}
+        counts = {scenario: int(share) for scenario, share in shares.items()}
+        by_remainder = sorted(shares, key=lambda scenario: shares[scenario] - counts[scenario], reverse=True)
+        for scenario in by_remainder[:options['users'] - sum(counts.values())]:
+            counts[scenario] += 1
+        sessions = []
+        for scenario, count in counts.items():
+            usernames = list(candidates[scenario].values_list('username', flat=True))
+            if count and not usernames:
+                raise CommandError(
+                    f'No hay usuarios para el escenario {scenario} con el prefijo "{options["user_prefix"]}" '
+                    '(genera datos con generate_synthetic_data).'
+                )
+            sessions += [(scenario, usernames[i % len(usernames)]) for i in range(count)]
+        if not sessions:
+            raise CommandError('No hay usuarios virtuales: revisa --users y --mix.')
+        rng.shuffle(sessions)
+        return sessions
+
+    def summarize(self, latencies, errors, elapsed):
+        return {
+            'peticiones': len(latencies),
+            'rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.5), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+            'max_ms': round(max(latencies), 1),
+            'errores': errors,
+            'error_pct': round(errors * 100 / len(latencies), 2),
+        }
+
+    def report(self, elapsed, sessions):
+        pasos, escenarios = {}, defaultdict(lambda: ([], 0))
+        todas, errores_totales = [], 0
+        self.stdout.write(f"{'escenario':<11} {'paso':<19} {'n':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'err %':>6}")
+        for (scenario, step), latencies in sorted(self.stats.latencies.items()):
+            errors = self.stats.errors[(scenario, step)]
+            resumen = self.summarize(latencies, errors, elapsed)
+            pasos[f'{scenario}.{step}'] = resumen
+            lat, err = escenarios[scenario]
+            escenarios[scenario] = (lat + latencies, err + errors)
+            todas += latencies
+            errores_totales += errors
+            self.stdout.write(
+                f"{scenario:<11} {step:<19} {resumen['peticiones']:>6} {resumen['rps']:>7.1f} {resumen['p50_ms']:>8.1f} "
+                f"{resumen['p95_ms']:>8.1f} {resumen['p99_ms']:>8.1f} {resumen['error_pct']:>6.2f}"
+            )
+        if not todas:
+            raise CommandError(f'No se completó ninguna petición contra {self.base_url}.')
+        total = self.summarize(todas, errores_totales, elapsed)
+        self.stdout.write(
+            f"TOTAL: {total['peticiones']} peticiones en {elapsed:.1f} s, {total['rps']:.1f} req/s, "
+            f"p95 {total['p95_ms']:.1f} ms, errores {total['error_pct']:.2f} %"
+        )
+        return {
+            'base_url': self.base_url,
+            'usuarios': {scenario: sum(1 for s, _ in sessions if s == scenario) for scenario in SCENARIOS},
+            'parametros': {
+                key: self.options[key] for key in ('duration', 'ramp_up', 'think_time', 'read_only', 'csv_rows', 'mix')
+            },
+            'segundos': round(elapsed, 1),
+            'total': total,
+            'escenarios': {scenario: self.summarize(lat, err, elapsed) for scenario, (lat, err) in escenarios.items()},
+            'pasos': pasos,
+        }
+
+    def check_thresholds(self, report):
+        """Modo de aprobación: CommandError (código de salida 1) si no se cumplen los umbrales."""
+        fallos = []
+        max_p95, max_errors, min_rps = (self.options[k] for k in ('max_p95_ms', 'max_error_rate', 'min_rps'))
+        for name, resumen in report['pasos'].items():
+            # El login es lento a propósito (hash de la contraseña) y ocurre una vez por sesión
+            if max_p95 is not None and resumen['p95_ms'] > max_p95 and not name.endswith('.login'):
+                fallos.append(f"{name}: p95 {resumen['p95_ms']} ms > {max_p95} ms")
+            if max_errors is not None and resumen['error_pct'] > max_errors:
+                fallos.append(f"{name}: errores {resumen['error_pct']} % > {max_errors} %")
+        if min_rps is not None and report['total']['rps'] < min_rps:
+            fallos.append(f"total: {report['total']['rps']} req/s < {min_rps} req/s")
+        report['aprobado'] = not fallos
+        if fallos:
+            raise CommandError('Umbrales no cumplidos:\n' + '\n'.join(fallos))
+        if any(v is not None for v in (max_p95, max_errors, min_rps)):
+            self.stdout.write(self.style.SUCCESS('Umbrales cumplidos.'))
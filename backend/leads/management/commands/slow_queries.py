@@ -0,0 +1,63 @@
+# backend/leads/management/commands/slow_queries.py
+
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from leads import slow_queries
+from leads.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = (
+        'Muestra las consultas lentas registradas (ver leads/slow_queries.py), agrupadas por huella y '
+        'ordenadas por tiempo total. Ejemplos: slow_queries --days 7 | slow_queries --plan <huella> | '
+        'slow_queries --purge-days 30'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Días hacia atrás (incluido hoy).')
+        parser.add_argument('--limit', type=int, default=20, help='Número de huellas.')
+        parser.add_argument('--plan', metavar='HUELLA', help='Muestra la SQL, el origen y el último plan de una huella.')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON.')
+        parser.add_argument('--purge-days', type=int, help='Borra los registros de más de estos días y termina.')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            limite = timezone.localdate() - datetime.timedelta(days=options['purge_days'])
+            borradas, _ = SlowQuery.objects.filter(dia__lt=limite).delete()
+            self.stdout.write(self.style.SUCCESS(f'{borradas} registros anteriores a {limite} eliminados.'))
+            return
+
+        if options['plan']:
+            data = slow_queries.detail(options['plan'])
+            if data is None:
+                raise CommandError(f'No hay consultas lentas con la huella {options["plan"]}.')
+            if options['json']:
+                self.stdout.write(json.dumps(data, indent=2, cls=DjangoJSONEncoder))
+                return
+            total = sum(dia['llamadas'] for dia in data['dias'])
+            self.stdout.write(f"Huella {data['huella']}: {total} llamadas en {len(data['dias'])} días")
+            self.stdout.write(f"Origen: {data['origen'] or '-'}")
+            self.stdout.write(f"SQL: {data['sql']}\n")
+            self.stdout.write(f"Plan ({data['plan_dia']}):\n{data['plan']}" if data['plan'] else 'Sin plan.')
+            return
+
+        if options['days'] < 1 or options['limit'] < 1:
+            raise CommandError('--days y --limit deben ser positivos.')
+        ranking = slow_queries.top(options['days'], options['limit'])
+        if options['json']:
+            self.stdout.write(json.dumps(ranking, indent=2, cls=DjangoJSONEncoder))
+            return
+        if not ranking:
+            self.stdout.write(f"Sin consultas lentas (>= {slow_queries.get_threshold_ms()} ms) en los últimos {options['days']} días.")
+            return
+        self.stdout.write(f"{'huella':<17} {'llamadas':>9} {'total s':>9} {'media ms':>9} {'max ms':>9}  origen / sql")
+        for row in ranking:
+            self.stdout.write(
+                f"{row['huella']:<17} {row['llamadas']:>9} {row['total_ms'] / 1000:>9.1f} {row['media_ms']:>9.1f} "
+                f"{row['max_ms']:>9.1f}  {row['origen'] or '-'}\n{'':<58}{row['sql'][:160]}"
+            )
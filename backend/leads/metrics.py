@@ -0,0 +1,302 @@
+# backend/leads/metrics.py
+"""
+Métricas del panel de control (dashboard_metrics) y de leads OPC (opc_leads_metrics).
+
+Cada informe se arma como un conjunto de consultas independientes ('partes') y una función
+que compone la respuesta con sus resultados. Las vistas síncronas ejecutan las partes una
+tras otra; las asíncronas (/api/async/...) todas a la vez, cada una en un hilo con su propia
+conexión: el ORM asíncrono de Django pasa todas las consultas por un mismo hilo, así que por
+sí solo no las solaparía. Ambas versiones devuelven exactamente el mismo JSON.
+
+Los hilos son los de un executor propio de METRICS_PARALLEL_WORKERS hilos. Cada hilo trata su
+conexión como un hilo de petición: la conserva según CONN_MAX_AGE (o el pool). Con
+CONN_MAX_AGE = 0 abre una conexión por consulta y el paralelismo apenas compensa ese coste.
+"""
+
+import asyncio
+import contextvars
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q
+
+from .models import Appointment, Lead, OPCPersonnel, User
+
+TIPIFICACIONES_CITA = [
+    'CITA - SALA', 'CITA - PROYECTO', 'CITA - HxH', 'CITA - ZOOM',
+    'CITA - POR CONFIRMAR', 'CITA - CONFIRMADA', 'YA ASISTIO'
+]
+
+
+class MetricsError(Exception):
+    """Parámetro inválido: la vista responde {'error': message} con 'status'."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def run_parts(parts):
+    return {name: part() for name, part in parts.items()}
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'METRICS_PARALLEL_WORKERS', 8), thread_name_prefix='metrics'
+        )
+    return _executor
+
+
+def _run_isolated(part):
+    try:
+        return part()
+    finally:
+        # Igual que al terminar una petición (request_finished), también la réplica si se usó
+        close_old_connections()
+
+
+async def arun_parts(parts):
+    """Ejecuta las partes en paralelo en los hilos del executor de métricas."""
+    loop = asyncio.get_running_loop()
+    names = list(parts)
+    # run_in_executor no copia el contexto: sin esto la instrumentación (perf) no vería las consultas
+    results = await asyncio.gather(*(
+        loop.run_in_executor(get_executor(), contextvars.copy_context().run, _run_isolated, parts[name])
+        for name in names
+    ))
+    return dict(zip(names, results))
+
+
+def opc_leads_report(params):
+    """(partes, componer) de las métricas de leads OPC."""
+    fecha_desde = params.get('fecha_desde')
+    fecha_hasta = params.get('fecha_hasta')
+    personal_opc_id = params.get('personal_opc_id')
+    supervisor_opc_id = params.get('supervisor_opc_id')
+
+    queryset = Lead.objects.filter(es_lead_opc=True)
+    if fecha_desde:
+        queryset = queryset.filter(fecha_captacion__gte=fecha_desde)
+    if fecha_hasta:
+        queryset = queryset.filter(fecha_captacion__lte=fecha_hasta)
+    if personal_opc_id:
+        queryset = queryset.filter(personal_opc_captador_id=personal_opc_id)
+    if supervisor_opc_id:
+        queryset = queryset.filter(supervisor_opc_captador_id=supervisor_opc_id)
+
+    fecha_30_dias_atras = datetime.datetime.now().date() - datetime.timedelta(days=30)
+
+    parts = {
+        # Totales en una sola pasada: sin asignar = total - asignados
+        'resumen': lambda: queryset.aggregate(
+            total=Count('id'),
+            asignados=Count('id', filter=Q(asesor__isnull=False)),
+            ultimos_30_dias=Count('id', filter=Q(fecha_captacion__gte=fecha_30_dias_atras)),
+        ),
+        'tipificaciones_por_asesor': lambda: list(queryset.filter(
+            asesor__isnull=False
+        ).values(
+            'asesor__username', 'asesor__first_name', 'asesor__last_name'
+        ).annotate(
+            total_leads=Count('id'),
+            citas_confirmadas=Count('id', filter=Q(tipificacion__in=TIPIFICACIONES_CITA)),
+            seguimiento=Count('id', filter=Q(tipificacion='SEGUIMIENTO')),
+            no_interesado=Count('id', filter=Q(tipificacion__icontains='NO INTERESADO')),
+            no_contesta=Count('id', filter=Q(tipificacion='NO CONTESTA')),
+        ).order_by('-total_leads')),
+        'rendimiento_personal_opc': lambda: list(queryset.values(
+            'personal_opc_captador__nombre', 'personal_opc_captador__rol'
+        ).annotate(
+            total_captados=Count('id'),
+            asignados=Count('id', filter=Q(asesor__isnull=False)),
+            con_citas=Count('id', filter=Q(tipificacion__in=TIPIFICACIONES_CITA)),
+        ).order_by('-total_captados')),
+        'distribucion_proyectos': lambda: list(
+            queryset.values('proyecto_interes').annotate(total=Count('id')).order_by('-total')
+        ),
+        'distribucion_medios': lambda: list(
+            queryset.values('medio').annotate(total=Count('id')).order_by('-total')
+        ),
+    }
+
+    def compose(results):
+        resumen = results['resumen']
+        total = resumen['total']
+        return {
+            'total_leads_opc': total,
+            'leads_asignados': resumen['asignados'],
+            'leads_sin_asignar': total - resumen['asignados'],
+            'porcentaje_asignacion': (resumen['asignados'] / total * 100) if total > 0 else 0,
+            'leads_ultimos_30_dias': resumen['ultimos_30_dias'],
+            'tipificaciones_por_asesor': results['tipificaciones_por_asesor'],
+            'rendimiento_personal_opc': results['rendimiento_personal_opc'],
+            'distribucion_proyectos': results['distribucion_proyectos'],
+            'distribucion_medios': results['distribucion_medios'],
+        }
+
+    return parts, compose
+
+
+def _dashboard_querysets(params):
+    leads_queryset = Lead.objects.all()
+    appointments_queryset = Appointment.objects.all()
+
+    if params.get('context') == 'gestion':
+        leads_queryset = leads_queryset.filter(es_directeo=False)
+
+    fecha_desde_str = params.get('fecha_desde')
+    if fecha_desde_str:
+        try:
+            fecha_desde = datetime.datetime.strptime(fecha_desde_str, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            raise MetricsError("Formato de fecha_desde inválido. Use'%Y-%m-%d'.", 400)
+        leads_queryset = leads_queryset.filter(fecha_creacion__gte=fecha_desde)
+        appointments_queryset = appointments_queryset.filter(fecha_creacion__gte=fecha_desde)
+
+    fecha_hasta_str = params.get('fecha_hasta')
+    if fecha_hasta_str:
+        try:
+            fecha_hasta = datetime.datetime.strptime(fecha_hasta_str, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            raise MetricsError("Formato de fecha_hasta inválido. Use'%Y-%m-%d'.", 400)
+        fecha_hasta = fecha_hasta + datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+        leads_queryset = leads_queryset.filter(fecha_creacion__lte=fecha_hasta)
+        appointments_queryset = appointments_queryset.filter(fecha_creacion__lte=fecha_hasta)
+
+    asesor_id = params.get('asesor_id')
+    if asesor_id:
+        try:
+            asesor = User.objects.select_related('opc_profile').get(id=asesor_id)
+        except User.DoesNotExist:
+            raise MetricsError("Asesor no encontrado.", 404)
+        except ValueError:
+            raise MetricsError("ID de asesor inválido.", 400)
+        leads_queryset = leads_queryset.filter(asesor=asesor)
+        condition = Q(asesor_comercial=asesor) | Q(asesor_presencial=asesor)
+        try:
+            condition |= Q(opc_personal_atendio=asesor.opc_profile)
+        except OPCPersonnel.DoesNotExist:
+            pass
+        appointments_queryset = appointments_queryset.filter(condition)
+
+    return leads_queryset, appointments_queryset
+
+
+def _counts_by(queryset, field, **aggregates):
+    """{valor de 'field': {agregado: n}} con un GROUP BY."""
+    rows = queryset.filter(**{f'{field}__isnull': False}).values(field).annotate(**aggregates).order_by()
+    return {row.pop(field): row for row in rows}
+
+
+def dashboard_report(params):
+    """
+    (partes, componer) del panel de control. Lanza MetricsError si los parámetros son
+    inválidos (la validación de asesor_id consulta la base de datos).
+    """
+    leads_queryset, appointments_queryset = _dashboard_querysets(params)
+    confirmadas = Count('id', filter=Q(has_ever_been_confirmed=True))
+    realizadas = Count('id', filter=Q(estado='Realizada'))
+
+    # Subconsultas IN por columna en vez de OR sobre LEFT JOINs + DISTINCT: así cada una usa su índice
+    users_with_activity = User.objects.filter(
+        Q(id__in=leads_queryset.values('asesor_id')) |
+        Q(id__in=appointments_queryset.values('asesor_comercial_id')) |
+        Q(id__in=appointments_queryset.values('asesor_presencial_id')) |
+        Q(opc_profile__id__in=appointments_queryset.values('opc_personal_atendio_id'))
+    ).order_by('username')
+
+    parts = {
+        'leads': lambda: leads_queryset.aggregate(
+            total=Count('id'),
+            gestionados=Count('id', filter=Q(tipificacion__isnull=False) & ~Q(tipificacion__exact='')),
+        ),
+        'citas': lambda: appointments_queryset.aggregate(confirmadas=confirmadas, presencias=realizadas),
+        'usuarios': lambda: list(users_with_activity.values_list('id', 'username', 'opc_profile__id')),
+        # Rendimiento por asesor con un GROUP BY por columna en lugar de consultas por asesor.
+        # Una cita cuenta una vez por asesor: las del asesor presencial excluyen las que ya
+        # cuentan para él como asesor comercial.
+        'leads_por_asesor': lambda: _counts_by(leads_queryset, 'asesor_id', total=Count('id')),
+        'citas_comercial': lambda: _counts_by(
+            appointments_queryset, 'asesor_comercial_id', confirmadas=confirmadas, presencias=realizadas
+        ),
+        'citas_presencial': lambda: _counts_by(
+            appointments_queryset.filter(
+                Q(asesor_comercial__isnull=True) | ~Q(asesor_comercial=F('asesor_presencial'))
+            ),
+            'asesor_presencial_id', confirmadas=confirmadas, presencias=realizadas
+        ),
+        'presencias_opc': lambda: _counts_by(
+            appointments_queryset.filter(estado='Realizada'), 'opc_personal_atendio_id', presencias=Count('id')
+        ),
+        'distritos': lambda: list(
+            leads_queryset.values('distrito').annotate(count=Count('distrito')).order_by('-count')[:10]
+        ),
+        'fuentes': lambda: list(
+            leads_queryset.values('medio').annotate(count=Count('medio')).order_by('-count')
+        ),
+    }
+
+    def compose(results):
+        total_leads_asignados = results['leads']['total']
+        leads_gestionados = results['leads']['gestionados']
+        citas_confirmadas = results['citas']['confirmadas']
+        presencias = results['citas']['presencias']
+
+        # Tasa de conversión a citas: citas confirmadas / leads gestionados
+        tasa_conversion_citas = (citas_confirmadas / leads_gestionados * 100) if leads_gestionados > 0 else 0
+        # Tasa de conversión a presencias (como estaba antes)
+        tasa_conversion_global = (presencias / citas_confirmadas * 100) if citas_confirmadas > 0 else 0
+
+        vacio = {'confirmadas': 0, 'presencias': 0}
+        asesores_data = []
+        for user_id, username, opc_profile_id in results['usuarios']:
+            comercial = results['citas_comercial'].get(user_id, vacio)
+            presencial = results['citas_presencial'].get(user_id, vacio)
+            asesor_citas_confirmadas = comercial['confirmadas'] + presencial['confirmadas']
+            asesor_presencias = comercial['presencias'] + presencial['presencias']
+            if opc_profile_id is not None:
+                asesor_presencias += results['presencias_opc'].get(opc_profile_id, {'presencias': 0})['presencias']
+            asesor_tasa_conversion = (asesor_presencias / asesor_citas_confirmadas * 100) if asesor_citas_confirmadas > 0 else 0
+            asesores_data.append({
+                'id': user_id,
+                'nombre': username,
+                'leads_asignados': results['leads_por_asesor'].get(user_id, {'total': 0})['total'],
+                'citas_confirmadas': asesor_citas_confirmadas,
+                'presencias': asesor_presencias,
+                'tasa_conversion': round(asesor_tasa_conversion, 2),
+            })
+
+        return {
+            'metricas_generales': {
+                'total_leads_asignados': total_leads_asignados,
+                'leads_gestionados': leads_gestionados,
+                'citas_confirmadas_global': citas_confirmadas,
+                'presencias_global': presencias,
+                'tasa_conversion_citas': round(tasa_conversion_citas, 2),
+                'tasa_conversion_global': round(tasa_conversion_global, 2),
+            },
+            'rendimiento_asesores': asesores_data,
+            'distribucion_distritos': [
+                {'name': d['distrito'] if d['distrito'] else 'Sin Distrito', 'value': d['count']}
+                for d in results['distritos']
+            ],
+            'fuente_leads': [
+                {'name': m['medio'] if m['medio'] else 'Sin Medio', 'value': m['count']}
+                for m in results['fuentes']
+            ],
+            'embudo_ventas': [
+                {'name': 'Leads Asignados', 'value': total_leads_asignados},
+                {'name': 'Citas Confirmadas', 'value': citas_confirmadas},
+                {'name': 'Presencias', 'value': presencias},
+            ],
+        }
+
+    return parts, compose
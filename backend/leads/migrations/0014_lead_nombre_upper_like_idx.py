@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:56
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0013_lead_es_directeo_user_rol'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nombre'), name='text_pattern_ops'), name='lead_nombre_upper_like_idx'),
+        ),
+    ]
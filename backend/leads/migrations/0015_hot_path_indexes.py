@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:58
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('leads', '0014_lead_nombre_upper_like_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='action',
+            index=models.Index(fields=['-fecha_accion'], name='action_fecha_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='action',
+            index=models.Index(fields=['lead', '-fecha_accion'], name='action_lead_fecha_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['-fecha_hora'], name='appt_fecha_hora_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['estado', 'has_ever_been_confirmed', 'fecha_creacion'], name='appt_estado_conf_creacion_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['fecha_creacion'], name='appt_fecha_creacion_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['-fecha_creacion'], name='lead_fecha_creacion_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['es_directeo', '-fecha_creacion'], name='lead_directeo_creacion_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('es_lead_opc', True)), fields=['fecha_captacion'], name='lead_opc_captacion_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['asesor', 'tipificacion'], name='lead_asesor_tipif_idx'),
+        ),
+    ]
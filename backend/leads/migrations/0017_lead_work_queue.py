@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('leads', '0016_conditional_get_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='reservado_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leads_reservados', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='reservado_hasta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # El índice nuevo cubre al anterior (mismo prefijo): se crea antes de eliminarlo
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['asesor', 'tipificacion', 'ultima_actualizacion'], name='lead_asesor_tipif_act_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='lead',
+            name='lead_asesor_tipif_idx',
+        ),
+    ]
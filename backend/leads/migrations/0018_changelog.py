@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0017_lead_work_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('transaccion', models.BigIntegerField(db_default=models.Func(function='txid_current', output_field=models.BigIntegerField()))),
+                ('entidad', models.CharField(choices=[('lead', 'Lead'), ('appointment', 'Cita'), ('duplicate', 'Duplicado')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('operacion', models.CharField(choices=[('crear', 'Crear'), ('actualizar', 'Actualizar'), ('eliminar', 'Eliminar')], max_length=20)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['transaccion', 'id'], name='changelog_cursor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0018_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('jti', models.CharField(blank=True, default='', max_length=255)),
+                ('motivo', models.CharField(max_length=50)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='token_revocation_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0019_token_revocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('huella', models.CharField(max_length=32)),
+                ('dia', models.DateField()),
+                ('sql', models.TextField()),
+                ('origen', models.CharField(blank=True, default='', max_length=255)),
+                ('plan', models.TextField(blank=True, default='')),
+                ('llamadas', models.BigIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('ultima_vez', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dia'], name='slowquery_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('huella', 'dia'), name='slowquery_huella_dia_uniq')],
+            },
+        ),
+    ]
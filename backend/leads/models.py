@@ -1,9 +1,26 @@
 # backend/leads/models.py
 
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
-
-class User(AbstractUser):
+from django.contrib.postgres.indexes import OpClass
+
+class TrackLoadedValuesMixin:
+    """
+    Guarda los valores con los que se cargó la instancia para saber qué campos cambió un save()
+    (eventos en vivo y revocación de tokens). Solo se conocen en instancias leídas de la base de datos.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            field.attname: getattr(instance, field.attname)
+            for field in cls._meta.concrete_fields if field.attname in instance.__dict__
+        }
+        return instance
+
+class User(TrackLoadedValuesMixin, AbstractUser):
     groups = models.ManyToManyField(
         'auth.Group',
         verbose_name='groups',
@@ -29,6 +46,7 @@ class User(AbstractUser):
         # Futuro: ('MULTI', 'Operador/OPC/Asesor Presencial')
     ]
     rol = models.CharField(max_length=30, choices=ROL_CHOICES, default='OPERADOR', help_text='Rol principal del usuario en el CRM')
+    ultima_actualizacion = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.username
@@ -56,11 +74,12 @@ class OPCPersonnel(models.Model):
     )
 
     horario_semanal = models.JSONField(default=dict, blank=True, null=True)
+    ultima_actualizacion = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nombre} ({self.rol})"
 
-class Lead(models.Model):
+class Lead(TrackLoadedValuesMixin, models.Model):
     asesor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_leads')
 
     # CORRECCIÓN: Renombrar 'proyecto' a 'ubicacion'. Este campo se usa para la ubicación física de captación.
@@ -135,6 +154,28 @@ class Lead(models.Model):
 
     es_directeo = models.BooleanField(default=False, help_text='Indica si el lead fue captado y gestionado completamente por OPC (directeo)')
 
+    # Reserva de la cola de llamadas (/api/work-queue/): vence en 'reservado_hasta' o al tipificar
+    reservado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='leads_reservados')
+    reservado_hasta = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Typeahead (/api/lookup/leads/): UPPER(nombre) LIKE 'TEXTO%'
+            models.Index(OpClass(Upper('nombre'), name='text_pattern_ops'), name='lead_nombre_upper_like_idx'),
+            # Listado sin contexto (ORDER BY -fecha_creacion) y rangos de fecha del dashboard
+            models.Index(fields=['-fecha_creacion'], name='lead_fecha_creacion_idx'),
+            # Listados context=gestion / context=opc: WHERE es_directeo = ... ORDER BY -fecha_creacion
+            models.Index(fields=['es_directeo', '-fecha_creacion'], name='lead_directeo_creacion_idx'),
+            # Métricas OPC: WHERE es_lead_opc AND fecha_captacion BETWEEN ...
+            models.Index(fields=['fecha_captacion'], condition=models.Q(es_lead_opc=True), name='lead_opc_captacion_idx'),
+            # Filtro por asesor + tipificación (listado y métricas por asesor) y cola de llamadas,
+            # que sondea cada nivel con WHERE asesor_id = ... (o IS NULL) AND tipificacion = ...
+            # ORDER BY ultima_actualizacion LIMIT 1 FOR UPDATE SKIP LOCKED (ver work_queue.claim_next)
+            models.Index(fields=['asesor', 'tipificacion', 'ultima_actualizacion'], name='lead_asesor_tipif_act_idx'),
+            # ETag/Last-Modified: MAX(ultima_actualizacion) sin recorrer la tabla
+            models.Index(fields=['ultima_actualizacion'], name='lead_ultima_act_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         # Auto-marcar como lead OPC si tiene personal OPC asignado
         if self.personal_opc_captador and not self.es_lead_opc:
@@ -158,8 +199,14 @@ class Action(models.Model):
 
     class Meta:
         ordering = ['-fecha_accion']
-
-class Appointment(models.Model):
+        indexes = [
+            # Listado de acciones (ORDER BY -fecha_accion)
+            models.Index(fields=['-fecha_accion'], name='action_fecha_idx'),
+            # Historial de un lead: WHERE lead_id = ... ORDER BY -fecha_accion
+            models.Index(fields=['lead', '-fecha_accion'], name='action_lead_fecha_idx'),
+        ]
+
+class Appointment(TrackLoadedValuesMixin, models.Model):
     lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='appointments')
     asesor_comercial = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='scheduled_appointments')
     asesor_presencial = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='attended_appointments')
@@ -189,6 +236,15 @@ class Appointment(models.Model):
 
     class Meta:
         ordering = ['fecha_hora']
+        indexes = [
+            # Listado y calendario de citas (ORDER BY -fecha_hora, rangos fecha_hora_gte/lte)
+            models.Index(fields=['-fecha_hora'], name='appt_fecha_hora_idx'),
+            # Dashboard: presencias/confirmadas (estado, has_ever_been_confirmed) y rangos de fecha_creacion
+            models.Index(fields=['estado', 'has_ever_been_confirmed', 'fecha_creacion'], name='appt_estado_conf_creacion_idx'),
+            models.Index(fields=['fecha_creacion'], name='appt_fecha_creacion_idx'),
+            # ETag/Last-Modified: MAX(ultima_actualizacion) sin recorrer la tabla
+            models.Index(fields=['ultima_actualizacion'], name='appt_ultima_act_idx'),
+        ]
 
 class LeadDuplicate(models.Model):
     original_lead = models.ForeignKey(Lead, on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
@@ -210,4 +266,90 @@ class LeadDuplicate(models.Model):
     calle_o_modulo = models.CharField(max_length=10, blank=True, null=True)
 
     def __str__(self):
-        return f"Duplicado: {self.nombre} - {self.celular} (Estado: {self.estado})"
\ No newline at end of file
+        return f"Duplicado: {self.nombre} - {self.celular} (Estado: {self.estado})"
+
+class ChangeLog(models.Model):
+    """
+    Secuencia de cambios de leads, citas y duplicados para /api/changes/ (sincronización
+    incremental). Las eliminaciones quedan como tombstones (operacion='eliminar').
+
+    'transaccion' es el id de la transacción que escribió la fila (txid_current()): el feed solo
+    entrega filas de transacciones ya confirmadas, en orden (transaccion, id).
+    """
+    ENTIDAD_CHOICES = [
+        ('lead', 'Lead'),
+        ('appointment', 'Cita'),
+        ('duplicate', 'Duplicado'),
+    ]
+    OPERACION_CHOICES = [
+        ('crear', 'Crear'),
+        ('actualizar', 'Actualizar'),
+        ('eliminar', 'Eliminar'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    transaccion = models.BigIntegerField(
+        db_default=models.Func(function='txid_current', output_field=models.BigIntegerField())
+    )
+    entidad = models.CharField(max_length=20, choices=ENTIDAD_CHOICES)
+    objeto_id = models.BigIntegerField()
+    operacion = models.CharField(max_length=20, choices=OPERACION_CHOICES)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.operacion} {self.entidad} {self.objeto_id}"
+
+    class Meta:
+        indexes = [
+            # Feed: WHERE (transaccion, id) > cursor ORDER BY transaccion, id
+            models.Index(fields=['transaccion', 'id'], name='changelog_cursor_idx'),
+        ]
+
+class TokenRevocation(models.Model):
+    """
+    Lista de revocación de JWT (leads/authentication.py). Sin 'jti' revoca todos los tokens del
+    usuario emitidos antes de 'fecha' (cambio de contraseña, rol o desactivación); con 'jti',
+    solo ese token (cierre de sesión). user_id no es FK: la revocación sobrevive al usuario.
+    """
+    user_id = models.BigIntegerField()
+    jti = models.CharField(max_length=255, blank=True, default='')
+    motivo = models.CharField(max_length=50)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Carga de la lista vigente: WHERE fecha >= ahora - vida del refresh token
+            models.Index(fields=['fecha'], name='token_revocation_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Revocación {self.motivo} usuario {self.user_id} {self.jti or '(todos)'}"
+
+class SlowQuery(models.Model):
+    """
+    Consultas lentas por huella (SQL normalizada, sin valores) y día (leads/slow_queries.py).
+    'plan' es el EXPLAIN (ANALYZE, BUFFERS) de la primera aparición de la huella en un proceso
+    y 'origen', la línea del código de la aplicación que lanzó la consulta.
+    """
+    huella = models.CharField(max_length=32)
+    dia = models.DateField()
+    sql = models.TextField()
+    origen = models.CharField(max_length=255, blank=True, default='')
+    plan = models.TextField(blank=True, default='')
+    llamadas = models.BigIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    ultima_vez = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Destino del upsert de slow_queries.flush: ON CONFLICT (huella, dia)
+            models.UniqueConstraint(fields=['huella', 'dia'], name='slowquery_huella_dia_uniq'),
+        ]
+        indexes = [
+            # Ranking de los últimos días: WHERE dia >= ...
+            models.Index(fields=['dia'], name='slowquery_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.huella} {self.dia}: {self.llamadas} llamadas, {self.total_ms:.0f} ms"
@@ -0,0 +1,252 @@
+# backend/leads/monitoring.py
+"""
+Métricas en formato Prometheus (/metrics) de la API, la importación de CSV, los webhooks a la
+app comercial, las cachés, las conexiones a la base de datos y su pool.
+
+Los contadores viven en el proceso. Con varios workers (gunicorn/uvicorn) se define la
+variable de entorno PROMETHEUS_MULTIPROC_DIR con un directorio local compartido, vacío al
+arrancar: cada proceso escribe ahí sus valores y /metrics los suma todos (modo multiproceso
+de prometheus_client). Sin la variable, /metrics muestra solo los del proceso que responde.
+
+prometheus_client es opcional: sin él las funciones de registro no hacen nada y /metrics
+responde 501.
+"""
+
+import os
+import time
+
+import requests
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'crm_http_request_duration_seconds', 'Latencia de las peticiones por vista y estado.',
+        ['view', 'method', 'status'],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    )
+    REQUEST_QUERIES = Counter(
+        'crm_http_request_queries_total', 'Consultas a la base de datos hechas por las peticiones.', ['view'],
+    )
+    REQUEST_DB_SECONDS = Counter(
+        'crm_http_request_db_seconds_total', 'Tiempo en la base de datos de las peticiones.', ['view'],
+    )
+    DB_CONNECTIONS_OPENED = Counter(
+        'crm_db_connections_opened_total', 'Conexiones a la base de datos abiertas (o tomadas del pool).', ['alias'],
+    )
+    DB_POOL_CONNECTIONS = Gauge(
+        'crm_db_pool_connections', 'Conexiones del pool por estado (en_uso/libre).', ['alias', 'state'],
+        multiprocess_mode='livesum',
+    )
+    DB_POOL_MAX = Gauge(
+        'crm_db_pool_max_connections', 'Tamaño máximo del pool.', ['alias'], multiprocess_mode='livesum',
+    )
+    DB_POOL_SATURATION = Gauge(
+        'crm_db_pool_saturation', 'Fracción del máximo del pool en uso (1 = agotado) en el proceso más cargado.',
+        ['alias'], multiprocess_mode='max',
+    )
+    DB_POOL_WAITING = Gauge(
+        'crm_db_pool_waiting', 'Peticiones esperando una conexión del pool.', ['alias'], multiprocess_mode='livesum',
+    )
+    DB_POOL_REQUESTS = Counter(
+        'crm_db_pool_requests_total', 'Conexiones pedidas al pool.', ['alias'],
+    )
+    DB_POOL_QUEUED = Counter(
+        'crm_db_pool_requests_queued_total', 'Peticiones al pool que esperaron por no haber conexiones libres.', ['alias'],
+    )
+    DB_POOL_WAIT_SECONDS = Counter(
+        'crm_db_pool_wait_seconds_total', 'Tiempo total esperando una conexión del pool.', ['alias'],
+    )
+    DB_POOL_TIMEOUTS = Counter(
+        'crm_db_pool_timeouts_total', 'Peticiones al pool sin conexión tras DATABASE_POOL_TIMEOUT.', ['alias'],
+    )
+    DB_POOL_CONNECTIONS_LOST = Counter(
+        'crm_db_pool_connections_lost_total', 'Conexiones del pool descartadas por el chequeo previo.', ['alias'],
+    )
+    DB_POOL_CONNECTION_ERRORS = Counter(
+        'crm_db_pool_connection_errors_total', 'Errores al abrir conexiones nuevas del pool.', ['alias'],
+    )
+    IMPORT_ROWS = Counter(
+        'crm_import_rows_total', 'Filas procesadas en las importaciones de leads por resultado.', ['resultado'],
+    )
+    IMPORT_DURATION = Histogram(
+        'crm_import_duration_seconds', 'Duración de las importaciones de leads.',
+        buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+    )
+    IMPORT_ROWS_PER_SECOND = Gauge(
+        'crm_import_rows_per_second', 'Filas por segundo de la última importación.', multiprocess_mode='mostrecent',
+    )
+    IMPORT_FAILURES = Counter(
+        'crm_import_failures_total', 'Importaciones rechazadas o interrumpidas por un error.', ['motivo'],
+    )
+    WEBHOOK_LATENCY = Histogram(
+        'crm_webhook_duration_seconds', 'Latencia de los envíos de webhooks a la app comercial.', ['tipo'],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    WEBHOOK_DELIVERIES = Counter(
+        'crm_webhook_deliveries_total', 'Envíos de webhooks por resultado.', ['tipo', 'resultado'],
+    )
+    CACHE_REQUESTS = Counter(
+        'crm_cache_requests_total', 'Lecturas de caché por caché y resultado (hit/miss).', ['cache', 'resultado'],
+    )
+
+
+def is_multiprocess():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def observe_request(view, method, status, seconds, queries, db_seconds):
+    if prometheus_client is None:
+        return
+    REQUEST_LATENCY.labels(view, method, str(status)).observe(seconds)
+    if queries:
+        REQUEST_QUERIES.labels(view).inc(queries)
+        REQUEST_DB_SECONDS.labels(view).inc(db_seconds)
+
+
+def count_connection(sender, connection, **kwargs):
+    """Receptor de connection_created."""
+    if prometheus_client is not None:
+        DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+
+
+# alias -> pool de las conexiones que ya se tomaron en este proceso. Solo esos: pedir
+# connection.pool antes de conectar crearía el pool con la configuración de ese momento
+# (por ejemplo, antes de que los tests cambien NAME por la base de pruebas)
+_pools = {}
+
+
+def observe_pools(sender=None, connection=None, **kwargs):
+    """
+    Vuelca las estadísticas de los pools del proceso en las métricas. Es receptor de
+    connection_created (con pool, cada vez que se toma una conexión) y de request_finished, y
+    se llama al servir /metrics. pop_stats() reinicia los contadores del pool: lo acumulado
+    pasa a los Counter y no se cuenta dos veces.
+    """
+    if prometheus_client is None:
+        return
+    if connection is not None and connection.vendor == 'postgresql' and connection.pool is not None:
+        _pools[connection.alias] = connection.pool
+    for alias, pool in list(_pools.items()):
+        stats = pool.pop_stats()
+        size, available, maximum = stats.get('pool_size', 0), stats.get('pool_available', 0), stats.get('pool_max', 0)
+        DB_POOL_CONNECTIONS.labels(alias, 'en_uso').set(size - available)
+        DB_POOL_CONNECTIONS.labels(alias, 'libre').set(available)
+        DB_POOL_MAX.labels(alias).set(maximum)
+        DB_POOL_SATURATION.labels(alias).set((size - available) / maximum if maximum else 0)
+        DB_POOL_WAITING.labels(alias).set(stats.get('requests_waiting', 0))
+        for counter, key, scale in (
+            (DB_POOL_REQUESTS, 'requests_num', 1),
+            (DB_POOL_QUEUED, 'requests_queued', 1),
+            (DB_POOL_WAIT_SECONDS, 'requests_wait_ms', 0.001),
+            (DB_POOL_TIMEOUTS, 'requests_errors', 1),
+            (DB_POOL_CONNECTIONS_LOST, 'connections_lost', 1),
+            (DB_POOL_CONNECTION_ERRORS, 'connections_errors', 1),
+        ):
+            counter.labels(alias).inc(stats.get(key, 0) * scale)
+
+
+def cache_lookup(cache_name, hit):
+    if prometheus_client is not None:
+        CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def observe_import(filas_por_resultado, seconds):
+    """Una importación terminada: filas por resultado ('creado', 'error', ...) y su duración."""
+    if prometheus_client is None:
+        return
+    for resultado, filas in filas_por_resultado.items():
+        if filas:
+            IMPORT_ROWS.labels(resultado).inc(filas)
+    IMPORT_DURATION.observe(seconds)
+    if seconds > 0:
+        IMPORT_ROWS_PER_SECOND.set(sum(filas_por_resultado.values()) / seconds)
+
+
+def import_failed(motivo):
+    if prometheus_client is not None:
+        IMPORT_FAILURES.labels(motivo).inc()
+
+
+class WebhookDelivery:
+    """
+    Mide un envío de webhook:
+
+        with monitoring.WebhookDelivery('presencia') as delivery:
+            response = requests.post(...)
+            delivery.set_status(response.status_code)
+
+    Una excepción dentro del bloque cuenta como 'error_conexion' (de requests) o 'error'.
+    """
+
+    def __init__(self, tipo):
+        self.tipo = tipo
+        self.resultado = 'ok'
+
+    def set_status(self, status_code):
+        self.resultado = 'ok' if status_code == 200 else 'error_http'
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.resultado = 'error_conexion' if issubclass(exc_type, requests.RequestException) else 'error'
+        webhook_delivery(self.tipo, self.resultado, time.perf_counter() - self.start)
+        return False
+
+
+def webhook_delivery(tipo, resultado, seconds=None):
+    if prometheus_client is None:
+        return
+    WEBHOOK_DELIVERIES.labels(tipo, resultado).inc()
+    if seconds is not None:
+        WEBHOOK_LATENCY.labels(tipo).observe(seconds)
+
+
+class DatabaseConnectionsCollector:
+    """Conexiones abiertas contra la base de datos por estado (pg_stat_activity), al consultar /metrics."""
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            'crm_db_connections', 'Conexiones a la base de datos de la aplicación por estado.', labels=['state'],
+        )
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor == 'postgresql':
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT coalesce(state, 'desconocido'), count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() GROUP BY 1"
+                    )
+                    for state, count in cursor.fetchall():
+                        gauge.add_metric([state], count)
+            except DatabaseError:
+                pass
+        yield gauge
+
+
+class _ProcessCollector:
+    """Las métricas de este proceso (REGISTRY global) dentro del registro de /metrics."""
+
+    def collect(self):
+        return prometheus_client.REGISTRY.collect()
+
+
+def render_metrics():
+    """(contenido, content type) de /metrics."""
+    observe_pools()
+    registry = CollectorRegistry()
+    if is_multiprocess():
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(_ProcessCollector())
+    registry.register(DatabaseConnectionsCollector())
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
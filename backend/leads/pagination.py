@@ -0,0 +1,151 @@
+# backend/leads/pagination.py
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from . import monitoring
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ActionCursorPagination(CursorPagination):
+    """
+    Historial de acciones paginado por cursor: cada página es un 'WHERE fecha_accion < ...'
+    sobre el índice, sin COUNT ni OFFSET, por largo que sea el historial.
+    """
+    ordering = ('-fecha_accion', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class _ApproximatePage(Page):
+    """Página cuyo 'has_next' se decide leyendo una fila extra, no con el total estimado."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self._has_more = has_more
+
+    def has_next(self):
+        return self._has_more
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator que evita el COUNT(*) exacto en listados grandes.
+
+    - En PostgreSQL pide al planificador una estimación de filas (EXPLAIN). Si supera
+      PAGINATION_COUNT_ESTIMATE_THRESHOLD se usa la estimación y el conteo se marca como aproximado.
+    - Por debajo del umbral (o en otros motores) se hace el COUNT exacto, cacheado durante
+      PAGINATION_COUNT_CACHE_TTL segundos con una clave derivada del SQL filtrado.
+    """
+
+    @property
+    def estimate_threshold(self):
+        return getattr(settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', 10000)
+
+    @property
+    def cache_ttl(self):
+        return getattr(settings, 'PAGINATION_COUNT_CACHE_TTL', 30)
+
+    def _count_queryset(self):
+        # El ORDER BY no cambia el total y encarece tanto el EXPLAIN como el COUNT
+        return self.object_list.order_by()
+
+    def _cache_key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params!r}'.encode('utf-8')).hexdigest()
+        return f'paginator_count:{queryset.db}:{digest}'
+
+    def _planner_estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.query.sql_with_params()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def _exact_count(self, queryset):
+        key = self._cache_key(queryset)
+        total = cache.get(key)
+        monitoring.cache_lookup('paginacion_count', total is not None)
+        if total is None:
+            total = queryset.count()
+            cache.set(key, total, self.cache_ttl)
+        return total
+
+    @cached_property
+    def _count_info(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count, False
+        queryset = self._count_queryset()
+        estimate = self._planner_estimate(queryset)
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate, True
+        return self._exact_count(queryset), False
+
+    @property
+    def count(self):
+        return self._count_info[0]
+
+    @property
+    def count_is_approximate(self):
+        return self._count_info[1]
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super().validate_number(number)
+        # Con un total estimado no se puede confiar en num_pages para rechazar páginas altas
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        has_more = len(rows) > self.per_page
+        return _ApproximatePage(rows[:self.per_page], number, self, has_more)
+
+
+class ApproximateCountPagination(StandardResultsSetPagination):
+    """Paginación por número de página con conteo estimado/cacheado para listados grandes."""
+    django_paginator_class = ApproximateCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_approximate': self.page.paginator.count_is_approximate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
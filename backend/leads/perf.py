@@ -0,0 +1,247 @@
+# backend/leads/perf.py
+"""
+Instrumentación de rendimiento por petición (ver crm_backend.middleware.PerformanceMiddleware).
+
+Cada petición lleva un RequestStats en una contextvar: el execute_wrapper que se instala en
+cada conexión (señal connection_created) suma ahí el número de consultas y su tiempo, y
+TimedJSONRenderer el tiempo de serialización de las respuestas de DRF. Las contextvars
+pasan a los hilos de sync_to_async y a los del executor de métricas, así que también se
+cuentan las consultas de las vistas async.
+
+Al terminar la petición se acumula en el registro del proceso, por ruta ('MÉTODO nombre_de_vista'):
+histogramas de latencia y de número de consultas y sumas de tiempos, que se consultan en
+/api/_perf/. Las peticiones que superan PERF_SLOW_REQUEST_MS se registran en el log
+'leads.perf' con sus consultas más costosas. En respuestas en streaming (export, eventos) se
+mide hasta entregar la respuesta, no hasta terminar de enviarla.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (inclusivos) de los histogramas; el último cubo es +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# SQL distintas que se guardan por petición (el resto solo suma a los totales)
+MAX_DISTINCT_SQL = 200
+SLOW_REQUEST_TOP_SQL = 5
+SLOW_REQUEST_SQL_CHARS = 300
+# Consultas que guarda la cronología de una petición perfilada (ver leads/profiling.py)
+MAX_TIMELINE_QUERIES = 1000
+
+_current = contextvars.ContextVar('perf_request_stats', default=None)
+
+
+def get_slow_request_ms():
+    return getattr(settings, 'PERF_SLOW_REQUEST_MS', 500)
+
+
+class RequestStats:
+    """Consultas y tiempos de una petición. Puede recibir consultas de varios hilos a la vez."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        # sql (sin parámetros) -> [veces, segundos]: un N+1 aparece como una SQL repetida
+        self.sql = {}
+        # (inicio en s desde el comienzo de la petición, duración en s, sql), solo si se perfila
+        self.timeline = None
+        self._lock = threading.Lock()
+
+    def start_timeline(self):
+        self.timeline = []
+
+    def add_query(self, sql, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            if self.timeline is not None and len(self.timeline) < MAX_TIMELINE_QUERIES:
+                self.timeline.append((time.perf_counter() - seconds - self.started, seconds, sql))
+            entry = self.sql.get(sql)
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += seconds
+            elif len(self.sql) < MAX_DISTINCT_SQL:
+                self.sql[sql] = [1, seconds]
+
+    def add_render(self, seconds):
+        with self._lock:
+            self.render_seconds += seconds
+
+    def top_sql(self, limit=SLOW_REQUEST_TOP_SQL):
+        with self._lock:
+            entries = sorted(self.sql.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'sql': sql[:SLOW_REQUEST_SQL_CHARS], 'veces': count, 'ms': round(seconds * 1000, 2)}
+            for sql, (count, seconds) in entries
+        ]
+
+
+def start_request():
+    """Empieza a medir la petición actual. Devuelve el token para end_request()."""
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_stats():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper de las conexiones: mide las consultas si hay una petición en curso."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Receptor de connection_created: instala record_query una sola vez por conexión."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer que suma a la petición en curso el tiempo de serialización."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.add_render(time.perf_counter() - start)
+
+
+def _bucket_index(bounds, value):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.max_ms = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.query_buckets = [0] * (len(QUERY_BUCKETS) + 1)
+
+    def add(self, total_ms, stats, status_code):
+        self.count += 1
+        if status_code >= 500:
+            self.errors += 1
+        self.total_ms += total_ms
+        self.db_ms += stats.db_seconds * 1000
+        self.render_ms += stats.render_seconds * 1000
+        self.queries += stats.queries
+        self.max_queries = max(self.max_queries, stats.queries)
+        self.max_ms = max(self.max_ms, total_ms)
+        self.latency_buckets[_bucket_index(LATENCY_BUCKETS_MS, total_ms)] += 1
+        self.query_buckets[_bucket_index(QUERY_BUCKETS, stats.queries)] += 1
+
+    def percentile_ms(self, fraction):
+        """Límite superior del cubo que contiene el percentil (None si cae en +Inf)."""
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.latency_buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def as_dict(self):
+        count = self.count or 1
+        return {
+            'peticiones': self.count,
+            'errores_5xx': self.errors,
+            'latencia_media_ms': round(self.total_ms / count, 2),
+            'latencia_max_ms': round(self.max_ms, 2),
+            'latencia_p50_ms': self.percentile_ms(0.5),
+            'latencia_p95_ms': self.percentile_ms(0.95),
+            'db_media_ms': round(self.db_ms / count, 2),
+            'serializacion_media_ms': round(self.render_ms / count, 2),
+            'consultas_media': round(self.queries / count, 2),
+            'consultas_max': self.max_queries,
+            'histograma_latencia_ms': _histogram(LATENCY_BUCKETS_MS, self.latency_buckets),
+            'histograma_consultas': _histogram(QUERY_BUCKETS, self.query_buckets),
+        }
+
+
+def _histogram(bounds, counts):
+    return {str(bound): count for bound, count in zip(bounds + ('+Inf',), counts)}
+
+
+class PerfRegistry:
+    """Estadísticas agregadas por ruta del proceso actual."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, total_ms, stats, status_code):
+        with self._lock:
+            route_stats = self._routes.get(route)
+            if route_stats is None:
+                route_stats = self._routes[route] = RouteStats()
+            route_stats.add(total_ms, stats, status_code)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: stats.as_dict() for route, stats in sorted(self._routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = PerfRegistry()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match.route) if match else 'sin_ruta'
+
+
+def route_name(request):
+    return f'{request.method} {view_name(request)}'
+
+
+def finish_request(request, response, stats):
+    """
+    Acumula la petición en el registro y deja constancia en el log si fue lenta. Devuelve
+    la duración total en milisegundos.
+    """
+    total_ms = (time.perf_counter() - stats.started) * 1000
+    route = route_name(request)
+    registry.record(route, total_ms, stats, response.status_code)
+    if total_ms >= get_slow_request_ms():
+        logger.warning(
+            'Petición lenta %s %s (%s): %.0f ms, %d consultas (%.0f ms en BD, %.0f ms serializando). Consultas más costosas: %s',
+            request.method, request.path, route, total_ms, stats.queries, stats.db_seconds * 1000,
+            stats.render_seconds * 1000, stats.top_sql(),
+        )
+    return total_ms
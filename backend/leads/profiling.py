@@ -0,0 +1,248 @@
+# backend/leads/profiling.py
+"""
+Perfilado bajo demanda de peticiones (ver crm_backend.middleware.ProfilingMiddleware).
+
+Se perfila una petición si envía PROFILING_TOKEN en la cabecera X-Profile (o en ?_profile=),
+o al azar con probabilidad PROFILING_SAMPLE_RATE. La vista, incluida la serialización de la
+respuesta, se ejecuta bajo cProfile, y en PROFILING_DIR se guardan dos archivos:
+
+- <id>.prof: formato pstats, para abrirlo con `python -m pstats` o snakeviz.
+- <id>.json: ruta, vista, parámetros, estado, duración, funciones más costosas y la
+  cronología de consultas SQL.
+
+La respuesta lleva el id en la cabecera X-Profile-Id. Los perfiles se listan y se descargan en
+/api/_profiles/, y solo se conservan los PROFILING_MAX_FILES más recientes.
+
+Sin perfilado, el coste por petición es leer una cabecera (más un random() si hay muestreo).
+Cada proceso perfila una sola petición a la vez; las demás siguen sin perfilar. cProfile solo
+ve el hilo que ejecuta la vista. En las vistas async se mide el bucle de eventos mientras la
+vista espera, pero no el trabajo de los hilos del executor.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from . import perf
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+TOP_FUNCTIONS = 30
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+# Parámetros cuyo valor no se guarda en el perfil (el JWT de ?token= de /api/events/, claves...)
+SENSITIVE_PARAM_RE = re.compile(r'token|passw|secret|api_?key', re.IGNORECASE)
+REDACTED = '[oculto]'
+
+# Un solo perfil a la vez por proceso (cProfile no admite varios perfiladores activos en 3.12+)
+_active = threading.Lock()
+
+
+def get_profiles_dir():
+    return getattr(settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def should_profile(request):
+    """Motivo para perfilar la petición ('solicitado' o 'muestreo') o None."""
+    token = getattr(settings, 'PROFILING_TOKEN', '')
+    if token:
+        given = request.headers.get(PROFILE_HEADER)
+        if given is None and f'{PROFILE_PARAM}=' in request.META.get('QUERY_STRING', ''):
+            given = request.GET.get(PROFILE_PARAM)
+        if given and constant_time_compare(given, token):
+            return 'solicitado'
+    rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return 'muestreo'
+    return None
+
+
+def safe_params(query_dict):
+    """Parámetros de la query string para el perfil, sin ?_profile= y con los sensibles ocultos."""
+    return {
+        key: [REDACTED] * len(values) if SENSITIVE_PARAM_RE.search(key) else values
+        for key, values in query_dict.lists()
+        if key != PROFILE_PARAM
+    }
+
+
+class Capture:
+    """Un perfil en curso: cProfile más la cronología de SQL de la petición."""
+
+    def __init__(self, request, motivo):
+        self.request = request
+        self.motivo = motivo
+        self.profiler = cProfile.Profile()
+        self.stats = perf.current_stats()
+        if self.stats is not None:
+            self.stats.start_timeline()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        self.seconds = time.perf_counter() - self.started
+        return False
+
+    def save(self, response):
+        """Guarda el perfil y pone la cabecera X-Profile-Id en la respuesta. Un error al escribir no afecta a la petición."""
+        try:
+            self._save(response)
+        except OSError:
+            logger.exception('No se pudo guardar el perfil de %s %s', self.request.method, self.request.path)
+
+    def _save(self, response):
+        now = timezone.now()
+        profile_id = f'{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+        directory = get_profiles_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+        data = {
+            'id': profile_id,
+            'fecha': now.isoformat(),
+            'motivo': self.motivo,
+            'pid': os.getpid(),
+            'metodo': self.request.method,
+            'ruta': self.request.path,
+            'vista': perf.view_name(self.request),
+            'parametros': safe_params(self.request.GET),
+            'estado': response.status_code if response is not None else 500,
+            'duracion_ms': round(self.seconds * 1000, 2),
+            **self.sql_summary(),
+            'funciones': self.top_functions(),
+        }
+        with open(os.path.join(directory, f'{profile_id}.json'), 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+        prune(directory)
+        if response is not None:
+            response['X-Profile-Id'] = profile_id
+
+    def sql_summary(self):
+        if self.stats is None:
+            return {'consultas': None, 'db_ms': None, 'sql': []}
+        timeline = self.stats.timeline or []
+        self.stats.timeline = None
+        return {
+            'consultas': self.stats.queries,
+            'db_ms': round(self.stats.db_seconds * 1000, 2),
+            'sql': [
+                {'inicio_ms': round(start * 1000, 2), 'ms': round(seconds * 1000, 2), 'sql': sql}
+                for start, seconds, sql in timeline
+            ],
+        }
+
+    def top_functions(self):
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+        return [
+            {
+                'funcion': f'{filename}:{line}({name})',
+                'llamadas': calls,
+                'propio_ms': round(own * 1000, 2),
+                'acumulado_ms': round(cumulative * 1000, 2),
+            }
+            for (filename, line, name), (_, calls, own, cumulative, _) in rows
+        ]
+
+
+def _render(response):
+    # Las respuestas de DRF se serializan después de la vista: se incluye en el perfil
+    if response is not None and callable(getattr(response, 'render', None)) and not response.is_rendered:
+        response.render()
+    return response
+
+
+def profile_view(request, motivo, view_func, view_args, view_kwargs):
+    """
+    Ejecuta una vista síncrona bajo el perfilador y devuelve su respuesta. None si ya hay otro
+    perfil en curso en el proceso (la vista se ejecuta después con normalidad).
+    """
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        response = None
+        capture = Capture(request, motivo)
+        try:
+            with capture:
+                response = _render(view_func(request, *view_args, **view_kwargs))
+        finally:
+            capture.save(response)
+        return response
+    finally:
+        _active.release()
+
+
+async def aprofile_view(request, motivo, view_func, view_args, view_kwargs):
+    """profile_view para vistas async."""
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        response = None
+        capture = Capture(request, motivo)
+        try:
+            with capture:
+                response = _render(await view_func(request, *view_args, **view_kwargs))
+        finally:
+            capture.save(response)
+        return response
+    finally:
+        _active.release()
+
+
+def _profile_files(directory):
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.json')]
+    except FileNotFoundError:
+        return []
+    return sorted(entries, key=lambda entry: entry.name, reverse=True)
+
+
+def prune(directory):
+    """Borra los perfiles más antiguos por encima de PROFILING_MAX_FILES."""
+    for entry in _profile_files(directory)[getattr(settings, 'PROFILING_MAX_FILES', 200):]:
+        profile_id = entry.name[:-len('.json')]
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+SUMMARY_FIELDS = ('id', 'fecha', 'motivo', 'pid', 'metodo', 'ruta', 'vista', 'estado', 'duracion_ms', 'consultas', 'db_ms')
+
+
+def list_profiles():
+    """Resumen de los perfiles guardados, del más reciente al más antiguo."""
+    profiles = []
+    for entry in _profile_files(get_profiles_dir()):
+        try:
+            with open(entry.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({field: data.get(field) for field in SUMMARY_FIELDS})
+    return profiles
+
+
+def profile_path(profile_id, extension):
+    """Ruta del archivo de un perfil, o None si el id no es válido o no existe."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(get_profiles_dir(), f'{profile_id}.{extension}')
+    return path if os.path.exists(path) else None
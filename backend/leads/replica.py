@@ -0,0 +1,173 @@
+# backend/leads/replica.py
+"""
+Lecturas en la réplica de PostgreSQL (alias 'replica' en DATABASES, ver settings).
+
+Solo las vistas marcadas con @read_from_replica leen de la réplica: métricas del dashboard y de
+OPC, exportación y lookups, donde unos segundos de retraso de la replicación no importan. El
+resto de la API, las escrituras y las lecturas dentro de una transacción van al primario.
+
+Lectura de lo propio: ReplicaMiddleware detecta las peticiones que escriben (db_for_write) y
+marca al usuario en la caché durante REPLICA_STICKY_SECONDS. Mientras dure la marca, sus
+peticiones leen del primario aunque la vista admita la réplica. La caché es compartida por
+todos los procesos (Redis o la tabla de caché del primario, ver CACHES en settings), así que
+la marca vale aunque la siguiente petición la atienda otro worker.
+
+Sin alias 'replica' no cambia nada: el router devuelve siempre el primario y el middleware no
+se instala.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+REPLICA_ALIAS = 'replica'
+
+# True dentro de una vista que admite la réplica (y cuyo usuario no está marcado)
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+# RequestWrites de la petición en curso (ReplicaMiddleware)
+_writes = contextvars.ContextVar('replica_request_writes', default=None)
+
+
+def is_enabled():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def sticky_key(user_id):
+    return f'replica:sticky:{user_id}'
+
+
+def mark_sticky(user_id):
+    cache.set(sticky_key(user_id), True, get_sticky_seconds())
+
+
+def is_sticky(user_id):
+    return bool(cache.get(sticky_key(user_id)))
+
+
+class RequestWrites:
+    """Si la petición escribió. Es mutable: los hilos con una copia del contexto la comparten."""
+
+    def __init__(self):
+        self.wrote = False
+
+
+def start_request():
+    return _writes.set(RequestWrites())
+
+
+def end_request(token):
+    """Termina la petición: devuelve True si escribió en la base de datos."""
+    writes = _writes.get()
+    _writes.reset(token)
+    return bool(writes and writes.wrote)
+
+
+class ReplicaRouter:
+    """Router de DATABASE_ROUTERS: lecturas de las vistas marcadas a la réplica, el resto al primario."""
+
+    def db_for_read(self, model, **hints):
+        # La tabla de DatabaseCache (marcas de lectura del primario incluidas) solo está en el primario
+        if model._meta.app_label == 'django_cache':
+            return None
+        if _read_from_replica.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None:
+            writes.wrote = True
+        # Explícito: si no, Django escribiría en la base de la instancia (la réplica si se leyó de ella)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Los mismos datos: se pueden relacionar objetos leídos de uno u otro alias
+        return True
+
+
+@contextlib.contextmanager
+def read_from_primary():
+    """
+    Lecturas al primario dentro de una vista de réplica: lo que se guarda en una caché
+    compartida. Si no, una réplica retrasada la rellenaría con datos viejos justo después
+    de que una señal la invalidara.
+    """
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def _request_from(args):
+    return next((arg for arg in args if isinstance(arg, (HttpRequest, Request))), None)
+
+
+def _use_replica(request):
+    if not is_enabled():
+        return False
+    user = getattr(request, 'user', None)
+    return not (user is not None and user.is_authenticated and is_sticky(user.pk))
+
+
+def _iterate_with_replica(iterator):
+    """Contenido en streaming (exportación): cada trozo se genera con las lecturas en la réplica."""
+    iterator = iter(iterator)
+    while True:
+        token = _read_from_replica.set(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_from_replica.reset(token)
+        yield chunk
+
+
+def _finish(response):
+    if getattr(response, 'streaming', False):
+        response.streaming_content = _iterate_with_replica(response.streaming_content)
+    return response
+
+
+def read_from_replica(view):
+    """
+    Decorador de vistas de función (síncronas o async) y de acciones de ViewSet: sus lecturas van
+    a la réplica, salvo que el usuario haya escrito hace menos de REPLICA_STICKY_SECONDS. Debe ir
+    después de la autenticación (por debajo de @api_view / async_jwt_required).
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def ainner(*args, **kwargs):
+            # La marca está en la caché, que puede ser la base de datos: se consulta en un hilo
+            if not await sync_to_async(_use_replica)(_request_from(args)):
+                return await view(*args, **kwargs)
+            token = _read_from_replica.set(True)
+            try:
+                return _finish(await view(*args, **kwargs))
+            finally:
+                _read_from_replica.reset(token)
+        return ainner
+
+    @wraps(view)
+    def inner(*args, **kwargs):
+        if not _use_replica(_request_from(args)):
+            return view(*args, **kwargs)
+        token = _read_from_replica.set(True)
+        try:
+            return _finish(view(*args, **kwargs))
+        finally:
+            _read_from_replica.reset(token)
+    return inner
@@ -1,7 +1,11 @@
 # backend/leads/serializers.py
 
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import is_revoked, set_user_claims
 from .models import Lead, User, Action, Appointment, OPCPersonnel, LeadDuplicate
 
 # CORRECCIÓN: Mover UserSerializer al principio del archivo
@@ -23,19 +27,28 @@ class UserSerializer(serializers.ModelSerializer):
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
-        token = super().get_token(user)
-        token['username'] = user.username
-        try:
-            if hasattr(user, 'opc_profile') and user.opc_profile:
-                 token['opc_profile_id'] = user.opc_profile.id
-            else:
-                 token['opc_profile_id'] = None
-        except OPCPersonnel.DoesNotExist:
-             token['opc_profile_id'] = None
-        except Exception as e:
-             print(f"Error al obtener opc_profile_id en JWT: {e}")
-             token['opc_profile_id'] = None
-        return token
+        # username, rol, opc_profile_id y permisos: ClaimsJWTAuthentication no vuelve a leer el usuario
+        return set_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh que rechaza tokens revocados y emite el access token con los claims actuales del
+    usuario (los del refresh token son los del inicio de sesión).
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked(refresh):
+            raise InvalidToken('El token fue revocado.')
+        data = super().validate(attrs)
+        user = User.objects.select_related('opc_profile').filter(
+            pk=refresh.payload.get(api_settings.USER_ID_CLAIM)
+        ).first()
+        if user is not None:
+            access = AccessToken(data['access'])
+            data['access'] = str(set_user_claims(access, user))
+        return data
 
 
 class OPCPersonnelSerializer(serializers.ModelSerializer):
@@ -69,6 +82,22 @@ class OPCPersonnelSerializer(serializers.ModelSerializer):
 
 
 class LeadSerializer(serializers.ModelSerializer):
+    """
+    Serializer de leads.
+
+    Opciones vía contexto (las rellena LeadViewSet a partir de los query params):
+    - 'fields': lista de campos a devolver (sparse fieldsets).
+    - 'flat': representación plana para listados; las FK se devuelven como id más
+      '<relacion>_nombre' y sin los objetos '*_details' anidados.
+    - 'expand': en modo plano, relaciones cuyo '*_details' sí se quiere anidar.
+    """
+    # Relaciones anidadas en la representación completa: campo -> (campo de detalle, serializer)
+    NESTED_RELATIONS = {
+        'asesor': ('asesor_details', UserSerializer),
+        'personal_opc_captador': ('personal_opc_captador_details', OPCPersonnelSerializer),
+        'supervisor_opc_captador': ('supervisor_opc_captador_details', OPCPersonnelSerializer),
+    }
+
     asesor = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         allow_null=True,
@@ -107,23 +136,49 @@ class LeadSerializer(serializers.ModelSerializer):
             'es_directeo',
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flat = bool(self.context.get('flat'))
+        self.expand = set(self.context.get('expand') or [])
+
+        if self.flat:
+            # No serializar los objetos anidados que no se pidieron expandir
+            for name, (details_name, _) in self.NESTED_RELATIONS.items():
+                if name not in self.expand:
+                    self.fields.pop(details_name, None)
+
+        requested = self.context.get('fields')
+        if requested:
+            allowed = set(requested) | {'id'}
+            for field_name in list(self.fields):
+                if field_name not in allowed:
+                    self.fields.pop(field_name)
+
+    @staticmethod
+    def display_name(related):
+        if isinstance(related, User):
+            return related.get_full_name() or related.username
+        return related.nombre
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        if instance.asesor:
-            representation['asesor'] = UserSerializer(instance.asesor).data
-        else:
-            representation['asesor'] = None
-
-        if instance.personal_opc_captador:
-            representation['personal_opc_captador'] = OPCPersonnelSerializer(instance.personal_opc_captador).data
-        else:
-            representation['personal_opc_captador'] = None
+        for name, (details_name, nested_serializer) in self.NESTED_RELATIONS.items():
+            if name not in representation:
+                continue
+            related = getattr(instance, name)
+
+            if self.flat:
+                representation[f'{name}_nombre'] = self.display_name(related) if related else None
+                continue
+
+            if related is None:
+                representation[name] = None
+            elif details_name in representation:
+                # Reutilizar el objeto ya serializado en '*_details' en lugar de serializarlo de nuevo
+                representation[name] = representation[details_name]
+            else:
+                representation[name] = nested_serializer(related).data
 
-        if instance.supervisor_opc_captador:
-            representation['supervisor_opc_captador'] = OPCPersonnelSerializer(instance.supervisor_opc_captador).data
-        else:
-            representation['supervisor_opc_captador'] = None
-        
         return representation
 
 
@@ -178,27 +233,9 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        
-        if instance.lead:
-            representation['lead'] = LeadSerializer(instance.lead).data
-        else:
-            representation['lead'] = None
-
-        if instance.asesor_comercial:
-            representation['asesor_comercial'] = UserSerializer(instance.asesor_comercial).data
-        else:
-            representation['asesor_comercial'] = None
-
-        if instance.asesor_presencial:
-            representation['asesor_presencial'] = UserSerializer(instance.asesor_presencial).data
-        else:
-            representation['asesor_presencial'] = None
-
-        if instance.opc_personal_atendio:
-            representation['opc_personal_atendio'] = OPCPersonnelSerializer(instance.opc_personal_atendio).data
-        else:
-            representation['opc_personal_atendio'] = None
-
+        # 'lead', 'asesor_comercial' y 'asesor_presencial' ya vienen anidados por sus campos declarados;
+        # 'opc_personal_atendio' reutiliza el objeto serializado en '*_details' en lugar de repetirlo
+        representation['opc_personal_atendio'] = representation.get('opc_personal_atendio_details')
         return representation
 
     def create(self, validated_data):
@@ -210,6 +247,41 @@ class AppointmentSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class LeadSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Lead
+        fields = ['id', 'nombre', 'celular', 'medio', 'tipificacion']
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name']
+
+
+class OPCPersonnelSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OPCPersonnel
+        fields = ['id', 'nombre', 'rol']
+
+
+class AppointmentListSerializer(serializers.ModelSerializer):
+    """Representación compacta de citas para listados y calendario (solo lectura)."""
+    lead = LeadSummarySerializer(read_only=True)
+    asesor_comercial = UserSummarySerializer(read_only=True)
+    asesor_presencial = UserSummarySerializer(read_only=True)
+    opc_personal_atendio = OPCPersonnelSummarySerializer(read_only=True)
+
+    class Meta:
+        model = Appointment
+        fields = [
+            'id', 'lead', 'asesor_comercial', 'asesor_presencial', 'fecha_hora',
+            'lugar', 'estado', 'fecha_creacion', 'ultima_actualizacion',
+            'has_ever_been_confirmed', 'opc_personal_atendio',
+        ]
+        read_only_fields = fields
+
+
 class LeadDuplicateSerializer(serializers.ModelSerializer):
     original_lead_details = LeadSerializer(source='original_lead', read_only=True)
     asesor_details = UserSerializer(source='asesor', read_only=True)
@@ -223,4 +295,11 @@ class LeadDuplicateSerializer(serializers.ModelSerializer):
             'captador', 'captador_details', 'fecha_interaccion', 'fecha_importacion',
             'estado', 'observacion', 'observacion_opc', 'proyecto_interes',
             'ubicacion', 'medio', 'distrito', 'tipificacion', 'calle_o_modulo'
-        ]
\ No newline at end of file
+        ]
+
+
+class LeadDuplicateCompactSerializer(LeadDuplicateSerializer):
+    """Duplicado sin el lead original anidado, para respuestas que ya incluyen ese lead."""
+
+    class Meta(LeadDuplicateSerializer.Meta):
+        fields = [field for field in LeadDuplicateSerializer.Meta.fields if field != 'original_lead_details']
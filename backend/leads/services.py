@@ -5,6 +5,8 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import datetime
 
+from . import monitoring
+
 logger = logging.getLogger(__name__)
 
 class ComercialAppWebhookService:
@@ -25,6 +27,7 @@ class ComercialAppWebhookService:
         """
         if not self.webhook_url or not self.webhook_token:
             logger.warning("Webhook URL o Token no configurados. No se enviará notificación.")
+            monitoring.webhook_delivery('presencia', 'no_configurado')
             return False
         
         try:
@@ -87,12 +90,14 @@ class ComercialAppWebhookService:
             
             logger.info(f"Enviando webhook a {self.webhook_url} con datos: {presencia_data}")
             
-            response = requests.post(
-                self.webhook_url,
-                json=presencia_data,
-                headers=headers,
-                timeout=30
-            )
+            with monitoring.WebhookDelivery('presencia') as delivery:
+                response = requests.post(
+                    self.webhook_url,
+                    json=presencia_data,
+                    headers=headers,
+                    timeout=30
+                )
+                delivery.set_status(response.status_code)
             
             if response.status_code == 200:
                 logger.info(f"Webhook enviado exitosamente. Respuesta: {response.json()}")
@@ -118,6 +123,7 @@ class ComercialAppWebhookService:
         """
         if not self.webhook_url or not self.webhook_token:
             logger.warning("No se puede enviar webhook: URL o Token no configurados")
+            monitoring.webhook_delivery('venta', 'no_configurado')
             return False
             
         try:
@@ -133,12 +139,14 @@ class ComercialAppWebhookService:
                 'X-CRM-Webhook-Token': self.webhook_token,
             }
             
-            response = requests.post(
-                self.webhook_url,
-                json=presence_payload,
-                headers=headers,
-                timeout=30
-            )
+            with monitoring.WebhookDelivery('venta') as delivery:
+                response = requests.post(
+                    self.webhook_url,
+                    json=presence_payload,
+                    headers=headers,
+                    timeout=30
+                )
+                delivery.set_status(response.status_code)
             
             if response.status_code == 200:
                 logger.info(f"Webhook de venta enviado exitosamente para cita {appointment.id}")
@@ -1,8 +1,11 @@
 # backend/leads/signals.py
 
-from django.db.models.signals import post_save, post_delete
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Lead, Action, User, Appointment
+from . import authentication, changes, events
+from .models import Lead, Action, User, Appointment, OPCPersonnel, LeadDuplicate
+from .lookup import lookup_cache_key
 from .services import webhook_service
 import logging
 
@@ -126,4 +129,91 @@ def handle_appointment_status_change(sender, instance, created, **kwargs):
                 except Exception as e:
                     logger.error(f"Error al enviar webhook para cita {instance.id}: {str(e)}")
         except Exception as e:
-            logger.error(f"Error en signal de appointment: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error en signal de appointment: {str(e)}")
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=OPCPersonnel)
+def invalidate_lookup_cache(sender, **kwargs):
+    """
+    Invalida los conjuntos de referencia cacheados por /api/lookup/.
+    """
+    cache.delete(lookup_cache_key('users' if sender is User else 'opc-personnel'))
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=LeadDuplicate)
+def record_change(sender, instance, created, **kwargs):
+    """
+    Registra el alta o la edición en la secuencia de cambios de /api/changes/.
+    """
+    changes.record(sender, [instance.pk], 'crear' if created else 'actualizar')
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=LeadDuplicate)
+def record_deletion(sender, instance, **kwargs):
+    """
+    Deja el tombstone de la eliminación en la secuencia de cambios.
+    """
+    changes.record(sender, [instance.pk], 'eliminar')
+
+@receiver(pre_delete, sender=Lead)
+def record_orphaned_duplicates(sender, instance, **kwargs):
+    """
+    Los duplicados del lead quedan con original_lead = NULL (SET_NULL, sin señales): se registran como editados.
+    """
+    duplicate_ids = list(instance.duplicates.values_list('id', flat=True))
+    if duplicate_ids:
+        changes.record(LeadDuplicate, duplicate_ids, 'actualizar')
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Appointment)
+def publish_change(sender, instance, created, **kwargs):
+    """
+    Publica el cambio en los eventos en vivo (/api/events/) con los campos modificados.
+    """
+    audience = events.lead_audience if sender is Lead else events.appointment_audience
+    asesores, es_lead_opc = audience(instance)
+    campos = None if created else events.changed_fields(instance)
+    if campos == []:
+        return
+    events.publish_on_commit(
+        changes.ENTIDADES[sender], [instance.pk], 'crear' if created else 'actualizar',
+        campos=campos, asesores=asesores, es_lead_opc=es_lead_opc
+    )
+    # Un segundo save() de la misma instancia solo informa de lo que cambie desde este
+    instance._loaded_values = {field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields}
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Appointment)
+def publish_deletion(sender, instance, **kwargs):
+    """
+    Publica la eliminación en los eventos en vivo.
+    """
+    audience = events.lead_audience if sender is Lead else events.appointment_audience
+    asesores, es_lead_opc = audience(instance)
+    events.publish_on_commit(
+        changes.ENTIDADES[sender], [instance.pk], 'eliminar', asesores=asesores, es_lead_opc=es_lead_opc
+    )
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_user_change(sender, instance, created, **kwargs):
+    """
+    Los tokens llevan rol y permisos en sus claims y ya no se lee el usuario en cada petición:
+    al cambiar esos campos, la contraseña o el estado, se revocan los tokens emitidos.
+    """
+    loaded = getattr(instance, '_loaded_values', None)
+    if created:
+        changed = False
+    elif loaded is None:
+        # Guardado sin estado previo conocido: no se sabe qué cambió, se revoca por seguridad
+        changed = True
+    else:
+        changed = any(loaded.get(field) != getattr(instance, field) for field in authentication.REVOKING_FIELDS)
+    if changed:
+        authentication.revoke_user(instance.pk, 'usuario_modificado')
+    instance._loaded_values = {field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields}
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_user_deletion(sender, instance, **kwargs):
+    authentication.revoke_user(instance.pk, 'usuario_eliminado')
@@ -0,0 +1,254 @@
+# backend/leads/slow_queries.py
+"""
+Registro de consultas lentas.
+
+record_slow_query es un execute_wrapper que se instala en cada conexión (señal
+connection_created). Marca las consultas que tardan al menos SLOW_QUERY_MS y las agrupa por
+huella: la SQL normalizada, sin valores literales y con las listas IN (...) reducidas, de modo
+que las variantes de una misma consulta cuentan juntas. La primera vez que un proceso ve una
+huella guarda también:
+
+- el plan: EXPLAIN (ANALYZE, BUFFERS) para SELECT, EXPLAIN a secas para escrituras. Se
+  ejecuta con los mismos parámetros en una transacción o savepoint que se deshace, con un
+  límite de SLOW_QUERY_EXPLAIN_TIMEOUT_MS (0 = sin plan);
+- el origen: la línea del código de la aplicación que lanzó la consulta.
+
+Las llamadas se acumulan en memoria y se escriben en SlowQuery (una fila por huella y día)
+fuera de la transacción de la petición: en el momento si no hay transacción abierta y, si la
+hay, al confirmarse. Así no se retienen bloqueos sobre esas filas mientras dure la
+transacción. El plan y la escritura usan el cursor de psycopg directamente, así que no cuentan
+en las mediciones de la petición (PerformanceMiddleware, CaptureQueriesContext).
+
+Se consulta en /api/_slow-queries/ y con el comando slow_queries.
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from . import perf
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+# Consultas que se pueden explicar; solo las lecturas se ejecutan con ANALYZE
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+_ANALYZABLE = ('SELECT', 'WITH')
+MAX_SQL_CHARS = 10000
+
+_state = threading.local()
+_lock = threading.Lock()
+# huella -> [sql, origen, plan, llamadas, total_ms, max_ms, última vez] pendientes de escribir
+_pending = {}
+# Huellas ya explicadas por este proceso
+_seen = set()
+
+
+def get_threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_MS', 200)
+
+
+def normalize(sql):
+    sql = _STRING.sub('%s', sql)
+    sql = _NUMBER.sub('%s', sql)
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode('utf-8')).hexdigest()[:16]
+
+
+def record_slow_query(execute, sql, params, many, context):
+    """execute_wrapper: mide la consulta y la registra si supera SLOW_QUERY_MS."""
+    threshold = get_threshold_ms()
+    if not threshold or getattr(_state, 'busy', False):
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms >= threshold:
+        _state.busy = True
+        try:
+            _record(context['connection'], sql, params, many, elapsed_ms)
+        except Exception:
+            # El registro nunca debe romper la consulta que ya se ejecutó
+            logger.exception('No se pudo registrar una consulta lenta')
+        finally:
+            _state.busy = False
+    return result
+
+
+def install_slow_query_recorder(sender, connection, **kwargs):
+    """Receptor de connection_created: instala record_slow_query una sola vez por conexión."""
+    if connection.vendor == 'postgresql' and record_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_query)
+
+
+def _record(connection, sql, params, many, elapsed_ms):
+    normalized = normalize(sql)[:MAX_SQL_CHARS]
+    huella = fingerprint(normalized)
+    origen = plan = ''
+    with _lock:
+        first = huella not in _seen
+        _seen.add(huella)
+    if first:
+        origen = application_frame()
+        if not many:
+            plan = explain(connection, sql, params)
+    now = timezone.now()
+    with _lock:
+        entry = _pending.get(huella)
+        if entry is None:
+            _pending[huella] = [normalized, origen, plan, 1, elapsed_ms, elapsed_ms, now]
+        else:
+            entry[1] = entry[1] or origen
+            entry[2] = entry[2] or plan
+            entry[3] += 1
+            entry[4] += elapsed_ms
+            entry[5] = max(entry[5], elapsed_ms)
+            entry[6] = now
+    # Se escribe siempre en el primario (la consulta pudo ir a la réplica, de solo lectura)
+    primary = connections[DEFAULT_DB_ALIAS]
+    if primary.in_atomic_block:
+        transaction.on_commit(flush, using=DEFAULT_DB_ALIAS)
+    else:
+        flush()
+
+
+def application_frame():
+    """'ruta:línea en función' del primer marco de la pila que es código de la aplicación."""
+    base = str(settings.BASE_DIR)
+    # Los execute_wrapper de instrumentación no son el origen
+    instrumentation = {os.path.abspath(__file__), os.path.abspath(perf.__file__)}
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(base) and filename not in instrumentation and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, base)}:{frame.lineno} en {frame.name}'[:255]
+    return ''
+
+
+def explain(connection, sql, params):
+    """Plan de la consulta, en una transacción (o savepoint) que se deshace. '' si no se puede."""
+    timeout = getattr(settings, 'SLOW_QUERY_EXPLAIN_TIMEOUT_MS', 10000)
+    verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if not timeout or verb not in _EXPLAINABLE or connection.needs_rollback:
+        return ''
+    options = '(ANALYZE, BUFFERS)' if verb in _ANALYZABLE else ''
+    in_transaction = not connection.get_autocommit()
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute('SAVEPOINT slow_query_explain' if in_transaction else 'BEGIN')
+        try:
+            cursor.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+            cursor.execute(f'EXPLAIN {options} {sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        except Exception as exc:
+            logger.info('No se pudo obtener el plan de una consulta lenta: %s', exc)
+            return ''
+        finally:
+            cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain' if in_transaction else 'ROLLBACK')
+            if in_transaction:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    finally:
+        cursor.close()
+
+
+def flush():
+    """Escribe las llamadas pendientes en SlowQuery (upsert por huella y día)."""
+    from .models import SlowQuery
+
+    with _lock:
+        pending = list(_pending.items())
+        _pending.clear()
+    if not pending:
+        return
+    table = SlowQuery._meta.db_table
+    rows = [
+        (huella, timezone.localdate(ultima), sql, origen, plan, llamadas, total_ms, max_ms, ultima)
+        for huella, (sql, origen, plan, llamadas, total_ms, max_ms, ultima) in pending
+    ]
+    try:
+        connection = connections[DEFAULT_DB_ALIAS]
+        connection.ensure_connection()
+        with connection.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (huella, dia, sql, origen, plan, llamadas, total_ms, max_ms, ultima_vez) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) '
+                'ON CONFLICT (huella, dia) DO UPDATE SET '
+                f'llamadas = {table}.llamadas + EXCLUDED.llamadas, '
+                f'total_ms = {table}.total_ms + EXCLUDED.total_ms, '
+                f'max_ms = GREATEST({table}.max_ms, EXCLUDED.max_ms), '
+                f'ultima_vez = GREATEST({table}.ultima_vez, EXCLUDED.ultima_vez), '
+                f"origen = CASE WHEN EXCLUDED.origen <> '' THEN EXCLUDED.origen ELSE {table}.origen END, "
+                f"plan = CASE WHEN EXCLUDED.plan <> '' THEN EXCLUDED.plan ELSE {table}.plan END",
+                rows,
+            )
+    except Exception:
+        logger.exception('No se pudieron guardar %d consultas lentas', len(rows))
+
+
+def top(days=7, limit=50):
+    """Huellas con más tiempo total en los últimos 'days' días."""
+    from .models import SlowQuery
+
+    desde = timezone.localdate() - datetime.timedelta(days=days - 1)
+    ranking = list(
+        SlowQuery.objects.filter(dia__gte=desde).values('huella')
+        .annotate(llamadas=Sum('llamadas'), total_ms=Sum('total_ms'), max_ms=Max('max_ms'), ultima_vez=Max('ultima_vez'))
+        .order_by('-total_ms')[:limit]
+    )
+    latest = {}
+    for row in (
+        SlowQuery.objects.filter(huella__in=[r['huella'] for r in ranking])
+        .order_by('huella', '-dia').values('huella', 'sql', 'origen')
+    ):
+        latest.setdefault(row['huella'], row)
+    return [
+        {
+            'huella': r['huella'],
+            'llamadas': r['llamadas'],
+            'total_ms': round(r['total_ms'], 1),
+            'media_ms': round(r['total_ms'] / r['llamadas'], 1) if r['llamadas'] else None,
+            'max_ms': round(r['max_ms'], 1),
+            'ultima_vez': r['ultima_vez'],
+            'origen': latest.get(r['huella'], {}).get('origen', ''),
+            'sql': latest.get(r['huella'], {}).get('sql', ''),
+        }
+        for r in ranking
+    ]
+
+
+def detail(huella):
+    """Historial diario y último plan de una huella, o None si no existe."""
+    from .models import SlowQuery
+
+    rows = list(SlowQuery.objects.filter(huella=huella).order_by('-dia'))
+    if not rows:
+        return None
+    with_plan = next((row for row in rows if row.plan), None)
+    return {
+        'huella': huella,
+        'sql': rows[0].sql,
+        'origen': next((row.origen for row in rows if row.origen), ''),
+        'plan': with_plan.plan if with_plan else '',
+        'plan_dia': with_plan.dia if with_plan else None,
+        'dias': [
+            {'dia': row.dia, 'llamadas': row.llamadas, 'total_ms': round(row.total_ms, 1), 'max_ms': round(row.max_ms, 1)}
+            for row in rows
+        ],
+    }
@@ -1,3 +1,1443 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import importlib.util
+import io
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.paginator import EmptyPage
+from django.db import DatabaseError, connection, connections
+from django.db.models import F
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient, LiveServerTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import bulk, events, export, lookup, perf, replica, slow_queries, views, work_queue
+from .models import Action, Appointment, ChangeLog, Lead, LeadDuplicate, OPCPersonnel, SlowQuery, TokenRevocation, User
+from .pagination import ApproximateCountPaginator
+from .services import webhook_service
+
+
+def tearDownModule():
+    # Django cierra el pool de cada base de pruebas antes de borrarla, pero no el de sus espejos
+    # (la réplica): sus conexiones abiertas impedirían el DROP DATABASE
+    for alias in connections:
+        if connections[alias].settings_dict['TEST']['MIRROR']:
+            connections[alias].close_pool()
+
+
+# Los presupuestos de consultas cuentan las de la aplicación: la caché de la base de datos
+# (CACHES en settings) añadiría las suyas, así que esas pruebas usan una en memoria
+LOCAL_CACHE = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+
+class QueryBudgetMixin:
+    """
+    assertQueryBudget: la petición no supera 'budget' consultas. Si lo supera, el mensaje
+    lista las SQL repetidas (el rastro típico de un N+1).
+    """
+
+    def assertQueryBudget(self, budget, url, method='get', **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url}: {response.status_code}')
+        queries = [query['sql'] for query in ctx.captured_queries]
+        if len(queries) > budget:
+            repetidas = [f'{count}x {sql[:200]}' for sql, count in Counter(queries).most_common() if count > 1]
+            self.fail(
+                f'{method.upper()} {url}: {len(queries)} consultas (presupuesto {budget}). '
+                f'Repetidas: {repetidas or "ninguna"}'
+            )
+        return response
+
+
+@LOCAL_CACHE
+class EndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Número máximo de consultas por endpoint, independiente del número de filas devueltas."""
+
+    QUERY_BUDGETS = {
+        '/api/leads/?page_size=20': 4,
+        '/api/appointments/?page_size=20': 3,
+        '/api/actions/?page_size=20': 3,
+        '/api/users/?page_size=20': 3,
+        '/api/opc-personnel/?page_size=20': 3,
+        '/api/dashboard-metrics/': 10,
+        '/api/opc-leads-metrics/': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='supervisor', is_staff=True)
+        for i in range(20):
+            opc_user = User.objects.create(username=f'opc{i}')
+            opc = OPCPersonnel.objects.create(nombre=f'OPC {i}', rol='OPC', user=opc_user)
+            lead = Lead.objects.create(
+                nombre=f'Lead {i}', celular=f'95000000{i:02d}', asesor=opc_user, personal_opc_captador=opc,
+            )
+            appointment = Appointment.objects.create(
+                lead=lead, asesor_comercial=opc_user, asesor_presencial=cls.user, fecha_hora=timezone.now(),
+            )
+            Action.objects.create(lead=lead, appointment=appointment, user=opc_user, tipo_accion='Cita', detalle_accion='-')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_endpoints_within_query_budget(self):
+        for url, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(url=url):
+                self.assertQueryBudget(budget, url)
+
+
+@LOCAL_CACHE
+class ApproximateCountPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='supervisor', is_staff=True)
+        for i in range(5):
+            Lead.objects.create(nombre=f'Lead {i}', celular=f'95300000{i}', tipificacion='NO CONTESTA' if i < 2 else None)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_sets_use_cached_exact_count(self):
+        paginator = ApproximateCountPaginator(Lead.objects.order_by('id'), 2)
+        self.assertIsInstance(paginator._planner_estimate(Lead.objects.all()), int)
+        self.assertEqual((paginator.count, paginator.count_is_approximate), (5, False))
+        self.assertEqual(paginator.num_pages, 3)
+        # El total queda en caché: solo se repite el EXPLAIN
+        with self.assertNumQueries(1):
+            self.assertEqual(ApproximateCountPaginator(Lead.objects.order_by('id'), 2).count, 5)
+        # Otro filtro, otra clave
+        filtrado = ApproximateCountPaginator(Lead.objects.filter(tipificacion='NO CONTESTA').order_by('id'), 2)
+        self.assertEqual((filtrado.count, filtrado.count_is_approximate), (2, False))
+
+    def test_large_estimate_skips_count_and_pages_by_extra_row(self):
+        with mock.patch.object(ApproximateCountPaginator, '_planner_estimate', return_value=50000):
+            paginator = ApproximateCountPaginator(Lead.objects.order_by('id'), 2)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual((paginator.count, paginator.count_is_approximate), (50000, True))
+            self.assertFalse(any('COUNT(' in query['sql'] for query in ctx.captured_queries))
+            self.assertTrue(paginator.page(2).has_next())
+            self.assertFalse(paginator.page(3).has_next())
+            self.assertEqual(len(paginator.page(3)), 1)
+            with self.assertRaises(EmptyPage):
+                paginator.page(4)
+
+    def test_list_response_reports_whether_count_is_approximate(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get('/api/leads/', {'page_size': 2}).data
+        self.assertEqual((data['count'], data['count_is_approximate']), (5, False))
+        with mock.patch.object(ApproximateCountPaginator, '_planner_estimate', return_value=50000):
+            data = client.get('/api/leads/', {'page_size': 2, 'page': 3}).data
+        self.assertEqual((data['count'], data['count_is_approximate'], data['next']), (50000, True, None))
+
+
+@LOCAL_CACHE
+class LeadFieldSelectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='supervisor', is_staff=True, first_name='Ana', last_name='Sup')
+        supervisor = OPCPersonnel.objects.create(nombre='Supervisor OPC', rol='SUPERVISOR')
+        for i in range(6):
+            asesor = User.objects.create(username=f'asesor{i}')
+            opc = OPCPersonnel.objects.create(
+                nombre=f'OPC {i}', rol='OPC', supervisor=supervisor, user=User.objects.create(username=f'opc{i}'),
+            )
+            Lead.objects.create(
+                nombre=f'Lead {i}', celular=f'95400000{i}', asesor=asesor,
+                personal_opc_captador=opc, supervisor_opc_captador=supervisor,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def results(self, **params):
+        return self.client.get('/api/leads/', params).data['results']
+
+    def test_fields_keep_requested_and_ignore_unknown(self):
+        self.assertEqual(set(self.results(fields='nombre,celular,noexiste')[0]), {'id', 'nombre', 'celular'})
+        self.assertEqual(set(self.results(fields='noexiste')[0]), {'id'})
+
+    def test_flat_returns_ids_and_names_and_expand_nests_selected(self):
+        lead = self.results(flat='true', ordering='nombre')[0]
+        self.assertEqual(lead['asesor_nombre'], 'asesor0')
+        self.assertEqual(lead['personal_opc_captador_nombre'], 'OPC 0')
+        self.assertEqual(lead['supervisor_opc_captador_nombre'], 'Supervisor OPC')
+        self.assertIsInstance(lead['asesor'], int)
+        self.assertFalse([key for key in lead if key.endswith('_details')])
+
+        lead = self.results(expand='personal_opc_captador', ordering='nombre')[0]
+        self.assertEqual(lead['personal_opc_captador_details']['nombre'], 'OPC 0')
+        self.assertNotIn('asesor_details', lead)
+
+        # Sin flat ni expand, la representación completa anida todo
+        lead = self.results(ordering='nombre')[0]
+        self.assertEqual(lead['asesor']['username'], 'asesor0')
+        self.assertIn('supervisor_opc_captador_details', lead)
+        self.assertNotIn('asesor_nombre', lead)
+
+    def test_query_count_does_not_grow_with_rows_or_expand(self):
+        def queries(**params):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get('/api/leads/', params).status_code, 200)
+            return len(ctx.captured_queries)
+
+        plano = queries(flat='true', page_size=2)
+        self.assertEqual(queries(flat='true', page_size=6), plano)
+        self.assertEqual(queries(expand='asesor,personal_opc_captador,supervisor_opc_captador', page_size=6), plano)
+        self.assertEqual(queries(page_size=6), plano)
+        # Las relaciones no expandidas no se unen en la consulta del listado
+        def joins(**params):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get('/api/leads/', params)
+            return next(query['sql'] for query in ctx.captured_queries if 'LIMIT' in query['sql']).count(' JOIN ')
+
+        self.assertLess(joins(flat='true'), joins(expand='personal_opc_captador'))
+        self.assertLess(joins(expand='personal_opc_captador'), joins())
+
+
+@LOCAL_CACHE
+class LookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='operador', rol='OPERADOR', first_name='Olga', last_name='Pérez')
+        User.objects.create(username='presencial', rol='ASESOR_PRESENCIAL')
+        User.objects.create(username='inactivo', rol='OPERADOR', is_active=False)
+        OPCPersonnel.objects.create(nombre='Carla OPC', rol='OPC')
+        OPCPersonnel.objects.create(nombre='Carlos Sup', rol='SUPERVISOR')
+        Lead.objects.bulk_create(Lead(nombre=f'Lead {i:02d}', celular=f'95500{i:04d}') for i in range(60))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def results(self, entity, **params):
+        response = self.client.get(f'/api/lookup/{entity}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_leads_search_by_name_or_phone_prefix_with_limit(self):
+        self.assertEqual(self.results('leads'), [])
+        self.assertEqual(len(self.results('leads', q='lead')), views.LOOKUP_DEFAULT_LIMIT)
+        self.assertEqual(len(self.results('leads', q='lead', limit=500)), views.LOOKUP_MAX_LIMIT)
+        self.assertEqual([item['label'] for item in self.results('leads', q='955000002')], ['Lead 02 - 955000002'])
+        lead = Lead.objects.get(celular='955000007')
+        self.assertEqual(self.results('leads', ids=str(lead.id)), [{'id': lead.id, 'label': 'Lead 07 - 955000007'}])
+
+    def test_users_and_opc_filter_by_text_and_role(self):
+        self.assertEqual([item['username'] for item in self.results('users')], ['operador', 'presencial'])
+        self.assertEqual([item['label'] for item in self.results('users', q='pérez')], ['Olga Pérez'])
+        self.assertEqual([item['username'] for item in self.results('users', rol='ASESOR_PRESENCIAL')], ['presencial'])
+        self.assertEqual([item['label'] for item in self.results('opc-personnel', q='carl', rol='SUPERVISOR')],
+                         ['Carlos Sup (SUPERVISOR)'])
+        self.assertEqual(len(self.results('opc-personnel', limit=1)), 1)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/lookup/citas/').status_code, 404)
+        self.assertEqual(self.client.get('/api/lookup/leads/', {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/lookup/users/', {'limit': 'x'}).status_code, 400)
+
+    def test_reference_sets_are_cached_until_changed(self):
+        self.results('users')
+        self.results('opc-personnel')
+        with self.assertNumQueries(0):
+            self.results('users', q='oper')
+            self.results('opc-personnel')
+        # Las señales de User y OPCPersonnel invalidan su clave
+        User.objects.create(username='nuevo', rol='OPERADOR')
+        self.assertIsNone(cache.get(lookup.lookup_cache_key('users')))
+        self.assertIsNotNone(cache.get(lookup.lookup_cache_key('opc-personnel')))
+        self.assertIn('nuevo', [item['username'] for item in self.results('users')])
+        OPCPersonnel.objects.get(nombre='Carla OPC').delete()
+        self.assertEqual([item['label'] for item in self.results('opc-personnel')], ['Carlos Sup (SUPERVISOR)'])
+
+
+class PerformanceMiddlewareTests(TestCase):
+
+    def setUp(self):
+        perf.registry.reset()
+        self.user = User.objects.create(username='supervisor', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_requests_are_aggregated_per_route(self):
+        Lead.objects.create(nombre='Lead', celular='951000001')
+        self.client.get('/api/leads/')
+        self.client.get('/api/leads/')
+
+        response = self.client.get('/api/_perf/')
+        self.assertEqual(response.status_code, 200)
+        leads = response.data['rutas']['GET lead-list']
+        self.assertEqual(leads['peticiones'], 2)
+        self.assertGreaterEqual(leads['consultas_max'], 1)
+        self.assertGreater(leads['serializacion_media_ms'], 0)
+        self.assertEqual(sum(leads['histograma_latencia_ms'].values()), 2)
+
+        self.assertEqual(self.client.delete('/api/_perf/').status_code, 204)
+        self.assertNotIn('GET lead-list', self.client.get('/api/_perf/').data['rutas'])
+
+        operador = APIClient()
+        operador.force_authenticate(User.objects.create(username='operador'))
+        self.assertEqual(operador.get('/api/_perf/').status_code, 403)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_top_sql(self):
+        with self.assertLogs('leads.perf', 'WARNING') as logs:
+            self.client.get('/api/users/')
+        self.assertIn('GET user-list', logs.output[0])
+        self.assertIn('leads_user', logs.output[0])
+
+
+@unittest.skipUnless('replica' in settings.DATABASES, 'Requiere el alias replica (DATABASE_REPLICA_NAME)')
+class ReplicaRoutingTests(TransactionTestCase):
+    # En los tests la réplica es un espejo del primario: se mira qué conexión hace las consultas.
+    # Sin la transacción de TestCase: dentro de un atomic el router lee siempre del primario.
+    # '__all__' y no {'default', 'replica'}: el runner lo valida aunque el test se salte
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.operador = User.objects.create(username='operador', is_staff=True)
+        self.supervisor = User.objects.create(username='supervisor', is_staff=True)
+        self.lead = Lead.objects.create(nombre='Primario', celular='951000001')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def replica_queries(self, request):
+        """Consultas de la petición en la réplica y en el primario."""
+        with CaptureQueriesContext(connections['replica']) as en_replica, CaptureQueriesContext(connection) as en_primario:
+            response = request()
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        return [q['sql'] for q in en_replica.captured_queries], [q['sql'] for q in en_primario.captured_queries]
+
+    def test_reporting_views_read_replica_until_user_writes(self):
+        operador = self.client_for(self.operador)
+        for path in ('/api/lookup/leads/?q=9510', '/api/leads/export/', '/api/dashboard-metrics/'):
+            en_replica, _ = self.replica_queries(lambda: operador.get(path))
+            self.assertTrue(any('leads_lead' in sql for sql in en_replica), path)
+        # El resto de la API lee del primario
+        en_replica, _ = self.replica_queries(lambda: operador.get('/api/leads/'))
+        self.assertEqual(en_replica, [])
+
+        # La escritura va al primario; después el usuario lee del primario y los demás, de la réplica
+        en_replica, en_primario = self.replica_queries(
+            lambda: operador.patch(f'/api/leads/{self.lead.id}/', {'tipificacion': 'NO CONTESTA'}, format='json')
+        )
+        self.assertFalse(any(sql.startswith(('UPDATE', 'INSERT')) for sql in en_replica))
+        self.assertTrue(any(sql.startswith('UPDATE "leads_lead"') for sql in en_primario))
+        en_replica, _ = self.replica_queries(lambda: operador.get('/api/lookup/leads/?q=9510'))
+        self.assertEqual(en_replica, [])
+        en_replica, _ = self.replica_queries(lambda: self.client_for(self.supervisor).get('/api/lookup/leads/?q=9510'))
+        self.assertNotEqual(en_replica, [])
+
+        # Al vencer la ventana vuelve a la réplica
+        cache.delete(replica.sticky_key(self.operador.id))
+        en_replica, _ = self.replica_queries(lambda: operador.get('/api/lookup/leads/?q=9510'))
+        self.assertNotEqual(en_replica, [])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'crm_cache',
+    }})
+    def test_database_cache_is_read_from_primary(self):
+        # La caché se escribe en el primario: leída de la réplica, una marca recién puesta podría no verse
+        replica.mark_sticky(self.operador.id)
+        token = replica._read_from_replica.set(True)
+        try:
+            with CaptureQueriesContext(connections['replica']) as en_replica:
+                self.assertTrue(replica.is_sticky(self.operador.id))
+        finally:
+            replica._read_from_replica.reset(token)
+        self.assertEqual(en_replica.captured_queries, [])
+
+
+class SlowQueryTests(TestCase):
+
+    def setUp(self):
+        # Estado del proceso: lo que hayan dejado otros tests
+        slow_queries._seen.clear()
+        slow_queries._pending.clear()
+
+    def test_fingerprint_ignores_values_and_in_list_length(self):
+        normalized = slow_queries.normalize("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nombre = 'O''Brien'\n LIMIT 21")
+        self.assertEqual(normalized, 'SELECT * FROM t WHERE id IN (%s, ...) AND nombre = %s LIMIT %s')
+        self.assertEqual(
+            slow_queries.fingerprint(slow_queries.normalize('SELECT 1 FROM t WHERE id IN (%s, %s)')),
+            slow_queries.fingerprint(slow_queries.normalize('SELECT 2 FROM t WHERE id IN (%s, %s, %s, %s)')),
+        )
+
+    @override_settings(SLOW_QUERY_MS=20)
+    def test_slow_queries_are_aggregated_with_plan_and_origin(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_sleep(%s)', [0.03])
+                cursor.execute('SELECT pg_sleep(%s)', [0.04])
+                cursor.execute('SELECT 1')
+            # El EXPLAIN ANALYZE se deshace sin afectar a la transacción en curso
+            self.assertEqual(Lead.objects.count(), 0)
+
+        registro = SlowQuery.objects.get(sql='SELECT pg_sleep(%s)')
+        self.assertEqual(registro.llamadas, 2)
+        self.assertGreaterEqual(registro.max_ms, 40)
+        self.assertIn('actual time', registro.plan)
+        self.assertTrue(registro.origen.startswith('leads/tests.py:'), registro.origen)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        ranking = client.get('/api/_slow-queries/').data['consultas']
+        self.assertIn((registro.huella, 2), [(r['huella'], r['llamadas']) for r in ranking])
+        self.assertIn('actual time', client.get(f'/api/_slow-queries/{registro.huella}/').data['plan'])
+        salida = io.StringIO()
+        call_command('slow_queries', stdout=salida)
+        self.assertIn(registro.huella, salida.getvalue())
+
+    @override_settings(SLOW_QUERY_MS=20, SLOW_QUERY_EXPLAIN_TIMEOUT_MS=5)
+    def test_explain_timeout_keeps_transaction_usable(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_sleep(%s)', [0.03])
+            self.assertEqual(Lead.objects.count(), 0)
+        self.assertEqual(SlowQuery.objects.get(sql='SELECT pg_sleep(%s)').plan, '')
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.enterContext(override_settings(PROFILING_TOKEN='secreto', PROFILING_DIR=self.directory))
+        self.user = User.objects.create(username='supervisor', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Lead.objects.create(nombre='Lead', celular='951000001')
+
+    def test_requested_profile_is_saved_and_downloadable(self):
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/leads/'))
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/leads/', headers={'X-Profile': 'otro'}))
+        response = self.client.get('/api/leads/', {'search': 'Lead', 'token': 'jwt'}, headers={'X-Profile': 'secreto'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['nombre'], 'Lead')
+        profile_id = response['X-Profile-Id']
+
+        listing = self.client.get('/api/_profiles/').data['perfiles']
+        self.assertEqual([p['id'] for p in listing], [profile_id])
+        detail = self.client.get(f'/api/_profiles/{profile_id}/').data
+        self.assertEqual((detail['vista'], detail['motivo'], detail['estado']), ('lead-list', 'solicitado', 200))
+        # El valor de parámetros sensibles como el token de /api/events/ no se guarda
+        self.assertEqual(detail['parametros'], {'search': ['Lead'], 'token': ['[oculto]']})
+        self.assertEqual(len(detail['sql']), detail['consultas'])
+        self.assertTrue(any('leads_lead' in q['sql'] for q in detail['sql']))
+        self.assertTrue(detail['funciones'])
+
+        download = self.client.get(f'/api/_profiles/{profile_id}/', {'formato': 'prof'})
+        with tempfile.NamedTemporaryFile(suffix='.prof') as f:
+            f.write(b''.join(download.streaming_content))
+            f.flush()
+            self.assertTrue(pstats.Stats(f.name).total_calls)
+        self.assertEqual(self.client.get('/api/_profiles/no-existe/').status_code, 404)
+
+        # Vía ASGI (?_profile=) y con muestreo
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        response = async_to_sync(AsyncClient().get)('/api/leads/', {'_profile': 'secreto'}, headers=headers)
+        self.assertIn('X-Profile-Id', response)
+        with override_settings(PROFILING_TOKEN='', PROFILING_SAMPLE_RATE=1, PROFILING_MAX_FILES=2):
+            self.assertIn('X-Profile-Id', self.client.get('/api/users/'))
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+        operador = APIClient()
+        operador.force_authenticate(User.objects.create(username='operador'))
+        self.assertEqual(operador.get('/api/_profiles/').status_code, 403)
+
+
+@unittest.skipUnless(importlib.util.find_spec('prometheus_client'), 'prometheus_client no está instalado')
+class PrometheusMetricsTests(TestCase):
+
+    def sample(self, name, labels):
+        from prometheus_client import REGISTRY
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_caches_and_webhooks_are_exposed(self):
+        user = User.objects.create(username='operador')
+        client = APIClient()
+        client.force_authenticate(user)
+        cache.delete(lookup.lookup_cache_key('users'))
+        request_labels = {'view': 'lookup', 'method': 'GET', 'status': '200'}
+        antes = self.sample('crm_http_request_duration_seconds_count', request_labels)
+        hits = self.sample('crm_cache_requests_total', {'cache': 'lookup', 'resultado': 'hit'})
+        client.get('/api/lookup/users/')
+        client.get('/api/lookup/users/')
+        self.assertEqual(self.sample('crm_http_request_duration_seconds_count', request_labels), antes + 2)
+        self.assertEqual(self.sample('crm_cache_requests_total', {'cache': 'lookup', 'resultado': 'hit'}), hits + 1)
+
+        appointment = Appointment.objects.create(
+            lead=Lead.objects.create(nombre='Lead', celular='952000001'), fecha_hora=timezone.now(),
+        )
+        errores = self.sample('crm_webhook_deliveries_total', {'tipo': 'presencia', 'resultado': 'error_conexion'})
+        with mock.patch('leads.services.requests.post', side_effect=requests.ConnectionError), \
+                self.assertLogs('leads.services', 'ERROR'):
+            self.assertFalse(webhook_service.send_presence_notification(appointment))
+        self.assertEqual(
+            self.sample('crm_webhook_deliveries_total', {'tipo': 'presencia', 'resultado': 'error_conexion'}), errores + 1
+        )
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('crm_http_request_duration_seconds_bucket{le="0.005",method="GET",status="200",view="lookup"}',
+                      response.content.decode())
+        self.assertIn('crm_db_connections{', response.content.decode())
+
+        with override_settings(PROMETHEUS_METRICS_TOKEN='secreto'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer secreto'}).status_code, 200)
+
+    @unittest.skipUnless(settings.DATABASES['default']['OPTIONS'].get('pool'), 'Sin pool de conexiones')
+    def test_connection_pool_usage_is_exposed(self):
+        pedidas = self.sample('crm_db_pool_requests_total', {'alias': 'default'})
+        # Una conexión nueva del pool (la de la transacción del test sigue en uso)
+        connections['default'].pool.putconn(connections['default'].pool.getconn())
+        content = self.client.get('/metrics').content.decode()
+        self.assertGreater(self.sample('crm_db_pool_requests_total', {'alias': 'default'}), pedidas)
+        self.assertGreaterEqual(self.sample('crm_db_pool_connections', {'alias': 'default', 'state': 'en_uso'}), 1)
+        self.assertEqual(
+            self.sample('crm_db_pool_max_connections', {'alias': 'default'}),
+            settings.DATABASES['default']['OPTIONS']['pool']['max_size'],
+        )
+        self.assertGreater(self.sample('crm_db_pool_saturation', {'alias': 'default'}), 0)
+        self.assertIn('crm_db_pool_wait_seconds_total{alias="default"}', content)
+
+    def test_multiprocess_mode_adds_up_workers(self):
+        from prometheus_client import CollectorRegistry, multiprocess
+
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+            code = "from leads import monitoring; monitoring.observe_import({'creado': 5, 'error': 1}, 2.0)"
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', code], env=env, cwd=settings.BASE_DIR, check=True)
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=directory)
+            self.assertEqual(registry.get_sample_value('crm_import_rows_total', {'resultado': 'creado'}), 10)
+            self.assertEqual(registry.get_sample_value('crm_import_duration_seconds_count'), 2)
+            self.assertEqual(registry.get_sample_value('crm_import_rows_per_second'), 3)
+
+
+class SyntheticDataBenchmarkTests(TestCase):
+
+    def test_generated_data_feeds_benchmark_report(self):
+        call_command(
+            'generate_synthetic_data', leads=60, actions=120, appointments=30, duplicates=10, asesores=3,
+            presenciales=1, supervisores=2, opc_por_supervisor=2, batch_size=25, stdout=io.StringIO(),
+        )
+        self.assertEqual(Lead.objects.count(), 60)
+        self.assertEqual((Action.objects.count(), Appointment.objects.count(), LeadDuplicate.objects.count()), (120, 30, 10))
+        self.assertEqual(OPCPersonnel.objects.filter(rol='OPC', supervisor__rol='SUPERVISOR').count(), 4)
+        for lead in Lead.objects.filter(es_lead_opc=True).select_related('personal_opc_captador'):
+            self.assertEqual(lead.supervisor_opc_captador_id, lead.personal_opc_captador.supervisor_id)
+        for duplicado in LeadDuplicate.objects.select_related('original_lead'):
+            self.assertEqual(duplicado.celular, duplicado.original_lead.celular)
+        self.assertFalse(Lead.objects.filter(fecha_creacion__gt=F('ultima_actualizacion')).exists())
+        self.assertEqual(ChangeLog.objects.filter(entidad='lead', operacion='crear').count(), 60)
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark_suite', iterations=1, warmup=0, csv_rows=20, reassign_size=10,
+                output=output.name, stdout=io.StringIO(),
+            )
+            report = json.load(open(output.name))
+        self.assertEqual(report['volumen']['leads'], 60)
+        self.assertIn('upload_csv', report['resultados'])
+        for name, result in report['resultados'].items():
+            self.assertEqual(result['estado'], 200, name)
+            self.assertGreater(result['consultas'], 0, name)
+        # Las escrituras del benchmark se deshacen
+        self.assertEqual(Lead.objects.count(), 60)
+
+    def test_clear_asks_for_confirmation_and_keeps_real_leads(self):
+        opciones = dict(leads=20, actions=0, appointments=0, duplicates=0, asesores=2, presenciales=0,
+                        supervisores=1, opc_por_supervisor=1, stdout=io.StringIO())
+        call_command('generate_synthetic_data', **opciones)
+        real = Lead.objects.create(nombre='Real', celular='812345678', asesor=User.objects.create(username='operador'))
+
+        with mock.patch('builtins.input', return_value='no'), self.assertRaises(CommandError):
+            call_command('generate_synthetic_data', clear=True, **opciones)
+        self.assertEqual(Lead.objects.count(), 21)
+
+        with mock.patch('builtins.input', return_value='si'):
+            call_command('generate_synthetic_data', clear=True, **opciones)
+        call_command('generate_synthetic_data', clear=True, interactive=False, **opciones)
+        self.assertEqual(Lead.objects.count(), 21)
+        self.assertTrue(Lead.objects.filter(id=real.id).exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoadTestCommandTests(LiveServerTestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='carga_operador', password='clave-carga', rol='OPERADOR')
+        Lead.objects.bulk_create(
+            Lead(nombre=f'Lead {i}', celular=f'90000000{i}', asesor=user, tipificacion='NO CONTESTA') for i in range(5)
+        )
+
+    def run_load_test(self, **options):
+        options = {
+            'base_url': f'{self.live_server_url}/api', 'users': 2, 'duration': 2, 'ramp_up': 0, 'think_time': 0,
+            'mix': 'operador=1', 'user_prefix': 'carga_', 'password': 'clave-carga', 'seed': 1, **options,
+        }
+        call_command('load_test', stdout=io.StringIO(), **options)
+
+    def test_operator_sessions_report_steps_and_pass_thresholds(self):
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            self.run_load_test(max_error_rate=0, output=output.name)
+            report = json.load(open(output.name))
+        self.assertEqual(report['usuarios'], {'operador': 2, 'opc': 0, 'supervisor': 0})
+        self.assertEqual(report['pasos']['operador.login']['peticiones'], 2)
+        self.assertGreater(report['total']['peticiones'], 2)
+        self.assertEqual(report['total']['errores'], 0)
+
+    def test_threshold_violation_fails(self):
+        with self.assertRaisesMessage(CommandError, 'total:'):
+            self.run_load_test(read_only=True, min_rps=10 ** 6)
+
+
+class AppointmentListQueryBudgetTests(TestCase):
+    """El listado de citas debe resolver todas sus relaciones con un número fijo de consultas."""
+
+    # Versión de datos para el ETag + COUNT de la paginación + SELECT de la página con todas las relaciones unidas
+    QUERY_BUDGET = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='operador')
+        supervisor_user = User.objects.create(username='supervisor')
+        supervisor = OPCPersonnel.objects.create(nombre='Supervisor', rol='SUPERVISOR', user=supervisor_user)
+        for i in range(30):
+            opc_user = User.objects.create(username=f'opc{i}')
+            opc = OPCPersonnel.objects.create(nombre=f'OPC {i}', rol='OPC', supervisor=supervisor, user=opc_user)
+            lead = Lead.objects.create(
+                nombre=f'Lead {i}', celular=f'9000000{i:02d}', asesor=cls.user,
+                personal_opc_captador=opc, supervisor_opc_captador=supervisor,
+            )
+            Appointment.objects.create(
+                lead=lead, asesor_comercial=cls.user, asesor_presencial=supervisor_user,
+                opc_personal_atendio=opc, fecha_hora=timezone.now() + datetime.timedelta(days=i),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_full_list_query_count_does_not_grow_with_page_size(self):
+        small, _ = self.count_queries('/api/appointments/?page_size=5')
+        large, response = self.count_queries('/api/appointments/?page_size=30')
+        self.assertEqual(len(response.data['results']), 30)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.QUERY_BUDGET)
+
+    def test_compact_list_within_budget(self):
+        queries, response = self.count_queries('/api/appointments/?compact=true&page_size=30')
+        self.assertLessEqual(queries, self.QUERY_BUDGET)
+        first = response.data['results'][0]
+        self.assertEqual(set(first['lead']), {'id', 'nombre', 'celular', 'medio', 'tipificacion'})
+        self.assertIn('username', first['asesor_comercial'])
+
+
+class BulkReassignTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='supervisor')
+        cls.anterior = User.objects.create(username='anterior')
+        cls.nuevo = User.objects.create(username='nuevo')
+        cls.captador = OPCPersonnel.objects.create(nombre='Captador', rol='OPC')
+        Lead.objects.bulk_create([
+            Lead(nombre=f'Lead {i}', celular=f'9100000{i:02d}', asesor=cls.nuevo if i < 2 else cls.anterior)
+            for i in range(7)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reassigns_in_chunks_with_one_audit_row_per_changed_lead(self):
+        ids = list(Lead.objects.values_list('id', flat=True))
+        with self.settings(LEADS_BULK_CHUNK_SIZE=3):
+            response = self.client.post('/api/leads/reasignar/', {
+                'lead_ids': ids, 'nuevo_asesor_id': self.nuevo.id, 'nuevo_captador_id': self.captador.id,
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['reasignados'], 7)
+        self.assertEqual([p['modificados'] for p in response.data['progreso']], [3, 3, 1])
+        self.assertEqual([p['leads'] for p in response.data['progreso']], [3, 3, 1])
+        self.assertFalse(Lead.objects.exclude(asesor=self.nuevo).exists())
+        self.assertEqual(Lead.objects.filter(personal_opc_captador=self.captador, es_lead_opc=True).count(), 7)
+        # Sin la acción 'Lead Actualizado' de la señal post_save
+        self.assertEqual(Action.objects.filter(tipo_accion='Reasignación masiva').count(), 7)
+        self.assertEqual(Action.objects.exclude(tipo_accion='Reasignación masiva').count(), 0)
+        solo_captador = Action.objects.filter(detalle_accion='Lead reasignado: captador a Captador.').count()
+        self.assertEqual(solo_captador, 2)
+
+    def test_rejects_non_numeric_ids(self):
+        ids = list(Lead.objects.values_list('id', flat=True))
+        for cuerpo in ({'lead_ids': ids, 'nuevo_asesor_id': 'xyz'},
+                       {'lead_ids': ids, 'nuevo_captador_id': 'xyz'},
+                       {'lead_ids': ['abc'], 'nuevo_asesor_id': self.nuevo.id}):
+            response = self.client.post('/api/leads/reasignar/', cuerpo, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Lead.objects.filter(asesor=self.nuevo).count(), 2)
+
+    def test_failed_chunk_is_an_error_with_progress(self):
+        error = DatabaseError('bloque 2')
+        error.progreso = [{'bloque': 1, 'leads': 3, 'modificados': 3}]
+        ids = list(Lead.objects.values_list('id', flat=True))
+        with mock.patch.object(bulk, 'reassign_leads', side_effect=error):
+            response = self.client.post('/api/leads/reasignar/', {'lead_ids': ids, 'nuevo_asesor_id': self.nuevo.id}, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual((response.data['reasignados'], response.data['progreso']), (3, error.progreso))
+
+    def test_chunked(self):
+        self.assertEqual(list(bulk.chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+
+class BulkOperationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='supervisor', is_staff=True)
+        cls.asesor = User.objects.create(username='asesor')
+        cls.captador = OPCPersonnel.objects.create(nombre='Captador', rol='OPC')
+        Lead.objects.bulk_create([
+            Lead(nombre=f'Lead {i}', celular=f'9300000{i:02d}', tipificacion='NO CONTESTA' if i < 3 else 'SEGUIMIENTO')
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, query, cuerpo):
+        return self.client.post(f'/api/leads/bulk/{query}', cuerpo, format='json')
+
+    def test_each_operation_only_touches_filtered_leads(self):
+        filtro = '?tipificacion=NO+CONTESTA'
+        filtrados = set(Lead.objects.filter(tipificacion='NO CONTESTA').values_list('id', flat=True))
+        operaciones = [
+            ('reasignar_asesor', self.asesor.id, {'asesor': self.asesor}),
+            ('reasignar_captador', self.captador.id, {'personal_opc_captador': self.captador}),
+            ('marcar_directeo', True, {'es_directeo': True}),
+        ]
+        for operacion, valor, cambio in operaciones:
+            response = self.bulk(filtro, {'operacion': operacion, 'valor': valor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['modificados'], 3)
+            self.assertEqual(set(Lead.objects.filter(**cambio).values_list('id', flat=True)), filtrados)
+
+        response = self.bulk('?tipificacion=NO+CONTESTA', {'operacion': 'tipificar', 'valor': 'APAGADO'})
+        self.assertEqual(response.data['modificados'], 3)
+        self.assertEqual(Lead.objects.filter(tipificacion='SEGUIMIENTO').count(), 2)
+
+    def test_preview_counts_without_changes(self):
+        response = self.bulk('?search=Lead+1', {'operacion': 'marcar_directeo', 'valor': True, 'preview': True})
+        self.assertEqual(response.data, {'operacion': 'marcar_directeo', 'total': 1})
+        self.assertFalse(Lead.objects.filter(es_directeo=True).exists())
+        # Los rangos de fecha del listado también cuentan como filtro
+        response = self.bulk('?fecha_creacion_after=2000-01-01', {'operacion': 'tipificar', 'valor': 'APAGADO', 'preview': True})
+        self.assertEqual(response.data['total'], 5)
+
+    def test_requires_a_recognised_filter_or_todos(self):
+        for query in ('', '?foo=1', '?tipificaion=SEGUIMIENTO', '?tipificacion=', '?page=2&ordering=nombre'):
+            response = self.bulk(query, {'operacion': 'marcar_directeo', 'valor': True})
+            self.assertEqual(response.status_code, 400, query)
+        response = self.bulk('?foo=1', {'operacion': 'marcar_directeo', 'valor': True, 'todos': True})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Lead.objects.filter(es_directeo=True).exists())
+
+        response = self.bulk('', {'operacion': 'marcar_directeo', 'valor': True, 'todos': True})
+        self.assertEqual(response.data['modificados'], 5)
+
+    def test_failed_chunk_is_an_error_with_progress(self):
+        error = DatabaseError('bloque 2')
+        error.progreso = [{'bloque': 1, 'leads': 2, 'modificados': 2}]
+        with mock.patch.object(bulk, 'set_directeo', side_effect=error):
+            response = self.bulk('', {'operacion': 'marcar_directeo', 'valor': True, 'todos': True})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual((response.data['total'], response.data['modificados']), (5, 2))
+        self.assertEqual(response.data['progreso'], error.progreso)
+
+    def test_rejects_non_numeric_ids(self):
+        for operacion in ('reasignar_asesor', 'reasignar_captador'):
+            response = self.bulk('', {'operacion': operacion, 'valor': 'xyz', 'todos': True})
+            self.assertEqual(response.status_code, 400)
+
+
+class BulkDeleteTests(TestCase):
+
+    def test_deletes_dependents_with_one_summary_action_per_chunk(self):
+        user = User.objects.create(username='supervisor', is_staff=True)
+        leads = Lead.objects.bulk_create([Lead(nombre=f'Lead {i}', celular=f'9200000{i:02d}') for i in range(5)])
+        for lead in leads:
+            Appointment.objects.create(lead=lead, fecha_hora=timezone.now())
+            LeadDuplicate.objects.create(original_lead=lead, nombre=lead.nombre, celular=lead.celular)
+        conservado = Lead.objects.create(nombre='Conservado', celular='920000099')
+        Action.objects.all().delete()
+
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.settings(LEADS_BULK_CHUNK_SIZE=2):
+            response = client.post('/api/leads/bulk-delete/', {'lead_ids': [lead.id for lead in leads]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['eliminados'], 5)
+        self.assertEqual(list(Lead.objects.all()), [conservado])
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(LeadDuplicate.objects.exists())
+        # Sin 'Cita Eliminada' ni 'Lead Eliminado' por fila: un resumen por bloque
+        self.assertEqual(list(Action.objects.values_list('tipo_accion', flat=True)), ['Eliminación masiva'] * 3)
+
+    def test_filtered_delete_is_staff_only_and_rejects_unknown_params(self):
+        supervisor = User.objects.create(username='supervisor', is_staff=True)
+        operador = User.objects.create(username='operador', rol='OPERADOR')
+        Lead.objects.create(nombre='Borrar', celular='920000001', tipificacion='DATO FALSO')
+        conservado = Lead.objects.create(nombre='Conservar', celular='920000002', tipificacion='SEGUIMIENTO')
+        client = APIClient()
+
+        client.force_authenticate(operador)
+        response = client.post('/api/leads/bulk-delete/?tipificacion=DATO+FALSO', {}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(supervisor)
+        for query in ('?tipificaion=DATO+FALSO', '?tipificacion='):
+            response = client.post(f'/api/leads/bulk-delete/{query}', {}, format='json')
+            self.assertEqual(response.status_code, 400, query)
+        self.assertEqual(Lead.objects.count(), 2)
+
+        response = client.post('/api/leads/bulk-delete/?tipificacion=DATO+FALSO', {}, format='json')
+        self.assertEqual(response.data['eliminados'], 1)
+        self.assertEqual(list(Lead.objects.all()), [conservado])
+
+    def test_failed_chunk_is_an_error_with_progress(self):
+        user = User.objects.create(username='supervisor', is_staff=True)
+        lead = Lead.objects.create(nombre='Lead', celular='920000001')
+        error = DatabaseError('bloque 2')
+        error.progreso = [{'bloque': 1, 'leads': 1, 'modificados': 1}]
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch.object(bulk, 'delete_leads', side_effect=error):
+            response = client.post('/api/leads/bulk-delete/', {'lead_ids': [lead.id]}, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual((response.data['eliminados'], response.data['progreso']), (1, error.progreso))
+
+    def test_command_rejects_filters_that_do_not_filter(self):
+        Lead.objects.create(nombre='Borrar', celular='920000001', medio='Web')
+        conservado = Lead.objects.create(nombre='Conservar', celular='920000002', medio='Referidos')
+        for opciones in ({'filter': ['foo=bar']}, {'filter': ['asesor=']}, {'ids': '1,x'}):
+            with self.assertRaises(CommandError):
+                call_command('delete_leads', stdout=io.StringIO(), **opciones)
+        self.assertEqual(Lead.objects.count(), 2)
+
+        call_command('delete_leads', filter=['medio=Web', 'fecha_creacion_after=2000-01-01'], stdout=io.StringIO())
+        self.assertEqual(list(Lead.objects.all()), [conservado])
+
+
+class ActionHistoryTests(TestCase):
+
+    def test_appointment_history_is_deduplicated_and_cursor_paginated(self):
+        user = User.objects.create(username='operador')
+        lead = Lead.objects.create(nombre='Lead', celular='930000001')
+        otro = Lead.objects.create(nombre='Otro', celular='930000002')
+        appointment = Appointment.objects.create(lead=lead, fecha_hora=timezone.now())
+        Action.objects.all().delete()
+        Action.objects.bulk_create(
+            [Action(lead=lead, user=user, tipo_accion='Lead', detalle_accion='-') for _ in range(3)]
+            + [Action(lead=lead, appointment=appointment, user=user, tipo_accion='Cita', detalle_accion='-') for _ in range(2)]
+            + [Action(lead=otro, user=user, tipo_accion='Otro', detalle_accion='-')]
+        )
+
+        client = APIClient()
+        client.force_authenticate(user)
+        first = client.get(f'/api/appointments/{appointment.id}/actions/?page_size=3')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.data['results']), 3)
+        second = client.get(first.data['next'])
+        self.assertIsNone(second.data['next'])
+
+        ids = [a['id'] for a in first.data['results'] + second.data['results']]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(set(ids), set(Action.objects.filter(lead=lead).values_list('id', flat=True)))
+
+        response = client.get(f'/api/leads/{otro.id}/actions/')
+        self.assertEqual([a['tipo_accion'] for a in response.data['results']], ['Otro'])
+
+
+class LeadFullDetailTests(TestCase):
+
+    def test_fixed_query_count_and_conditional_get(self):
+        user = User.objects.create(username='operador')
+        lead = Lead.objects.create(nombre='Lead', celular='940000001', asesor=user)
+        for i in range(5):
+            Appointment.objects.create(lead=lead, fecha_hora=timezone.now() + datetime.timedelta(days=i))
+            LeadDuplicate.objects.create(original_lead=lead, nombre='Lead', celular='940000001')
+        LeadDuplicate.objects.create(original_lead=lead, nombre='Lead', celular='940000001', estado='ignorado')
+
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/leads/{lead.id}/full/?actions_page_size=2'
+        # Lead con validadores + página de acciones + citas + duplicados pendientes
+        with self.assertNumQueries(4):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['lead']['id'], lead.id)
+        self.assertEqual(len(response.data['actions']['results']), 2)
+        self.assertIn(f'/api/leads/{lead.id}/actions/?cursor=', response.data['actions']['next'])
+        self.assertEqual(len(response.data['appointments']), 5)
+        self.assertEqual(len(response.data['duplicates']), 5)
+
+        with self.assertNumQueries(1):
+            not_modified = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        LeadDuplicate.objects.filter(estado='pendiente').update(estado='fusionado')
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class ConditionalGetTests(TestCase):
+
+    def test_list_not_modified_until_data_changes(self):
+        user = User.objects.create(username='supervisor')
+        lead = Lead.objects.create(nombre='Lead', celular='950000001')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/api/leads/?page_size=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        # Solo la consulta de versión: sin COUNT, sin SELECT de la página, sin serializar
+        with self.assertNumQueries(1):
+            not_modified = client.get('/api/leads/?page_size=5', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        # Otros filtros, otra representación
+        self.assertEqual(client.get('/api/leads/?page_size=6', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        lead.delete()
+        self.assertEqual(client.get('/api/leads/?page_size=5', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_reference_data_detects_changes_without_timestamps_on_delete(self):
+        user = User.objects.create(username='supervisor')
+        otro = OPCPersonnel.objects.create(nombre='OPC', rol='OPC')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        etag = client.get('/api/opc-personnel/')['ETag']
+        self.assertEqual(client.get('/api/opc-personnel/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        otro.delete()
+        self.assertEqual(client.get('/api/opc-personnel/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class LeadExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='supervisor')
+        Lead.objects.bulk_create([
+            Lead(nombre=f'Lead {i}', celular=f'96000000{i}', ubicacion='Huacho', medio='Web' if i % 2 else 'Facebook',
+                 observacion='Línea 1\nLínea 2, con coma')
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_csv_streams_filtered_rows_that_upload_csv_accepts(self):
+        response = self.client.get('/api/leads/export/?medio=Web')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(list(rows[0]), export.EXPORT_COLUMNS)
+        self.assertEqual(rows[0]['observacion'], 'Línea 1\nLínea 2, con coma')
+
+        Lead.objects.all().delete()
+        upload = SimpleUploadedFile('leads.csv', content.encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/leads/upload_csv/', {'csv_file': upload}, format='multipart')
+        self.assertEqual(response.data['leads_creados'], 2)
+        self.assertEqual(response.data['errores'], [])
+
+    @unittest.skipUnless(importlib.util.find_spec('openpyxl'), 'openpyxl no está instalado')
+    def test_xlsx(self):
+        import openpyxl
+        response = self.client.get('/api/leads/export/?formato=xlsx&medio=Facebook')
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.values)
+        self.assertEqual(list(rows[0]), export.EXPORT_COLUMNS)
+        self.assertEqual(sorted(row[0] for row in rows[1:]), ['Lead 0', 'Lead 2', 'Lead 4'])
+
+
+class WorkQueueTests(TestCase):
+
+    def test_claims_by_priority_and_releases_on_tipificacion(self):
+        operador = User.objects.create(username='operador')
+        otro = User.objects.create(username='otro')
+        hace_un_dia = timezone.now() - datetime.timedelta(days=1)
+        ajeno = Lead.objects.create(nombre='Ajeno', celular='970000001', asesor=otro, tipificacion='VOLVER A LLAMAR')
+        sin_tipificar = Lead.objects.create(nombre='Nuevo', celular='970000002', asesor=operador)
+        reciente = Lead.objects.create(nombre='Reciente', celular='970000003', asesor=operador, tipificacion='NO CONTESTA')
+        volver = Lead.objects.create(nombre='Volver', celular='970000004', asesor=operador, tipificacion='VOLVER A LLAMAR')
+        no_contesta = Lead.objects.create(nombre='Antiguo', celular='970000005', asesor=operador, tipificacion='NO CONTESTA')
+        Lead.objects.filter(id=no_contesta.id).update(ultima_actualizacion=hace_un_dia)
+
+        client = APIClient()
+        client.force_authenticate(operador)
+        claimed = []
+        for _ in range(4):
+            response = client.post('/api/work-queue/next/')
+            self.assertEqual(response.status_code, 200)
+            claimed.append(response.data['lead'] and response.data['lead']['id'])
+            # Tipificar libera la reserva y saca el lead de su nivel
+            if response.data['lead']:
+                client.patch(f"/api/leads/{response.data['lead']['id']}/", {'tipificacion': 'NO INTERESADO - LEGALES'}, format='json')
+
+        # Ni leads de otro asesor ni reintentos contactados hace menos de WORK_QUEUE_RETRY_HOURS
+        self.assertEqual(claimed, [volver.id, sin_tipificar.id, no_contesta.id, None])
+        self.assertFalse(Lead.objects.filter(reservado_por__isnull=False).exists())
+        self.assertNotIn(ajeno.id, claimed)
+        self.assertNotIn(reciente.id, claimed)
+
+    def test_claim_stops_at_the_first_level_with_a_lead(self):
+        operador = User.objects.create(username='operador')
+        cita = Lead.objects.create(nombre='Cita', celular='970000011', tipificacion='CITA - POR CONFIRMAR')
+        Appointment.objects.create(lead=cita, fecha_hora=timezone.now() + datetime.timedelta(hours=2))
+        Lead.objects.create(nombre='Propio', celular='970000012', asesor=operador, tipificacion='VOLVER A LLAMAR')
+
+        with CaptureQueriesContext(connection) as ctx:
+            lead_id, prioridad, _ = work_queue.claim_next(operador)
+        # La cita sin asesor va antes que 'volver a llamar' de la cartera propia
+        self.assertEqual((lead_id, prioridad), (cita.id, 'cita_por_confirmar'))
+        # Un LIMIT 1 por nivel y cartera hasta encontrar lead: cita propia (vacío) y cita sin asesor
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(len(selects), 2)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED se valida en PostgreSQL')
+class WorkQueueConcurrencyTests(TransactionTestCase):
+
+    def test_locked_lead_is_skipped_not_awaited(self):
+        primero = User.objects.create(username='primero')
+        segundo = User.objects.create(username='segundo')
+        a = Lead.objects.create(nombre='A', celular='980000001', tipificacion='VOLVER A LLAMAR')
+        b = Lead.objects.create(nombre='B', celular='980000002', tipificacion='VOLVER A LLAMAR')
+        Lead.objects.filter(id=a.id).update(ultima_actualizacion=timezone.now() - datetime.timedelta(days=1))
+
+        # Otra conexión mantiene bloqueado el lead más prioritario (A) mientras se reclama
+        otra = connections.create_connection('default')
+        try:
+            with otra.cursor() as cursor:
+                cursor.execute('BEGIN')
+                cursor.execute('SELECT id FROM leads_lead WHERE id = %s FOR UPDATE', [a.id])
+                lead_id, _, _ = work_queue.claim_next(segundo)
+                cursor.execute('ROLLBACK')
+        finally:
+            otra.close()
+        self.assertEqual(lead_id, b.id)
+        self.assertEqual(work_queue.claim_next(primero)[0], a.id)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'El feed usa los ids de transacción de PostgreSQL')
+class ChangeFeedTests(TransactionTestCase):
+    # Transacciones reales: el feed solo muestra cambios de transacciones ya confirmadas
+
+    def feed(self, client, since, limit=100):
+        response = client.get('/api/changes/', {'since': since, 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_creates_updates_and_tombstones_in_order(self):
+        user = User.objects.create(username='sync')
+        client = APIClient()
+        client.force_authenticate(user)
+        inicio = self.feed(client, 'latest')['next']
+
+        lead = Lead.objects.create(nombre='Lead', celular='990000001')
+        appointment = Appointment.objects.create(lead=lead, fecha_hora=timezone.now())
+        otro = Lead.objects.create(nombre='Otro', celular='990000002')
+        lead.nombre = 'Lead editado'
+        lead.save()
+        bulk.delete_leads([otro.id], user)
+
+        data = self.feed(client, inicio)
+        resumen = [(c['entidad'], c['id'], c['operacion']) for c in data['results']]
+        # Un elemento por objeto, en el orden de su último cambio
+        self.assertEqual(resumen, [
+            ('appointment', appointment.id, 'crear'),
+            ('lead', lead.id, 'actualizar'),
+            ('lead', otro.id, 'eliminar'),
+        ])
+        self.assertEqual(data['results'][1]['datos']['nombre'], 'Lead editado')
+        self.assertIsNone(data['results'][2]['datos'])
+
+        # Paginación por cursor: se reanuda justo después del último cambio entregado
+        primera = self.feed(client, inicio, limit=2)
+        self.assertTrue(primera['has_more'])
+        resto = self.feed(client, primera['next'])
+        self.assertFalse(resto['has_more'])
+        self.assertEqual(resto['next'], data['next'])
+        self.assertEqual(self.feed(client, data['next'])['results'], [])
+
+
+class ClaimsAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='operador', password='clave-segura', rol='OPERADOR')
+
+    def setUp(self):
+        cache.clear()
+        response = self.client.post('/api/token/', {'username': 'operador', 'password': 'clave-segura'})
+        self.tokens = response.json()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+
+    def test_request_user_comes_from_claims(self):
+        self.client.post('/api/work-queue/release/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/work-queue/release/')
+        self.assertEqual(response.status_code, 200)
+        # Solo el UPDATE de la cola: ni la fila del usuario ni la lista de revocación (en caché)
+        queries = [q['sql'] for q in ctx.captured_queries if '"leads_' in q['sql']]
+        self.assertEqual(len(queries), 1, queries)
+
+    @LOCAL_CACHE
+    def test_process_local_cache_reads_revocations_on_every_request(self):
+        # Una revocación hecha en otro proceso no borra la caché de este: no debe cachearse
+        self.assertEqual(self.client.post('/api/work-queue/release/').status_code, 200)
+        TokenRevocation.objects.create(user_id=self.user.id, motivo='otro proceso')
+        self.assertEqual(self.client.post('/api/work-queue/release/').status_code, 401)
+
+    def test_user_change_and_logout_revoke_tokens(self):
+        self.assertEqual(self.client.post('/api/work-queue/release/').status_code, 200)
+        self.user.rol = 'OPC'
+        self.user.save()
+        self.assertEqual(self.client.post('/api/work-queue/release/').status_code, 401)
+        refresh = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(refresh.status_code, 401)
+
+        # Nuevo inicio de sesión: el rol actual viaja en el token; al cerrar sesión deja de valer
+        self.setUp()
+        self.assertEqual(AccessToken(self.tokens['access'])['rol'], 'OPC')
+        response = self.client.post('/api/token/revoke/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post('/api/work-queue/release/').status_code, 401)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']}).status_code, 401)
+
+
+class AsyncMetricsTests(TransactionTestCase):
+    # Transacciones reales: las consultas en paralelo usan otras conexiones. Las métricas leen
+    # de la réplica si está configurada
+    databases = '__all__'
+
+    def test_async_views_return_same_json(self):
+        user = User.objects.create(username='supervisor')
+        opc_user = User.objects.create(username='opc')
+        opc = OPCPersonnel.objects.create(nombre='OPC', rol='OPC', user=opc_user)
+        for i in range(6):
+            lead = Lead.objects.create(
+                nombre=f'Lead {i}', celular=f'97000000{i}', asesor=user if i % 2 else None,
+                personal_opc_captador=opc, tipificacion='CITA - SALA' if i < 3 else '',
+                fecha_captacion=timezone.localdate(), distrito='Lima' if i < 4 else None,
+            )
+            Appointment.objects.create(
+                lead=lead, asesor_comercial=user, asesor_presencial=user if i < 2 else opc_user,
+                opc_personal_atendio=opc if i % 3 == 0 else None, fecha_hora=timezone.now(),
+                estado='Realizada' if i < 4 else 'Pendiente', has_ever_been_confirmed=i < 5,
+            )
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        for path, params in [
+            ('dashboard-metrics', {}),
+            ('dashboard-metrics', {'asesor_id': opc_user.id}),
+            ('dashboard-metrics', {'fecha_desde': 'ayer'}),
+            ('opc-leads-metrics', {}),
+        ]:
+            expected = self.client.get(f'/api/{path}/', params, headers=headers)
+            response = async_to_sync(AsyncClient().get)(f'/api/async/{path}/', params, headers=headers)
+            self.assertEqual(response.status_code, expected.status_code)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        self.assertEqual(async_to_sync(AsyncClient().get)('/api/async/dashboard-metrics/').status_code, 401)
+
+
+class LiveEventsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='operador')
+        cls.otro = User.objects.create(username='otro')
+        cls.lead = Lead.objects.create(nombre='Lead', celular='990000101', asesor=cls.user)
+        cls.ajeno = Lead.objects.create(nombre='Ajeno', celular='990000102', asesor=cls.otro)
+
+    def test_requires_asgi(self):
+        response = self.client.get('/api/events/', {'token': str(AccessToken.for_user(self.user))})
+        self.assertEqual(response.status_code, 501)
+
+    def tipificar(self, lead_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            lead = Lead.objects.get(id=lead_id)
+            lead.tipificacion = 'NO CONTESTA'
+            lead.save()
+
+    async def test_streams_changed_fields_of_own_leads(self):
+        token = str(AccessToken.for_user(self.user))
+        self.assertEqual((await AsyncClient().get('/api/events/', {'token': 'x'})).status_code, 401)
+
+        response = await AsyncClient().get('/api/events/', {'token': token, 'asesor': 'me'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        # El lead de otro asesor no llega a esta suscripción; el propio sí, con sus campos
+        await sync_to_async(self.tipificar)(self.ajeno.id)
+        await sync_to_async(self.tipificar)(self.lead.id)
+        message = (await anext(stream)).decode()
+        self.assertTrue(message.startswith('event: cambio\n'))
+        data = json.loads(message.split('data: ', 1)[1])
+        self.assertEqual(data, {'entidad': 'lead', 'id': self.lead.id, 'operacion': 'actualizar', 'campos': ['tipificacion']})
+
+        # Al desconectarse el cliente el servidor cancela la respuesta: la suscripción se retira
+        pendiente = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pendiente.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pendiente
+        self.assertEqual(len(events.broadcaster), 0)
+
+    async def test_non_staff_only_receives_own_changes(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await AsyncClient().get('/api/events/', {'token': token, 'asesor': self.otro.id})
+        self.assertEqual(response.status_code, 403)
+
+        # Sin ?asesor= la suscripción se limita igualmente al propio usuario
+        response = await AsyncClient().get('/api/events/', {'token': token})
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        await sync_to_async(self.tipificar)(self.ajeno.id)
+        await sync_to_async(self.tipificar)(self.lead.id)
+        data = json.loads((await anext(stream)).decode().split('data: ', 1)[1])
+        self.assertEqual(data['id'], self.lead.id)
+        await stream.aclose()
+
+    def test_bulk_events_reach_only_old_and_new_asesor(self):
+        tercero = User.objects.create(username='tercero')
+        with mock.patch.object(events.broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                bulk.reassign_leads([self.lead.id], self.user, nuevo_asesor=tercero)
+            with self.captureOnCommitCallbacks(execute=True):
+                bulk.delete_leads([self.ajeno.id], self.user)
+
+        reasignado, eliminado = (call.kwargs['asesores'] for call in publish.call_args_list)
+        self.assertEqual(reasignado, {self.user.id, tercero.id})
+        self.assertEqual(eliminado, {self.otro.id})
+        suscripcion = events.Subscription(loop=None, asesor_id=self.otro.id)
+        self.assertFalse(suscripcion.matches(reasignado, False))
+        self.assertTrue(suscripcion.matches(eliminado, False))
+
+
+class LiveEventsConnectionTests(TransactionTestCase):
+    # Sin la transacción de TestCase: la vista puede cerrar (devolver al pool) la conexión
+
+    async def test_stream_does_not_hold_a_database_connection(self):
+        user = await User.objects.acreate(username='operador', rol='OPC')
+        # AccessToken.for_user no lleva el claim 'rol': la autenticación lee el usuario de la base de datos
+        token = str(AccessToken.for_user(user))
+
+        response = await AsyncClient().get('/api/events/', {'token': token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIsNone(await sync_to_async(lambda: connection.connection)())
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        await stream.aclose()
+
+
+def index_names(node):
+    """Índices usados en un nodo de plan (EXPLAIN FORMAT JSON) y sus hijos."""
+    if 'Index Name' in node:
+        yield node['Index Name']
+    for child in node.get('Plans', []):
+        yield from index_names(child)
+
+
+def seq_scanned_relations(node):
+    """Tablas recorridas con Seq Scan en un nodo de plan (EXPLAIN FORMAT JSON) y sus hijos."""
+    if node.get('Node Type') == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', []):
+        yield from seq_scanned_relations(child)
+
+
+@tag('queryplan')
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Los planes de consulta solo se validan en PostgreSQL')
+@override_settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=1000)
+class QueryPlanRegressionTests(TestCase):
+    """
+    Siembra un volumen sintético, ejecuta los endpoints más usados y falla si alguna de sus
+    consultas sobre las tablas grandes vuelve a un Seq Scan.
+    Ejecutar solo este arnés: python manage.py test leads --tag=queryplan
+    """
+    LEADS = 40000
+    LARGE_TABLES = {'leads_lead', 'leads_appointment', 'leads_action'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.asesores = [User(username=f'asesor{i}') for i in range(20)]
+        User.objects.bulk_create(cls.asesores)
+        cls.user = cls.asesores[0]
+        opcs = [OPCPersonnel(nombre=f'OPC {i}', rol='OPC') for i in range(10)]
+        OPCPersonnel.objects.bulk_create(opcs)
+
+        tipificaciones = [choice for choice, _ in Lead.TIPIFICACION_CHOICES]
+        Lead.objects.bulk_create([
+            Lead(
+                nombre=f'Lead {i}', celular=f'9{i:08d}',
+                asesor=cls.asesores[i % len(cls.asesores)],
+                tipificacion=tipificaciones[i % len(tipificaciones)],
+                medio='Web', distrito='Lima',
+                # ~2% directeo y ~5% OPC, como en producción
+                es_directeo=i % 50 == 0,
+                es_lead_opc=i % 20 == 0,
+                personal_opc_captador=opcs[i % len(opcs)] if i % 20 == 0 else None,
+                fecha_captacion=datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 730) if i % 20 == 0 else None,
+            )
+            for i in range(cls.LEADS)
+        ], batch_size=2000)
+        leads = list(Lead.objects.values_list('id', flat=True)[:cls.LEADS // 4])
+        now = timezone.now()
+        # Distribución realista: la mayoría pendientes, pocas realizadas o reprogramadas
+        estados = ['Pendiente'] * 12 + ['Confirmada'] * 3 + ['Cancelada'] * 3 + ['Realizada', 'Reprogramada']
+        Appointment.objects.bulk_create([
+            Appointment(
+                lead_id=lead_id, asesor_comercial=cls.asesores[n % len(cls.asesores)],
+                fecha_hora=now + datetime.timedelta(hours=n), estado=estados[n % len(estados)],
+                has_ever_been_confirmed=n % 3 == 0,
+            )
+            for n, lead_id in enumerate(leads)
+        ], batch_size=2000)
+        Action.objects.bulk_create([
+            Action(lead_id=lead_id, user=cls.user, tipo_accion='Lead Actualizado', detalle_accion='-')
+            for lead_id in leads
+            for _ in range(4)
+        ], batch_size=5000)
+
+        with connection.cursor() as cursor:
+            # auto_now_add ignora los valores de bulk_create: repartir las fechas en dos años
+            cursor.execute("UPDATE leads_lead SET fecha_creacion = now() - (id % 730) * interval '1 day'")
+            cursor.execute("UPDATE leads_appointment SET fecha_creacion = now() - (id % 730) * interval '1 day'")
+            cursor.execute("UPDATE leads_action SET fecha_accion = now() - (id % 730) * interval '1 day'")
+            cursor.execute('ANALYZE leads_lead, leads_appointment, leads_action')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def assertNoSeqScan(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertQueriesUseIndexes(url, ctx.captured_queries)
+
+    def assertQueriesUseIndexes(self, label, captured_queries):
+        for query in captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            scanned = set(seq_scanned_relations(self.explain(sql))) & self.LARGE_TABLES
+            self.assertFalse(scanned, f'{label}: Seq Scan sobre {sorted(scanned)} en\n{sql}')
+
+    def test_lead_lists(self):
+        self.assertNoSeqScan('/api/leads/')
+        self.assertNoSeqScan('/api/leads/?context=opc')
+        self.assertNoSeqScan('/api/leads/?context=gestion')
+        self.assertNoSeqScan(f'/api/leads/?asesor={self.user.id}&tipificacion=NO%20CONTESTA')
+
+    def test_opc_leads_metrics(self):
+        self.assertNoSeqScan('/api/opc-leads-metrics/?fecha_desde=2024-03-01&fecha_hasta=2024-03-31')
+
+    def test_dashboard_metrics(self):
+        today = timezone.now().date()
+        desde = (today - datetime.timedelta(days=7)).isoformat()
+        self.assertNoSeqScan(f'/api/dashboard-metrics/?fecha_desde={desde}&fecha_hasta={today.isoformat()}')
+
+    def test_appointments_and_actions(self):
+        self.assertNoSeqScan('/api/appointments/?estado=Realizada')
+        self.assertNoSeqScan('/api/actions/')
+        lead_id = Action.objects.values_list('lead_id', flat=True).first()
+        self.assertNoSeqScan(f'/api/leads/{lead_id}/actions/')
+
+    def test_work_queue_claim(self):
+        # Cola vacía para un operador sin cartera: se prueban todos los niveles de prioridad
+        operador = User.objects.create(username='sin_cartera')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIsNone(work_queue.claim_next(operador))
+        self.assertQueriesUseIndexes('work_queue.claim_next', ctx.captured_queries)
+
+    def test_work_queue_probes_are_index_ordered(self):
+        # Cada nivel de la cartera propia es un LIMIT 1 ... FOR UPDATE SKIP LOCKED sobre
+        # lead_asesor_tipif_act_idx: el índice entrega las filas ya ordenadas por
+        # ultima_actualizacion, sin leer ni ordenar la cartera entera. Las citas por confirmar se
+        # ordenan por la fecha de la cita, en appt_fecha_hora_idx o entre los pocos leads de la
+        # cartera en 'CITA - POR CONFIRMAR'
+        with CaptureQueriesContext(connection) as ctx:
+            work_queue.claim_next(self.user)
+        probes = [q['sql'] for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(probes)
+        for sql in probes:
+            if 'leads_appointment' in sql:
+                continue
+            plan = self.explain(sql)
+            if f'"asesor_id" = {self.user.id}' in sql:
+                self.assertIn('lead_asesor_tipif_act_idx', set(index_names(plan)), sql)
+            node = plan
+            while node['Node Type'] in ('Limit', 'LockRows'):
+                node = node['Plans'][0]
+            self.assertNotEqual(node['Node Type'], 'Sort', sql)
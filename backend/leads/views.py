@@ -3,30 +3,41 @@
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import FilterSet, DateFromToRangeFilter
 import django_filters
 from rest_framework.filters import SearchFilter, OrderingFilter
 
-from django.db import transaction
-from django.db.models import Count, Q
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+import asyncio
 import datetime
+import json
+import os
+import time
 
-from .models import Lead, User, Action, Appointment, OPCPersonnel, LeadDuplicate
-from . import serializers
+from .models import Lead, User, Action, Appointment, OPCPersonnel, LeadDuplicate, SlowQuery
+from . import authentication, bulk, changes, events, export, metrics, monitoring, perf, profiling, replica, serializers, slow_queries, work_queue
+from .lookup import LOOKUP_CACHED_ENTITIES, lookup_cache_key
 from .serializers import LeadDuplicateSerializer
 from leads.models import User
 from .services import webhook_service
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from .pagination import StandardResultsSetPagination, ApproximateCountPagination, ActionCursorPagination
+from .conditional import ConditionalGetMixin, conditional_get, conditional_view, latest, make_etag
 
 
 class LeadFilter(FilterSet):
@@ -50,6 +61,22 @@ class LeadFilter(FilterSet):
             'calle_o_modulo': ['exact'],
         }
 
+    @classmethod
+    def param_names(cls):
+        """Parámetros que entiende el filtro; los rangos de fecha llegan como <campo>_after / <campo>_before."""
+        names = set()
+        for name, filtro in cls.base_filters.items():
+            suffixes = getattr(filtro.field.widget, 'suffixes', None)
+            if suffixes:
+                names |= {f'{name}_{suffix}' for suffix in suffixes}
+            else:
+                names.add(name)
+        return names
+
+    def is_filtering(self):
+        """True si algún filtro tiene un valor válido y no vacío (los vacíos no restringen nada)."""
+        return self.is_valid() and any(value not in (None, '') for value in self.form.cleaned_data.values())
+
     def filter_is_opc_lead(self, queryset, name, value):
         if value is True:
             # Usar el nuevo campo es_lead_opc para mayor precisión
@@ -67,10 +94,20 @@ class LeadFilter(FilterSet):
         return queryset
 
 
-class LeadViewSet(viewsets.ModelViewSet):
+def paginated_actions(request, view, condition):
+    """Historial de acciones que cumplen 'condition', ordenado y paginado por cursor en la base de datos."""
+    queryset = Action.objects.filter(condition).select_related('user__opc_profile', 'appointment')
+    paginator = ActionCursorPagination()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    serializer = serializers.ActionSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+class LeadViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Lead.objects.all().select_related(
         'asesor', 'personal_opc_captador', 'supervisor_opc_captador'
     ).order_by('-fecha_creacion')
+    conditional_models = (Lead, User, OPCPersonnel)
     
     serializer_class = serializers.LeadSerializer
     permission_classes = [IsAuthenticated]
@@ -83,18 +120,78 @@ class LeadViewSet(viewsets.ModelViewSet):
         'ubicacion', 'fecha_captacion', 'personal_opc_captador', 'supervisor_opc_captador', 'proyecto_interes'
     ]
 
-    pagination_class = StandardResultsSetPagination
+    # Conteo estimado/cacheado: el COUNT(*) exacto era la consulta más lenta del listado
+    pagination_class = ApproximateCountPagination
+
+    NESTED_SELECT_RELATED = {
+        'asesor': ['asesor__opc_profile'],
+        'personal_opc_captador': ['personal_opc_captador__supervisor', 'personal_opc_captador__user'],
+        'supervisor_opc_captador': ['supervisor_opc_captador__supervisor', 'supervisor_opc_captador__user'],
+    }
+
+    # Acciones incluidas en /full/; el resto se pide con el cursor 'next' a /actions/
+    FULL_ACTIONS_PAGE_SIZE = 20
+
+    def _csv_param(self, name):
+        value = self.request.query_params.get(name) if self.request else None
+        return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+    def is_flat_list(self):
+        # Modo plano solo en el listado: ?flat=true o cualquier ?expand=
+        if getattr(self, 'action', None) != 'list':
+            return False
+        flat = self.request.query_params.get('flat', '').lower() in ('1', 'true')
+        return flat or bool(self._csv_param('expand'))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request and self.request.method == 'GET':
+            fields = self._csv_param('fields')
+            if fields:
+                context['fields'] = fields
+            if self.is_flat_list():
+                context['flat'] = True
+                context['expand'] = self._csv_param('expand')
+        return context
 
     def get_queryset(self):
         qs = super().get_queryset()
+        # La representación anidada de User/OPCPersonnel lee opc_profile, supervisor y user:
+        # solo se unen las relaciones que realmente se van a anidar
+        nested = self._csv_param('expand') if self.is_flat_list() else self.NESTED_SELECT_RELATED
+        related = [path for name in nested for path in self.NESTED_SELECT_RELATED.get(name, [])]
+        if related:
+            qs = qs.select_related(*related)
         # Si la vista es para gestión de leads (operadores), excluir directeo
         if self.request.query_params.get('context') == 'gestion':
             qs = qs.filter(es_directeo=False)
         # Si la vista es para Leads OPC, solo mostrar directeo
         if self.request.query_params.get('context') == 'opc':
             qs = qs.filter(es_directeo=True)
+        if getattr(self, 'action', None) == 'full':
+            qs = qs.annotate(**self.full_freshness_annotations())
         return qs
 
+    @staticmethod
+    def full_freshness_annotations():
+        # Validadores de /full/ calculados en la misma consulta que carga el lead
+        appointments = Appointment.objects.filter(lead=OuterRef('pk')).order_by()
+        return {
+            'ultima_accion_fecha': Subquery(
+                Action.objects.filter(lead=OuterRef('pk')).order_by('-fecha_accion').values('fecha_accion')[:1]
+            ),
+            'ultima_cita_actualizacion': Subquery(
+                appointments.order_by('-ultima_actualizacion').values('ultima_actualizacion')[:1]
+            ),
+            'citas_total': Subquery(
+                appointments.values('lead').annotate(total=Count('id')).values('total')
+            ),
+            'duplicados_pendientes': Subquery(
+                LeadDuplicate.objects.filter(original_lead=OuterRef('pk'), estado='pendiente')
+                .order_by().values('original_lead').annotate(total=Count('id')).values('total')
+            ),
+        }
+
     def perform_create(self, serializer):
         data = self.request.data
         es_directeo = data.get('es_directeo', False)
@@ -112,6 +209,10 @@ class LeadViewSet(viewsets.ModelViewSet):
         serializer.save()
 
     def perform_update(self, serializer):
+        # Registrar una tipificación libera la reserva de la cola de llamadas
+        if 'tipificacion' in serializer.validated_data:
+            serializer.instance.reservado_por = None
+            serializer.instance.reservado_hasta = None
         data = self.request.data
         es_directeo = data.get('es_directeo', False)
         personal_opc_captador_id = data.get('personal_opc_captador') or data.get('personal_opc_captador_id')
@@ -130,18 +231,66 @@ class LeadViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def actions(self, request, pk=None):
         lead = self.get_object()
-        actions = lead.actions.all().order_by('-fecha_accion')
-        serializer = serializers.ActionSerializer(actions, many=True)
-        return Response(serializer.data)
+        return paginated_actions(request, self, Q(lead=lead))
+
+    @action(detail=True, methods=['get'])
+    def full(self, request, pk=None):
+        """
+        Lead con sus últimas acciones (y cursor para el resto), todas sus citas y los duplicados
+        pendientes en una sola respuesta, con un número fijo de consultas. Admite GET condicional:
+        si nada cambió desde la versión que tiene el cliente se responde 304 tras una sola consulta.
+        """
+        lead = self.get_object()
+        etag = make_etag(
+            'lead-full', lead.pk, lead.ultima_actualizacion, lead.ultima_accion_fecha,
+            lead.ultima_cita_actualizacion, lead.citas_total, lead.duplicados_pendientes,
+            request.query_params.urlencode(),
+        )
+        last_modified = latest(lead.ultima_actualizacion, lead.ultima_accion_fecha, lead.ultima_cita_actualizacion)
+        return conditional_get(
+            request, lambda: self._full_response(request, lead), etag=etag, last_modified=last_modified
+        )
+
+    def _full_response(self, request, lead):
+        paginator = ActionCursorPagination()
+        paginator.page_size = self.FULL_ACTIONS_PAGE_SIZE
+        paginator.page_size_query_param = 'actions_page_size'
+        actions = paginator.paginate_queryset(
+            Action.objects.filter(lead=lead).select_related('user__opc_profile', 'appointment'), request, view=self
+        )
+        # El cursor de 'más acciones' apunta al historial paginado del lead
+        paginator.base_url = request.build_absolute_uri(reverse('lead-actions', args=[lead.pk]))
+
+        appointments = list(Appointment.objects.filter(lead=lead).select_related(
+            'asesor_comercial', 'asesor_presencial', 'opc_personal_atendio'
+        ).order_by('-fecha_hora'))
+        for appointment in appointments:
+            appointment.lead = lead
+        duplicates = LeadDuplicate.objects.filter(original_lead=lead, estado='pendiente').select_related(
+            'asesor__opc_profile', 'captador__supervisor', 'captador__user'
+        ).order_by('-fecha_importacion')
+
+        return Response({
+            'lead': self.get_serializer(lead).data,
+            'actions': {
+                'next': paginator.get_next_link(),
+                'results': serializers.ActionSerializer(actions, many=True).data,
+            },
+            'appointments': serializers.AppointmentListSerializer(appointments, many=True).data,
+            'duplicates': serializers.LeadDuplicateCompactSerializer(duplicates, many=True).data,
+        })
 
     @action(detail=False, methods=['post'])
     def upload_csv(self, request):
         import csv, io
+        inicio = time.perf_counter()
         if 'csv_file' not in request.FILES:
+            monitoring.import_failed('sin_archivo')
             return Response({'error': 'No se proporcionó ningún archivo CSV.'}, status=status.HTTP_400_BAD_REQUEST)
 
         csv_file = request.FILES['csv_file']
         if not csv_file.name.endswith('.csv'):
+            monitoring.import_failed('formato')
             return Response({'error': 'El archivo debe ser un archivo CSV.'}, status=status.HTTP_400_BAD_REQUEST)
 
         data_set = csv_file.read().decode('UTF-8')
@@ -150,6 +299,7 @@ class LeadViewSet(viewsets.ModelViewSet):
 
         asesores_activos = list(User.objects.filter(is_active=True).order_by('id'))
         if not asesores_activos:
+            monitoring.import_failed('sin_asesores')
             return Response({'error': 'No hay asesores activos para asignar leads.'}, status=status.HTTP_400_BAD_REQUEST)
 
         leads_creados = 0
@@ -244,6 +394,10 @@ class LeadViewSet(viewsets.ModelViewSet):
                     errores.append(f"Fila {row_num}: Error al procesar '{row.get('nombre', 'N/A')}' - {e}")
 
             duplicados_guardados = LeadDuplicate.objects.filter(estado='pendiente').count()
+            monitoring.observe_import({
+                'creado': leads_creados, 'actualizado': leads_actualizados,
+                'duplicado': duplicados, 'error': len(errores),
+            }, time.perf_counter() - inicio)
             return Response({
                 'message': 'Proceso de carga de CSV completado.',
                 'leads_creados': leads_creados,
@@ -254,6 +408,24 @@ class LeadViewSet(viewsets.ModelViewSet):
                 'total_filas_procesadas': total_filas_en_csv,
             }, status=status.HTTP_200_OK if not errores else status.HTTP_206_PARTIAL_CONTENT)
 
+    @action(detail=False, methods=['get'])
+    @replica.read_from_replica
+    def export(self, request):
+        """
+        Exporta los leads que cumplen los filtros del listado (LeadFilter, search, context).
+        ?formato=csv (por defecto, en streaming) o ?formato=xlsx. Las columnas son las de upload_csv.
+        """
+        formato = request.query_params.get('formato', 'csv').lower()
+        if formato not in ('csv', 'xlsx'):
+            return Response({'error': 'Formato no soportado. Usa csv o xlsx.'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None)
+        if formato == 'xlsx':
+            try:
+                return export.xlsx_response(queryset)
+            except ImportError:
+                return Response({'error': 'La exportación XLSX requiere openpyxl.'}, status=status.HTTP_400_BAD_REQUEST)
+        return export.csv_response(queryset)
+
     @action(detail=False, methods=['post'], url_path='reasignar')
     def reasignar(self, request):
         ids = request.data.get('lead_ids', [])
@@ -261,28 +433,176 @@ class LeadViewSet(viewsets.ModelViewSet):
         nuevo_captador_id = request.data.get('nuevo_captador_id')
         if not ids or (not nuevo_asesor_id and not nuevo_captador_id):
             return Response({'error': 'Debes proporcionar los IDs de los leads y el nuevo asesor o captador.'}, status=400)
-        updated = 0
-        from .models import Action, User, OPCPersonnel
+        try:
+            ids = [int(i) for i in ids]
+            nuevo_asesor_id = int(nuevo_asesor_id) if nuevo_asesor_id else None
+            nuevo_captador_id = int(nuevo_captador_id) if nuevo_captador_id else None
+        except (TypeError, ValueError):
+            return Response({'error': 'Los IDs de leads, asesor y captador deben ser números enteros.'}, status=400)
         nuevo_asesor = User.objects.filter(id=nuevo_asesor_id).first() if nuevo_asesor_id else None
         nuevo_captador = OPCPersonnel.objects.filter(id=nuevo_captador_id).first() if nuevo_captador_id else None
-        for lead in Lead.objects.filter(id__in=ids):
-            cambios = []
-            if nuevo_asesor and lead.asesor != nuevo_asesor:
-                lead.asesor = nuevo_asesor
-                cambios.append(f'asesor a {nuevo_asesor.username}')
-            if nuevo_captador and lead.personal_opc_captador != nuevo_captador:
-                lead.personal_opc_captador = nuevo_captador
-                cambios.append(f'captador a {nuevo_captador.nombre}')
-            if cambios:
-                lead.save()
-                Action.objects.create(
-                    lead=lead,
-                    user=request.user,
-                    tipo_accion='Reasignación masiva',
-                    detalle_accion=f'Lead reasignado: {", ".join(cambios)}.'
-                )
-                updated += 1
-        return Response({'message': f'{updated} leads reasignados correctamente.'})
+        if (nuevo_asesor_id and not nuevo_asesor) or (nuevo_captador_id and not nuevo_captador):
+            return Response({'error': 'El asesor o captador indicado no existe.'}, status=400)
+
+        # UPDATE por bloques + un bulk_create de auditoría por bloque (ver leads/bulk.py).
+        # Si un bloque falla, los anteriores ya están confirmados: el error lleva el 'progreso'
+        try:
+            progreso = bulk.reassign_leads(ids, request.user, nuevo_asesor, nuevo_captador)
+        except DatabaseError as e:
+            progreso = getattr(e, 'progreso', [])
+            updated = sum(p['modificados'] for p in progreso)
+            return Response({
+                'error': f'Error en la reasignación tras {updated} leads reasignados: {e}',
+                'reasignados': updated,
+                'progreso': progreso,
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        updated = sum(p['modificados'] for p in progreso)
+        return Response({
+            'message': f'{updated} leads reasignados correctamente.',
+            'reasignados': updated,
+            'progreso': progreso,
+        })
+
+    # Parámetros del listado que no filtran: se aceptan, pero no cuentan como filtro
+    BULK_NON_FILTER_PARAMS = {'page', 'page_size', 'ordering', 'fields', 'flat', 'expand'}
+
+    def _bulk_queryset(self, request):
+        """
+        Leads afectados por una operación masiva: los mismos filtros del listado (query string).
+        Devuelve (queryset, error). Un parámetro desconocido es un error, para que una errata no
+        se convierta en "todos los leads"; sin ningún filtro efectivo hace falta 'todos': true.
+        """
+        conocidos = self.BULK_NON_FILTER_PARAMS | {'search', 'context'} | self.filterset_class.param_names()
+        desconocidos = sorted(set(request.query_params) - conocidos)
+        if desconocidos:
+            return None, f'Parámetros no reconocidos: {", ".join(desconocidos)}.'
+
+        # Valida los filtros (400 si algún valor es inválido) antes de ver cuáles aplican
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).order_by()
+        filterset = self.filterset_class(request.query_params, queryset=Lead.objects.none(), request=request)
+        filtrado = (
+            filterset.is_filtering()
+            or bool(request.query_params.get('search', '').strip())
+            or request.query_params.get('context') in ('gestion', 'opc')
+        )
+        if not filtrado and request.data.get('todos') not in (True, 'true', '1', 1):
+            return None, 'Indica al menos un filtro o envía "todos": true para operar sobre todos los leads.'
+        return queryset, None
+
+    # Tipificaciones con efectos secundarios en la señal post_save (cita Realizada + webhook):
+    # no se permiten en masa porque las operaciones masivas no disparan señales
+    BULK_TIPIFICACIONES_EXCLUIDAS = ['YA ASISTIO']
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_operation(self, request):
+        """
+        Aplica una operación a todos los leads que cumplen los filtros del listado.
+        Los filtros (LeadFilter, search, context) van en el query string, igual que en GET /api/leads/.
+        Cuerpo:
+        - operacion: 'reasignar_asesor' | 'reasignar_captador' | 'tipificar' | 'marcar_directeo'
+        - valor: id de usuario, id de personal OPC, tipificación o booleano según la operación.
+        - preview (opcional): si es true solo devuelve cuántos leads se verían afectados.
+        - todos (opcional): necesario para operar sin ningún filtro.
+        """
+        operacion = request.data.get('operacion')
+        valor = request.data.get('valor')
+        preview = request.data.get('preview') in (True, 'true', '1', 1)
+
+        queryset, error = self._bulk_queryset(request)
+        if error:
+            return Response({'error': error}, status=400)
+
+        if operacion in ('reasignar_asesor', 'reasignar_captador'):
+            try:
+                valor = int(valor) if valor not in (None, '') else None
+            except (TypeError, ValueError):
+                return Response({'error': f'Valor inválido para la operación {operacion}: debe ser un id numérico.'}, status=400)
+
+        if operacion == 'reasignar_asesor':
+            destino = User.objects.filter(id=valor).first() if valor else None
+            run = lambda ids, qs: bulk.reassign_leads(ids, request.user, nuevo_asesor=destino, queryset=qs)
+        elif operacion == 'reasignar_captador':
+            destino = OPCPersonnel.objects.filter(id=valor).first() if valor else None
+            run = lambda ids, qs: bulk.reassign_leads(ids, request.user, nuevo_captador=destino, queryset=qs)
+        elif operacion == 'tipificar':
+            validas = {choice for choice, _ in Lead.TIPIFICACION_CHOICES} - set(self.BULK_TIPIFICACIONES_EXCLUIDAS)
+            destino = valor if valor in validas else None
+            run = lambda ids, qs: bulk.set_tipificacion(ids, request.user, destino, queryset=qs)
+        elif operacion == 'marcar_directeo':
+            destino = valor in (True, 'true', '1', 1)
+            run = lambda ids, qs: bulk.set_directeo(ids, request.user, destino, queryset=qs)
+        else:
+            return Response({'error': 'Operación no soportada. Usa reasignar_asesor, reasignar_captador, tipificar o marcar_directeo.'}, status=400)
+        if destino is None:
+            return Response({'error': f'Valor inválido para la operación {operacion}.'}, status=400)
+
+        if preview:
+            return Response({'operacion': operacion, 'total': queryset.count()})
+
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        # Si un bloque falla, los anteriores ya están confirmados: el error lleva el 'progreso'
+        try:
+            progreso = run(ids, queryset)
+        except DatabaseError as e:
+            progreso = getattr(e, 'progreso', [])
+            modificados = sum(p['modificados'] for p in progreso)
+            return Response({
+                'error': f'Error en la operación masiva tras {modificados} leads modificados: {e}',
+                'total': len(ids),
+                'modificados': modificados,
+                'progreso': progreso,
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        modificados = sum(p['modificados'] for p in progreso)
+        return Response({
+            'message': f'Operación {operacion} aplicada a {modificados} de {len(ids)} leads.',
+            'total': len(ids),
+            'modificados': modificados,
+            'progreso': progreso,
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete', permission_classes=[IsAdminUser])
+    def bulk_delete(self, request):
+        """
+        Elimina en cascada (citas, acciones, duplicados) los leads de 'lead_ids' o, si no se envían,
+        los que cumplen los filtros del listado. Con preview=true solo devuelve el total.
+        Solo para supervisores y administradores (is_staff).
+        """
+        preview = request.data.get('preview') in (True, 'true', '1', 1)
+        lead_ids = request.data.get('lead_ids')
+        if lead_ids:
+            try:
+                queryset = Lead.objects.filter(id__in=[int(i) for i in lead_ids])
+            except (TypeError, ValueError):
+                return Response({'error': 'Los IDs de leads deben ser números enteros.'}, status=400)
+        else:
+            queryset, error = self._bulk_queryset(request)
+            if error:
+                return Response({'error': error}, status=400)
+
+        if preview:
+            return Response({'total': queryset.count()})
+
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        # Si un bloque falla, los anteriores ya están eliminados: el error lleva el 'progreso'
+        try:
+            progreso = bulk.delete_leads(ids, request.user, queryset=queryset)
+        except DatabaseError as e:
+            progreso = getattr(e, 'progreso', [])
+            eliminados = sum(p['modificados'] for p in progreso)
+            return Response({
+                'error': f'Error en la eliminación masiva tras {eliminados} leads eliminados: {e}',
+                'eliminados': eliminados,
+                'progreso': progreso,
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        eliminados = sum(p['modificados'] for p in progreso)
+        return Response({
+            'message': f'{eliminados} leads y sus citas, acciones y duplicados asociados han sido eliminados.',
+            'eliminados': eliminados,
+            'progreso': progreso,
+        })
 
     def destroy(self, request, *args, **kwargs):
         lead = self.get_object()
@@ -297,8 +617,9 @@ class LeadViewSet(viewsets.ModelViewSet):
         return Response({'detail': f'Lead {lead_id} y todas sus citas, acciones y duplicados asociados han sido eliminados en cascada.'}, status=status.HTTP_200_OK)
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = User.objects.all().order_by('username')
+class UserViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = User.objects.all().select_related('opc_profile').order_by('username')
+    conditional_models = (User, OPCPersonnel)
     serializer_class = serializers.UserSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -315,10 +636,20 @@ class AppointmentFilter(FilterSet):
             'estado': ['exact'],
         }
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Appointment.objects.all().select_related(
         'lead', 'asesor_comercial', 'asesor_presencial', 'opc_personal_atendio'
     ).order_by('-fecha_hora')
+    conditional_models = (Appointment, Lead, User, OPCPersonnel)
+
+    # Relaciones que lee la representación completa (LeadSerializer anidado, OPCPersonnel y opc_profile)
+    FULL_SELECT_RELATED = [
+        'lead__asesor__opc_profile',
+        'lead__personal_opc_captador__supervisor', 'lead__personal_opc_captador__user',
+        'lead__supervisor_opc_captador__supervisor', 'lead__supervisor_opc_captador__user',
+        'asesor_comercial__opc_profile', 'asesor_presencial__opc_profile',
+        'opc_personal_atendio__supervisor', 'opc_personal_atendio__user',
+    ]
 
     serializer_class = serializers.AppointmentSerializer
     permission_classes = [IsAuthenticated]
@@ -329,8 +660,22 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     ordering_fields = ['fecha_hora', 'estado', 'lead__nombre', 'lead__celular']
     pagination_class = StandardResultsSetPagination
 
+    def is_compact_list(self):
+        # ?compact=true en el listado devuelve AppointmentListSerializer
+        return (
+            getattr(self, 'action', None) == 'list'
+            and self.request.query_params.get('compact', '').lower() in ('1', 'true')
+        )
+
+    def get_serializer_class(self):
+        if self.is_compact_list():
+            return serializers.AppointmentListSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         queryset = super().get_queryset()
+        if not self.is_compact_list():
+            queryset = queryset.select_related(*self.FULL_SELECT_RELATED)
 
         fecha_hora_gte_str = self.request.query_params.get('fecha_hora_gte')
         fecha_hora_lte_str = self.request.query_params.get('fecha_hora_lte')
@@ -355,7 +700,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         if not serializer.validated_data.get('asesor_comercial'):
-            serializer.validated_data['asesor_comercial'] = self.request.user
+            serializer.validated_data['asesor_comercial'] = authentication.get_full_user(self.request.user)
 
         appointment = serializer.save()
 
@@ -405,17 +750,8 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def actions(self, request, pk=None):
         appointment = self.get_object()
-        appointment_actions = appointment.actions.all()
-        lead_actions = appointment.lead.actions.all()
-
-        all_related_actions = sorted(
-            list(appointment_actions) + list(lead_actions),
-            key=lambda action: action.fecha_accion,
-            reverse=True
-        )
-
-        serializer = serializers.ActionSerializer(all_related_actions, many=True)
-        return Response(serializer.data)
+        # Una sola consulta: las acciones de la cita que también son del lead salen una vez
+        return paginated_actions(request, self, Q(appointment=appointment) | Q(lead_id=appointment.lead_id))
 
 
 class ActionFilter(FilterSet):
@@ -430,13 +766,13 @@ class ActionFilter(FilterSet):
         }
 
 class ActionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Action.objects.all().select_related('lead', 'appointment', 'user').order_by('-fecha_accion')
+    queryset = Action.objects.all().select_related('lead', 'appointment', 'user__opc_profile').order_by('-fecha_accion')
     serializer_class = serializers.ActionSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = ActionFilter
     ordering_fields = ['fecha_accion', 'tipo_accion']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = ApproximateCountPagination
 
 
 # NUEVO: Filtro para el Personal OPC
@@ -449,8 +785,9 @@ class OPCPersonnelFilter(FilterSet):
             # No hay campos de fecha en el modelo OPCPersonnel para filtrar
         }
 
-class OPCPersonnelViewSet(viewsets.ModelViewSet):
+class OPCPersonnelViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = OPCPersonnel.objects.all().select_related('user', 'supervisor').order_by('nombre')
+    conditional_models = (OPCPersonnel, User)
     serializer_class = serializers.OPCPersonnelSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -462,96 +799,18 @@ class OPCPersonnelViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica.read_from_replica
+@conditional_view('opc-leads-metrics', Lead, OPCPersonnel)
 def opc_leads_metrics(request):
-    """Obtiene métricas específicas para leads OPC"""
-    from django.db.models import Count, Q
-    from datetime import datetime, timedelta
-    
-    # Parámetros de filtro
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
-    personal_opc_id = request.GET.get('personal_opc_id')
-    supervisor_opc_id = request.GET.get('supervisor_opc_id')
-    
-    # Query base para leads OPC
-    queryset = Lead.objects.filter(es_lead_opc=True)
-    
-    # Aplicar filtros de fecha
-    if fecha_desde:
-        queryset = queryset.filter(fecha_captacion__gte=fecha_desde)
-    if fecha_hasta:
-        queryset = queryset.filter(fecha_captacion__lte=fecha_hasta)
-    
-    # Aplicar filtros de personal OPC
-    if personal_opc_id:
-        queryset = queryset.filter(personal_opc_captador_id=personal_opc_id)
-    if supervisor_opc_id:
-        queryset = queryset.filter(supervisor_opc_captador_id=supervisor_opc_id)
-    
-    # Métricas básicas
-    total_leads_opc = queryset.count()
-    leads_asignados = queryset.filter(asesor__isnull=False).count()
-    leads_sin_asignar = queryset.filter(asesor__isnull=True).count()
-    
-    # Tipificaciones por asesor
-    tipificaciones_por_asesor = queryset.filter(
-        asesor__isnull=False
-    ).values(
-        'asesor__username', 'asesor__first_name', 'asesor__last_name'
-    ).annotate(
-        total_leads=Count('id'),
-        citas_confirmadas=Count('id', filter=Q(tipificacion__in=[
-            'CITA - SALA', 'CITA - PROYECTO', 'CITA - HxH', 'CITA - ZOOM', 
-            'CITA - POR CONFIRMAR', 'CITA - CONFIRMADA', 'YA ASISTIO'
-        ])),
-        seguimiento=Count('id', filter=Q(tipificacion='SEGUIMIENTO')),
-        no_interesado=Count('id', filter=Q(tipificacion__icontains='NO INTERESADO')),
-        no_contesta=Count('id', filter=Q(tipificacion='NO CONTESTA')),
-    ).order_by('-total_leads')
-    
-    # Rendimiento por personal OPC
-    rendimiento_personal_opc = queryset.values(
-        'personal_opc_captador__nombre', 'personal_opc_captador__rol'
-    ).annotate(
-        total_captados=Count('id'),
-        asignados=Count('id', filter=Q(asesor__isnull=False)),
-        con_citas=Count('id', filter=Q(tipificacion__in=[
-            'CITA - SALA', 'CITA - PROYECTO', 'CITA - HxH', 'CITA - ZOOM', 
-            'CITA - POR CONFIRMAR', 'CITA - CONFIRMADA', 'YA ASISTIO'
-        ])),
-    ).order_by('-total_captados')
-    
-    # Distribución por proyecto de interés
-    distribucion_proyectos = queryset.values('proyecto_interes').annotate(
-        total=Count('id')
-    ).order_by('-total')
-    
-    # Distribución por medio de captación
-    distribucion_medios = queryset.values('medio').annotate(
-        total=Count('id')
-    ).order_by('-total')
-    
-    # Leads de los últimos 30 días
-    fecha_30_dias_atras = datetime.now().date() - timedelta(days=30)
-    leads_ultimos_30_dias = queryset.filter(
-        fecha_captacion__gte=fecha_30_dias_atras
-    ).count()
-    
-    return Response({
-        'total_leads_opc': total_leads_opc,
-        'leads_asignados': leads_asignados,
-        'leads_sin_asignar': leads_sin_asignar,
-        'porcentaje_asignacion': (leads_asignados / total_leads_opc * 100) if total_leads_opc > 0 else 0,
-        'leads_ultimos_30_dias': leads_ultimos_30_dias,
-        'tipificaciones_por_asesor': list(tipificaciones_por_asesor),
-        'rendimiento_personal_opc': list(rendimiento_personal_opc),
-        'distribucion_proyectos': list(distribucion_proyectos),
-        'distribucion_medios': list(distribucion_medios),
-    })
+    """Obtiene métricas específicas para leads OPC (ver leads/metrics.py)"""
+    parts, compose = metrics.opc_leads_report(request.GET)
+    return Response(compose(metrics.run_parts(parts)))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica.read_from_replica
+@conditional_view('dashboard-metrics', Lead, Appointment, User, OPCPersonnel)
 def dashboard_metrics(request):
     """
     Endpoint para obtener métricas y datos para el panel de control.
@@ -561,131 +820,354 @@ def dashboard_metrics(request):
     - fecha_hasta (opcional): Fecha de fin para el filtro (YYYY-MM-DD).
     - context (opcional): Si es 'gestion', excluir directeos.
     """
-    asesor_id = request.query_params.get('asesor_id')
-    fecha_desde_str = request.query_params.get('fecha_desde')
-    fecha_hasta_str = request.query_params.get('fecha_hasta')
-    context = request.query_params.get('context')
+    try:
+        parts, compose = metrics.dashboard_report(request.query_params)
+    except metrics.MetricsError as e:
+        return Response({"error": e.message}, status=e.status)
+    return Response(compose(metrics.run_parts(parts)))
 
-    leads_queryset = Lead.objects.all()
-    appointments_queryset = Appointment.objects.all()
 
-    if context == 'gestion':
-        leads_queryset = leads_queryset.filter(es_directeo=False)
+# Versiones asíncronas (mismo contrato): las consultas de cada informe se ejecutan a la vez.
+# Son vistas de Django (DRF no admite vistas async), autenticadas con el JWT de la cabecera.
 
-    if fecha_desde_str:
-        try:
-            fecha_desde = datetime.datetime.strptime(fecha_desde_str, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
-            leads_queryset = leads_queryset.filter(fecha_creacion__gte=fecha_desde)
-            appointments_queryset = appointments_queryset.filter(fecha_creacion__gte=fecha_desde)
-        except ValueError:
-            return Response({"error": "Formato de fecha_desde inválido. Use'%Y-%m-%d'."}, status=status.HTTP_400_BAD_REQUEST)
+@authentication.async_jwt_required
+@replica.read_from_replica
+@conditional_view('opc-leads-metrics', Lead, OPCPersonnel)
+async def opc_leads_metrics_async(request):
+    """Igual que opc_leads_metrics, con las agregaciones en paralelo."""
+    parts, compose = metrics.opc_leads_report(request.GET)
+    return JsonResponse(compose(await metrics.arun_parts(parts)))
 
-    if fecha_hasta_str:
-        try:
-            fecha_hasta = datetime.datetime.strptime(fecha_hasta_str, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
-            fecha_hasta = fecha_hasta + datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
-            leads_queryset = leads_queryset.filter(fecha_creacion__lte=fecha_hasta)
-            appointments_queryset = appointments_queryset.filter(fecha_creacion__lte=fecha_hasta)
-        except ValueError:
-            return Response({"error": "Formato de fecha_hasta inválido. Use'%Y-%m-%d'."}, status=status.HTTP_400_BAD_REQUEST)
-
-    if asesor_id:
+
+@authentication.async_jwt_required
+@replica.read_from_replica
+@conditional_view('dashboard-metrics', Lead, Appointment, User, OPCPersonnel)
+async def dashboard_metrics_async(request):
+    """Igual que dashboard_metrics, con las agregaciones en paralelo."""
+    try:
+        parts, compose = await sync_to_async(metrics.dashboard_report)(request.GET)
+    except metrics.MetricsError as e:
+        return JsonResponse({"error": e.message}, status=e.status)
+    return JsonResponse(compose(await metrics.arun_parts(parts)))
+
+# --- Typeahead para selectores (/api/lookup/<entity>/) ---
+LOOKUP_DEFAULT_LIMIT = 20
+LOOKUP_MAX_LIMIT = 50
+
+
+def _lookup_reference_set(entity):
+    key = lookup_cache_key(entity)
+    items = cache.get(key)
+    monitoring.cache_lookup('lookup', items is not None)
+    if items is None:
+        with replica.read_from_primary():
+            items = LOOKUP_CACHED_ENTITIES[entity]()
+        cache.set(key, items, getattr(settings, 'LOOKUP_CACHE_TTL', 300))
+    return items
+
+
+def _lookup_leads(q, ids, limit):
+    queryset = Lead.objects.order_by('nombre')
+    if ids:
+        queryset = queryset.filter(id__in=ids)
+    elif q:
+        # Prefijo en nombre (índice lead_nombre_upper_like_idx) o en celular (índice único *_like)
+        queryset = queryset.filter(Q(nombre__istartswith=q) | Q(celular__startswith=q))
+    return [
+        {'id': lead_id, 'label': f'{nombre} - {celular}'}
+        for lead_id, nombre, celular in queryset.values_list('id', 'nombre', 'celular')[:limit]
+    ]
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica.read_from_replica
+def lookup(request, entity):
+    """
+    Búsqueda ligera para selectores: devuelve solo id y etiqueta.
+    Parámetros:
+    - q (opcional): texto a buscar (prefijo de nombre/celular en leads; contiene en usuarios y OPC).
+    - ids (opcional): lista de IDs separados por coma para resolver etiquetas de valores ya elegidos.
+    - rol (opcional): filtra usuarios o personal OPC por rol.
+    - limit (opcional): máximo de resultados (por defecto 20, máximo 50).
+    """
+    if entity not in LOOKUP_CACHED_ENTITIES and entity != 'leads':
+        return Response({'error': f'Entidad de búsqueda no soportada: {entity}.'}, status=status.HTTP_404_NOT_FOUND)
+
+    q = request.query_params.get('q', '').strip()
+    rol = request.query_params.get('rol')
+    try:
+        limit = min(int(request.query_params.get('limit', LOOKUP_DEFAULT_LIMIT)), LOOKUP_MAX_LIMIT)
+        ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return Response({'error': 'Parámetros limit o ids inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        limit = LOOKUP_DEFAULT_LIMIT
+
+    if entity == 'leads':
+        if not q and not ids:
+            return Response({'results': []})
+        return Response({'results': _lookup_leads(q, ids, limit)})
+
+    items = _lookup_reference_set(entity)
+    if ids:
+        items = [item for item in items if item['id'] in ids]
+    if rol:
+        items = [item for item in items if item['rol'] == rol]
+    if q:
+        needle = q.lower()
+        items = [
+            item for item in items
+            if needle in item['label'].lower() or needle in item.get('username', '').lower()
+        ]
+    return Response({'results': items[:limit]})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def work_queue_next(request):
+    """
+    Reserva y devuelve el siguiente lead a llamar de la cartera del usuario (ver leads/work_queue.py).
+    Libera la reserva anterior del usuario. Si la cola está vacía devuelve 'lead': null.
+    """
+    claimed = work_queue.claim_next(request.user)
+    if claimed is None:
+        return Response({'lead': None, 'message': 'No hay leads pendientes en tu cola.'})
+    lead_id, prioridad, reservado_hasta = claimed
+    related = [path for paths in LeadViewSet.NESTED_SELECT_RELATED.values() for path in paths]
+    lead = Lead.objects.select_related(*related).get(id=lead_id)
+    return Response({
+        'lead': serializers.LeadSerializer(lead, context={'request': request}).data,
+        'prioridad': prioridad,
+        'reservado_hasta': reservado_hasta,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def work_queue_release(request):
+    """Devuelve a la cola el lead reservado por el usuario sin tipificarlo."""
+    liberados = work_queue.release(request.user)
+    return Response({'liberados': liberados})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def token_revoke(request):
+    """
+    Cierre de sesión: revoca el access token de la petición y, si se envía en 'refresh',
+    también el refresh token del mismo usuario.
+    """
+    refresh = request.data.get('refresh')
+    if refresh:
         try:
-            asesor = User.objects.get(id=asesor_id)
-            leads_queryset = leads_queryset.filter(asesor=asesor)
-            appointments_queryset = appointments_queryset.filter(
-                Q(asesor_comercial=asesor) | Q(asesor_presencial=asesor) | Q(opc_personal_atendio=asesor.opc_profile)
-            )
-        except User.DoesNotExist:
-            return Response({"error": "Asesor no encontrado."}, status=status.HTTP_404_NOT_FOUND)
-        except ValueError:
-            return Response({"error": "ID de asesor inválido."}, status=status.HTTP_400_BAD_REQUEST)
-        except OPCPersonnel.DoesNotExist:
-            pass
-
-
-    # --- Métricas Clave ---
-    total_leads_asignados = leads_queryset.count()
-    leads_gestionados = leads_queryset.exclude(tipificacion__isnull=True).exclude(tipificacion__exact='').count()
-    citas_confirmadas = appointments_queryset.filter(has_ever_been_confirmed=True).count()
-    presencias = appointments_queryset.filter(estado='Realizada').count()
-
-    # Tasa de conversión a citas: citas confirmadas / leads gestionados
-    tasa_conversion_citas = (citas_confirmadas / leads_gestionados * 100) if leads_gestionados > 0 else 0
-    # Tasa de conversión a presencias (como estaba antes)
-    tasa_conversion_global = (presencias / citas_confirmadas * 100) if citas_confirmadas > 0 else 0
-
-    # --- Rendimiento por Asesor (Tabla) ---
-    asesores_data = []
-    users_with_activity = User.objects.filter(
-        Q(assigned_leads__in=leads_queryset) |
-        Q(scheduled_appointments__in=appointments_queryset) |
-        Q(attended_appointments__in=appointments_queryset) |
-        Q(opc_profile__citas_atendidas_opc__in=appointments_queryset)
-    ).distinct().order_by('username')
-
-    for user_obj in users_with_activity:
-        asesor_leads_count = leads_queryset.filter(asesor=user_obj).count()
-        asesor_citas_confirmadas = appointments_queryset.filter(
-            Q(asesor_comercial=user_obj) | Q(asesor_presencial=user_obj),
-            has_ever_been_confirmed=True
-        ).count()
-
-        asesor_presencias = 0
-        asesor_presencias += appointments_queryset.filter(
-            Q(asesor_comercial=user_obj) | Q(asesor_presencial=user_obj),
-            estado='Realizada'
-        ).count()
-        
-        if hasattr(user_obj, 'opc_profile'):
-            opc_attended_presences = appointments_queryset.filter(
-                opc_personal_atendio=user_obj.opc_profile,
-                estado='Realizada'
-            ).count()
-            asesor_presencias += opc_attended_presences
-
-        asesor_tasa_conversion = (asesor_presencias / asesor_citas_confirmadas * 100) if asesor_citas_confirmadas > 0 else 0
-
-        asesores_data.append({
-            'id': user_obj.id,
-            'nombre': user_obj.username,
-            'leads_asignados': asesor_leads_count,
-            'citas_confirmadas': asesor_citas_confirmadas,
-            'presencias': asesor_presencias,
-            'tasa_conversion': round(asesor_tasa_conversion, 2),
-        })
+            refresh = RefreshToken(refresh)
+        except TokenError:
+            return Response({'error': 'Refresh token inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        if str(refresh.payload.get('user_id')) != str(request.user.pk):
+            return Response({'error': 'El refresh token no pertenece al usuario.'}, status=status.HTTP_400_BAD_REQUEST)
+        authentication.revoke_token(refresh, 'cierre_sesion')
+    if request.auth is not None:
+        authentication.revoke_token(request.auth, 'cierre_sesion')
+    return Response({'message': 'Sesión cerrada.'})
 
-    # --- Gráfico de Anillos: Top 10 Distritos ---
-    top_distritos = leads_queryset.values('distrito').annotate(count=Count('distrito')).order_by('-count')[:10]
-    distritos_data = [{'name': d['distrito'] if d['distrito'] else 'Sin Distrito', 'value': d['count']} for d in top_distritos]
 
-    # --- Gráfico de Fuente de Leads (Medio de Captación) ---
-    fuente_leads = leads_queryset.values('medio').annotate(count=Count('medio')).order_by('-count')
-    fuente_leads_data = [{'name': m['medio'] if m['medio'] else 'Sin Medio', 'value': m['count']} for m in fuente_leads]
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def changes_feed(request):
+    """
+    Cambios de leads, citas y duplicados posteriores a un cursor, en orden de confirmación.
+    Query params:
+    - since: cursor devuelto en 'next' por la llamada anterior. Sin él se empieza desde el
+      principio; 'latest' devuelve solo el cursor actual (para empezar tras una carga completa).
+    - limit: máximo de cambios por página (por defecto 500, máximo 1000).
+    Cada resultado trae 'operacion' ('crear', 'actualizar', 'eliminar') y 'datos' con el estado
+    actual del objeto (None en las eliminaciones). Se sigue pidiendo mientras 'has_more' sea true.
+    """
+    since = request.query_params.get('since', '0.0')
+    try:
+        limit = min(int(request.query_params.get('limit', changes.CHANGES_DEFAULT_LIMIT)), changes.CHANGES_MAX_LIMIT)
+        cursor = None if since == 'latest' else changes.decode_cursor(since)
+    except ValueError:
+        return Response({'error': 'Parámetros since o limit inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        limit = changes.CHANGES_DEFAULT_LIMIT
+
+    if cursor is None:
+        return Response({'results': [], 'next': changes.head_cursor(), 'has_more': False})
+    page, next_cursor, has_more = changes.changes_since(cursor, limit)
+    return Response({
+        'results': changes.serialize_changes(page, request),
+        'next': next_cursor,
+        'has_more': has_more,
+    })
 
-    # --- Gráfico de Embudo de Ventas ---
-    embudo_data = [
-        {'name': 'Leads Asignados', 'value': total_leads_asignados},
-        {'name': 'Citas Confirmadas', 'value': citas_confirmadas},
-        {'name': 'Presencias', 'value': presencias},
-    ]
 
-    response_data = {
-        'metricas_generales': {
-            'total_leads_asignados': total_leads_asignados,
-            'leads_gestionados': leads_gestionados,
-            'citas_confirmadas_global': citas_confirmadas,
-            'presencias_global': presencias,
-            'tasa_conversion_citas': round(tasa_conversion_citas, 2),
-            'tasa_conversion_global': round(tasa_conversion_global, 2),
-        },
-        'rendimiento_asesores': asesores_data,
-        'distribucion_distritos': distritos_data,
-        'fuente_leads': fuente_leads_data,
-        'embudo_ventas': embudo_data,
-    }
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def perf_stats(request):
+    """
+    Estadísticas de rendimiento por ruta del proceso que atiende la petición (ver leads/perf.py):
+    peticiones, latencias, tiempo en base de datos y serializando, consultas e histogramas.
+    DELETE las reinicia. Con varios procesos cada uno tiene las suyas.
+    """
+    if request.method == 'DELETE':
+        perf.registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response({
+        'pid': os.getpid(),
+        'umbral_lento_ms': perf.get_slow_request_ms(),
+        'rutas': perf.registry.snapshot(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profiles_list(request):
+    """Perfiles capturados por ProfilingMiddleware (ver leads/profiling.py), del más reciente al más antiguo."""
+    return Response({
+        'muestreo': getattr(settings, 'PROFILING_SAMPLE_RATE', 0),
+        'perfiles': profiling.list_profiles(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_detail(request, profile_id):
+    """
+    Un perfil: con ?formato=prof descarga el archivo pstats (python -m pstats, snakeviz); si no,
+    devuelve el JSON con las funciones más costosas y la cronología de SQL.
+    """
+    formato = request.query_params.get('formato', 'json')
+    if formato not in ('json', 'prof'):
+        return Response({'error': 'formato debe ser json o prof.'}, status=status.HTTP_400_BAD_REQUEST)
+    path = profiling.profile_path(profile_id, formato)
+    if path is None:
+        return Response({'error': 'Perfil no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+    if formato == 'prof':
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{profile_id}.prof')
+    with open(path) as f:
+        return Response(json.load(f))
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def slow_queries_list(request):
+    """
+    Consultas lentas (ver leads/slow_queries.py) de los últimos ?dias= (7 por defecto), por huella
+    y ordenadas por tiempo total: llamadas, media, máximo, SQL normalizada y origen. DELETE
+    vacía el registro.
+    """
+    if request.method == 'DELETE':
+        SlowQuery.objects.all().delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    try:
+        dias = int(request.query_params.get('dias', 7))
+        limite = int(request.query_params.get('limite', 50))
+    except ValueError:
+        return Response({'error': 'Parámetros dias o limite inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+    if dias < 1 or limite < 1:
+        return Response({'error': 'dias y limite deben ser positivos.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'umbral_ms': slow_queries.get_threshold_ms(),
+        'dias': dias,
+        'consultas': slow_queries.top(dias, limite),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def slow_query_detail(request, huella):
+    """Una huella de consulta lenta: SQL, origen, último plan (EXPLAIN ANALYZE) e historial por día."""
+    data = slow_queries.detail(huella)
+    if data is None:
+        return Response({'error': 'Consulta no encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(data)
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Métricas en formato de texto de Prometheus (ver leads/monitoring.py). Si se define
+    PROMETHEUS_METRICS_TOKEN, el scraper debe enviarlo en 'Authorization: Bearer <token>'.
+    """
+    token = getattr(settings, 'PROMETHEUS_METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'Token de métricas inválido o ausente.'}, status=401)
+    if monitoring.prometheus_client is None:
+        return JsonResponse({'error': 'Las métricas requieren prometheus_client.'}, status=501)
+    content, content_type = monitoring.render_metrics()
+    return HttpResponse(content, content_type=content_type)
+
+
+def _events_user(request):
+    """
+    (usuario, rol) del token JWT de la conexión SSE. EventSource no puede enviar cabeceras, así
+    que el token llega en ?token=; también se acepta la cabecera Authorization. (None, None) si
+    no es válido. El rol se resuelve aquí: sin el claim (tokens antiguos) requiere la base de datos.
+    """
+    try:
+        user = authentication.authenticate_request(request, raw_token=request.GET.get('token'))
+        return (user, user.rol) if user else (None, None)
+    finally:
+        # La respuesta dura lo que la conexión SSE: la conexión a la base de datos usada para
+        # autenticar (del pool) no debe quedar retenida hasta request_finished
+        for conn in connections.all(initialized_only=True):
+            if not conn.in_atomic_block:
+                conn.close()
+
+
+async def events_stream(request):
+    """
+    Eventos en vivo de leads y citas (Server-Sent Events); requiere servir la app por ASGI.
+    Query params:
+    - token: JWT de acceso.
+    - scope: 'opc' para recibir solo leads OPC y sus citas (siempre así para el rol OPC).
+    - asesor: 'me' o id de usuario, para recibir solo lo de ese asesor. Sin is_staff siempre es
+      el propio usuario (403 si se pide otro).
+    Cada evento 'cambio' trae {entidad, id (o ids), operacion, campos}; 'campos' es null si no
+    se conocen. Un evento 'resync' indica que se perdieron eventos y hay que recargar.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido.'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        # Con WSGI cada conexión abierta ocuparía un hilo del servidor
+        return JsonResponse({'error': 'Los eventos en vivo requieren servir la aplicación por ASGI.'}, status=501)
+
+    user, rol = await sync_to_async(_events_user)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'error': 'Token inválido o ausente.'}, status=401)
+
+    asesor = request.GET.get('asesor')
+    try:
+        asesor_id = user.pk if asesor == 'me' else (int(asesor) if asesor else None)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetro asesor inválido.'}, status=400)
+    if not user.is_staff:
+        # Solo supervisores y administradores ven los cambios de otros asesores
+        if asesor_id not in (None, user.pk):
+            return JsonResponse({'error': 'Solo puedes suscribirte a tus propios leads y citas.'}, status=403)
+        asesor_id = user.pk
+    solo_opc = request.GET.get('scope') == 'opc' or (rol == 'OPC' and not user.is_staff)
+
+    async def stream():
+        subscription = events.broadcaster.subscribe(solo_opc=solo_opc, asesor_id=asesor_id)
+        try:
+            yield f'retry: {events.SSE_RETRY_MS}\n\n'
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), events.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+        finally:
+            events.broadcaster.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Nginx: no acumular la respuesta en el buffer del proxy
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-    return Response(response_data)
 
 class LeadDuplicateViewSet(viewsets.ModelViewSet):
     queryset = LeadDuplicate.objects.all().select_related('original_lead', 'asesor', 'captador')
@@ -0,0 +1,101 @@
+# backend/leads/work_queue.py
+"""
+Cola de llamadas de los operadores.
+
+Cada operador toma el siguiente lead de su cartera (y, si no le quedan, de los leads sin
+asesor) con SELECT ... FOR UPDATE SKIP LOCKED:
+dos operadores que piden a la vez nunca reciben el mismo lead, y ninguno espera al otro.
+El lead queda reservado WORK_QUEUE_LEASE_MINUTES minutos o hasta que se registre una
+tipificación; una reserva vencida vuelve a la cola.
+
+Prioridades, en orden (cada nivel se resuelve con una consulta por índice):
+1. Citas por confirmar con la cita pendiente más próxima.
+2. 'VOLVER A LLAMAR', el contacto más antiguo primero.
+3. Leads sin tipificar, el más antiguo primero.
+4. Reintentos (no contesta, apagado, seguimiento...) cuyo último contacto tiene al menos
+   WORK_QUEUE_RETRY_HOURS horas.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Lead
+
+# Ventana de citas próximas que deben confirmarse por teléfono
+CITA_CONFIRMACION_VENTANA = datetime.timedelta(hours=48)
+
+TIPIFICACIONES_REINTENTO = ['NO CONTESTA', 'APAGADO', 'SEGUIMIENTO', 'FUERA DE SERVICIO', 'INFORMACION WSP/CORREO']
+
+
+def get_lease_duration():
+    return datetime.timedelta(minutes=getattr(settings, 'WORK_QUEUE_LEASE_MINUTES', 15))
+
+
+def get_retry_delay():
+    return datetime.timedelta(hours=getattr(settings, 'WORK_QUEUE_RETRY_HOURS', 4))
+
+
+def available_leads(now):
+    """Leads de gestión que no están reservados por nadie (o cuya reserva venció)."""
+    return Lead.objects.filter(es_directeo=False).filter(Q(reservado_hasta__isnull=True) | Q(reservado_hasta__lte=now))
+
+
+def priority_levels(user, now):
+    """Niveles de prioridad como (nombre, queryset ordenado), del más al menos urgente."""
+    # Por nivel, primero la cartera propia y luego los leads sin asesor: dos consultas
+    # por índice en lugar de un OR que obligaría a recorrer ambas carteras
+    levels = []
+    for prioridad, queryset in _levels(available_leads(now), now):
+        levels.append((prioridad, queryset.filter(asesor_id=user.pk)))
+        levels.append((prioridad, queryset.filter(asesor__isnull=True)))
+    return levels
+
+
+def _levels(leads, now):
+    levels = [
+        ('cita_por_confirmar', leads.filter(
+            tipificacion='CITA - POR CONFIRMAR',
+            appointments__estado='Pendiente',
+            appointments__fecha_hora__range=(now, now + CITA_CONFIRMACION_VENTANA),
+        ).order_by('appointments__fecha_hora')),
+        ('volver_a_llamar', leads.filter(tipificacion='VOLVER A LLAMAR').order_by('ultima_actualizacion')),
+        # '' y NULL por separado: un OR impediría usar el índice (asesor, tipificacion, ultima_actualizacion)
+        ('sin_tipificar', leads.filter(tipificacion='').order_by('ultima_actualizacion')),
+        ('sin_tipificar', leads.filter(tipificacion__isnull=True).order_by('ultima_actualizacion')),
+    ]
+    reintento_antes_de = now - get_retry_delay()
+    for tipificacion in TIPIFICACIONES_REINTENTO:
+        levels.append(('reintento', leads.filter(
+            tipificacion=tipificacion, ultima_actualizacion__lte=reintento_antes_de
+        ).order_by('ultima_actualizacion')))
+    return levels
+
+
+def release(user):
+    """Libera las reservas vigentes del operador. Devuelve cuántas liberó."""
+    return Lead.objects.filter(reservado_por_id=user.pk).update(reservado_por=None, reservado_hasta=None)
+
+
+def claim_next(user):
+    """
+    Reserva para 'user' el lead más prioritario de su cola y devuelve (lead_id, prioridad, reservado_hasta),
+    o None si no queda ninguno. La reserva anterior del operador se libera: solo se tiene un lead a la vez.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        release(user)
+        # Un LIMIT 1 por nivel, en orden, que el índice sirve ya ordenado: juntar los niveles en
+        # una sola consulta con ORDER BY CASE obligaría a leer y ordenar toda la cola bloqueando
+        for prioridad, queryset in priority_levels(user, now):
+            lead_id = queryset.select_for_update(skip_locked=True, of=('self',)).values_list('id', flat=True).first()
+            if lead_id is None:
+                continue
+            reservado_hasta = now + get_lease_duration()
+            # update() no toca ultima_actualizacion: tomar un lead no cuenta como contacto
+            Lead.objects.filter(id=lead_id).update(reservado_por_id=user.pk, reservado_hasta=reservado_hasta)
+            return lead_id, prioridad, reservado_hasta
+    return None
@@ -1,15 +1,14 @@
-import React, { useEffect, useState, useCallback } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Dialog, DialogTitle, DialogContent, DialogActions,
   TextField, Button, MenuItem, FormControl, InputLabel, Select,
   CircularProgress, Alert, Typography, Box,
   Grid,
-  Autocomplete,
 } from '@mui/material';
 import moment from 'moment';
 import appointmentsService from '../../services/appointments';
 import leadsService from '../../services/leads';
-import opcPersonnelService from '../../services/opcPersonnel';
+import LookupAutocomplete from '../common/LookupAutocomplete';
 
 const ESTADO_CITA_CHOICES = [
     { value: 'Pendiente', label: 'Pendiente' },
@@ -32,19 +31,6 @@ function AppointmentFormModal({ open, onClose, appointmentData, leadId, onSaveSu
     const [loadingForm, setLoadingForm] = useState(true);
     const [submitting, setSubmitting] = useState(false);
     const [error, setError] = useState('');
-    const [leads, setLeads] = useState([]);
-    const [operators, setOperators] = useState([]);
-    const [presentialAdvisors, setPresentialAdvisors] = useState([]);
-    const [opcPersonnelList, setOpcPersonnelList] = useState([]);
-    const [asesorLoading, setAsesorLoading] = useState(false);
-    const [asesorOptions, setAsesorOptions] = useState([]);
-    const [asesorInput, setAsesorInput] = useState('');
-    const [leadLoading, setLeadLoading] = useState(false);
-    const [leadOptions, setLeadOptions] = useState([]);
-    const [leadInput, setLeadInput] = useState('');
-    const [opcLoading, setOpcLoading] = useState(false);
-    const [opcOptions, setOpcOptions] = useState([]);
-    const [opcInput, setOpcInput] = useState('');
     const [leadInfo, setLeadInfo] = useState(null);
 
     const [formValues, setFormValues] = useState({
@@ -59,24 +45,6 @@ function AppointmentFormModal({ open, onClose, appointmentData, leadId, onSaveSu
     });
     const [formErrors, setFormErrors] = useState({});
 
-    const fetchSelectionsData = useCallback(async () => {
-        try {
-            const [leadsData, operatorsData, presentialData, opcData] = await Promise.all([
-                leadsService.getLeads({ page_size: 1000, ordering: 'nombre' }),
-                leadsService.getOperators({ page_size: 1000, ordering: 'username' }),
-                leadsService.getPresentialAdvisors({ page_size: 1000, ordering: 'username' }),
-                opcPersonnelService.getPersonnel({ page_size: 1000 }),
-            ]);
-            setLeads(leadsData.results || []);
-            setOperators(operatorsData.results || []);
-            setPresentialAdvisors(presentialData.results || []);
-            setOpcPersonnelList(opcData.results || []);
-        } catch (err) {
-            setError('Error al cargar datos para el formulario de citas.');
-            console.error('Error fetching selections data for appointment form:', err);
-        }
-    }, []);
-
     useEffect(() => {
         if (!open) {
             setFormValues({
@@ -90,8 +58,7 @@ function AppointmentFormModal({ open, onClose, appointmentData, leadId, onSaveSu
             return;
         }
 
-        fetchSelectionsData();
-
+        // Lead, operadores y personal OPC se buscan bajo demanda (LookupAutocomplete); no se precargan
         const initializeFormValues = async () => {
             if (appointmentData) {
                 setFormValues({
@@ -119,82 +86,7 @@ function AppointmentFormModal({ open, onClose, appointmentData, leadId, onSaveSu
             setLoadingForm(false);
         };
         initializeFormValues();
-    }, [open, appointmentData, leadId, opcPersonnelId, fetchSelectionsData]);
-
-    // Búsqueda asíncrona de asesores para el Autocomplete
-    useEffect(() => {
-        let active = true;
-        if (asesorInput === '') {
-            setAsesorOptions([]);
-            return undefined;
-        }
-        setAsesorLoading(true);
-        leadsService.getUsers({ search: asesorInput, page_size: 10, ordering: 'username' })
-            .then(data => {
-                if (active) {
-                    setAsesorOptions(data.results || []);
-                }
-            })
-            .catch(() => {
-                if (active) setAsesorOptions([]);
-            })
-            .finally(() => {
-                if (active) setAsesorLoading(false);
-            });
-        return () => {
-            active = false;
-        };
-    }, [asesorInput]);
-
-    // Búsqueda asíncrona de leads para el Autocomplete
-    useEffect(() => {
-        let active = true;
-        if (leadInput === '') {
-            setLeadOptions([]);
-            return undefined;
-        }
-        setLeadLoading(true);
-        leadsService.getLeads({ search: leadInput, page_size: 10, ordering: 'nombre' })
-            .then(data => {
-                if (active) {
-                    setLeadOptions(data.results || []);
-                }
-            })
-            .catch(() => {
-                if (active) setLeadOptions([]);
-            })
-            .finally(() => {
-                if (active) setLeadLoading(false);
-            });
-        return () => {
-            active = false;
-        };
-    }, [leadInput]);
-
-    // Búsqueda asíncrona de personal OPC para el Autocomplete
-    useEffect(() => {
-        let active = true;
-        if (opcInput === '') {
-            setOpcOptions([]);
-            return undefined;
-        }
-        setOpcLoading(true);
-        opcPersonnelService.getPersonnel({ search: opcInput, page_size: 10 })
-            .then(data => {
-                if (active) {
-                    setOpcOptions(data.results || []);
-                }
-            })
-            .catch(() => {
-                if (active) setOpcOptions([]);
-            })
-            .finally(() => {
-                if (active) setOpcLoading(false);
-            });
-        return () => {
-            active = false;
-        };
-    }, [opcInput]);
+    }, [open, appointmentData, leadId, opcPersonnelId]);
 
     // Obtener info del lead si leadId está presente
     useEffect(() => {
@@ -288,37 +180,18 @@ function AppointmentFormModal({ open, onClose, appointmentData, leadId, onSaveSu
                         {error && <Alert severity="error" sx={{ my: 2 }}>{error}</Alert>}
                         <Grid container spacing={2}>
                             <Grid item xs={12}>
-                                <Autocomplete
-                                    fullWidth
-                                    options={leadOptions}
-                                    getOptionLabel={(option) => option.nombre ? `${option.nombre} (${option.celular || ''})` : ''}
-                                    loading={leadLoading}
-                                    value={leadOptions.find(opt => opt.id === formValues.lead_id) || leadInfo || null}
-                                    onChange={(_, newValue) => {
-                                        setFormValues(prev => ({ ...prev, lead_id: newValue ? newValue.id : '' }));
+                                <LookupAutocomplete
+                                    entity="leads"
+                                    label="Lead"
+                                    margin="normal"
+                                    value={formValues.lead_id}
+                                    onChange={(id) => {
+                                        setFormValues(prev => ({ ...prev, lead_id: id }));
                                         setFormErrors(prev => ({ ...prev, lead_id: '' }));
                                     }}
-                                    onInputChange={(_, newInput) => setLeadInput(newInput)}
                                     disabled={!!appointmentData || !!leadId}
-                                    renderInput={(params) => (
-                                        <TextField
-                                            {...params}
-                                            label="Lead"
-                                            margin="normal"
-                                            error={!!formErrors.lead_id}
-                                            helperText={formErrors.lead_id}
-                                            InputProps={{
-                                                ...params.InputProps,
-                                                endAdornment: (
-                                                    <>
-                                                        {leadLoading ? <CircularProgress color="inherit" size={20} /> : null}
-                                                        {params.InputProps.endAdornment}
-                                                    </>
-                                                ),
-                                            }}
-                                            InputLabelProps={{ shrink: true }}
-                                        />
-                                    )}
+                                    error={!!formErrors.lead_id}
+                                    helperText={formErrors.lead_id}
                                 />
                             </Grid>
                             <Grid item xs={12} sm={6}>
@@ -355,101 +228,46 @@ function AppointmentFormModal({ open, onClose, appointmentData, leadId, onSaveSu
                                 </FormControl>
                             </Grid>
                             <Grid item xs={12} sm={6}>
-                                <Autocomplete
-                                    fullWidth
-                                    options={operators}
-                                    getOptionLabel={(option) => option.username || ''}
-                                    loading={asesorLoading}
-                                    value={operators.find(opt => opt.id === formValues.asesor_comercial_id) || null}
-                                    onChange={(_, newValue) => {
-                                        setFormValues(prev => ({ ...prev, asesor_comercial_id: newValue ? newValue.id : '' }));
+                                <LookupAutocomplete
+                                    entity="users"
+                                    rol="OPERADOR"
+                                    label="Operador"
+                                    margin="normal"
+                                    value={formValues.asesor_comercial_id}
+                                    onChange={(id) => {
+                                        setFormValues(prev => ({ ...prev, asesor_comercial_id: id }));
                                         setFormErrors(prev => ({ ...prev, asesor_comercial_id: '' }));
                                     }}
-                                    onInputChange={(_, newInput) => setAsesorInput(newInput)}
-                                    renderInput={(params) => (
-                                        <TextField
-                                            {...params}
-                                            label="Operador"
-                                            margin="normal"
-                                            helperText="Selecciona el operador responsable de la gestión."
-                                            InputProps={{
-                                                ...params.InputProps,
-                                                endAdornment: (
-                                                    <>
-                                                        {asesorLoading ? <CircularProgress color="inherit" size={20} /> : null}
-                                                        {params.InputProps.endAdornment}
-                                                    </>
-                                                ),
-                                            }}
-                                            InputLabelProps={{ shrink: true }}
-                                        />
-                                    )}
+                                    helperText="Selecciona el operador responsable de la gestión."
                                 />
                             </Grid>
                             <Grid item xs={12} sm={6}>
-                                <Autocomplete
-                                    fullWidth
-                                    options={presentialAdvisors}
-                                    getOptionLabel={(option) => option.username || ''}
-                                    loading={asesorLoading}
-                                    value={presentialAdvisors.find(opt => opt.id === formValues.asesor_presencial_id) || null}
-                                    onChange={(_, newValue) => {
-                                        setFormValues(prev => ({ ...prev, asesor_presencial_id: newValue ? newValue.id : '' }));
+                                <LookupAutocomplete
+                                    entity="users"
+                                    rol="ASESOR_PRESENCIAL"
+                                    label="Asesor Presencial"
+                                    margin="normal"
+                                    value={formValues.asesor_presencial_id}
+                                    onChange={(id) => {
+                                        setFormValues(prev => ({ ...prev, asesor_presencial_id: id }));
                                         setFormErrors(prev => ({ ...prev, asesor_presencial_id: '' }));
                                     }}
-                                    onInputChange={(_, newInput) => setAsesorInput(newInput)}
-                                    renderInput={(params) => (
-                                        <TextField
-                                            {...params}
-                                            label="Asesor Presencial"
-                                            margin="normal"
-                                            helperText="Selecciona el asesor presencial que atenderá la cita."
-                                            InputProps={{
-                                                ...params.InputProps,
-                                                endAdornment: (
-                                                    <>
-                                                        {asesorLoading ? <CircularProgress color="inherit" size={20} /> : null}
-                                                        {params.InputProps.endAdornment}
-                                                    </>
-                                                ),
-                                            }}
-                                            InputLabelProps={{ shrink: true }}
-                                        />
-                                    )}
+                                    helperText="Selecciona el asesor presencial que atenderá la cita."
                                 />
                             </Grid>
                             <Grid item xs={12}>
-                                <Autocomplete
-                                    fullWidth
-                                    options={opcOptions}
-                                    getOptionLabel={(option) => option.nombre ? `${option.nombre} (${option.rol || ''})` : ''}
-                                    loading={opcLoading}
-                                    value={opcOptions.find(opt => opt.id === formValues.opc_personal_atendio_id) || null}
-                                    onChange={(_, newValue) => {
-                                        setFormValues(prev => ({ ...prev, opc_personal_atendio_id: newValue ? newValue.id : '' }));
+                                <LookupAutocomplete
+                                    entity="opc-personnel"
+                                    label="Personal OPC (Atención Directa)"
+                                    margin="normal"
+                                    value={formValues.opc_personal_atendio_id}
+                                    onChange={(id) => {
+                                        setFormValues(prev => ({ ...prev, opc_personal_atendio_id: id }));
                                         setFormErrors(prev => ({ ...prev, opc_personal_atendio_id: '' }));
                                     }}
-                                    onInputChange={(_, newInput) => setOpcInput(newInput)}
                                     disabled={leadInfo && !leadInfo.es_directeo}
-                                    renderInput={(params) => (
-                                        <TextField
-                                            {...params}
-                                            label="Personal OPC (Atención Directa)"
-                                            margin="normal"
-                                            error={!!formErrors.atencion}
-                                            helperText={formErrors.atencion}
-                                            InputProps={{
-                                                ...params.InputProps,
-                                                endAdornment: (
-                                                    <>
-                                                        {opcLoading ? <CircularProgress color="inherit" size={20} /> : null}
-                                                        {params.InputProps.endAdornment}
-                                                    </>
-                                                ),
-                                            }}
-                                            InputLabelProps={{ shrink: true }}
-                                        />
-                                    )}
+                                    error={!!formErrors.atencion}
+                                    helperText={formErrors.atencion}
                                 />
                             </Grid>
                             <Grid item xs={12}>
@@ -0,0 +1,94 @@
+// frontend/crm_frontend/src/components/common/LookupAutocomplete.jsx
+import React, { useEffect, useState } from 'react';
+import { Autocomplete, CircularProgress, TextField } from '@mui/material';
+import lookupService from '../../services/lookup';
+
+// Espera tras cada tecla antes de buscar
+const SEARCH_DELAY_MS = 250;
+
+// Selector con búsqueda en /api/lookup/<entity>/, sin precargar listas completas.
+// 'value' es el id elegido ('' o null si ninguno) y onChange recibe (id, opción).
+// Los leads solo se buscan con texto; usuarios y personal OPC muestran los primeros al abrir.
+function LookupAutocomplete({ entity, rol, value, onChange, label, helperText, error, disabled, margin, size }) {
+  const [input, setInput] = useState('');
+  const [options, setOptions] = useState([]);
+  const [selected, setSelected] = useState(null);
+  const [loading, setLoading] = useState(false);
+
+  // Etiqueta del valor ya elegido (al editar o con un filtro inicial)
+  useEffect(() => {
+    if (!value) {
+      setSelected(null);
+      return undefined;
+    }
+    if (selected && String(selected.id) === String(value)) return undefined;
+    let active = true;
+    lookupService.search(entity, { ids: value })
+      .then(results => { if (active) setSelected(results[0] || null); })
+      .catch(() => {});
+    return () => { active = false; };
+  }, [entity, value]); // eslint-disable-line react-hooks/exhaustive-deps
+
+  useEffect(() => {
+    if (entity === 'leads' && !input) {
+      setOptions([]);
+      return undefined;
+    }
+    let active = true;
+    const timer = setTimeout(() => {
+      setLoading(true);
+      lookupService.search(entity, { q: input || undefined, rol: rol || undefined })
+        .then(results => { if (active) setOptions(results); })
+        .catch(() => { if (active) setOptions([]); })
+        .finally(() => { if (active) setLoading(false); });
+    }, SEARCH_DELAY_MS);
+    return () => {
+      active = false;
+      clearTimeout(timer);
+    };
+  }, [entity, rol, input]);
+
+  const allOptions = selected && !options.some(opt => opt.id === selected.id) ? [selected, ...options] : options;
+
+  return (
+    <Autocomplete
+      fullWidth
+      size={size}
+      options={allOptions}
+      // El servidor ya filtra por el texto
+      filterOptions={(opts) => opts}
+      getOptionLabel={(option) => option.label || ''}
+      isOptionEqualToValue={(option, current) => option.id === current.id}
+      loading={loading}
+      value={selected}
+      disabled={disabled}
+      onChange={(_, newValue) => {
+        setSelected(newValue);
+        onChange(newValue ? newValue.id : '', newValue);
+      }}
+      // Al elegir, MUI pone la etiqueta en el campo: no es una búsqueda nueva
+      onInputChange={(_, newInput, reason) => setInput(reason === 'reset' ? '' : newInput)}
+      renderInput={(params) => (
+        <TextField
+          {...params}
+          label={label}
+          margin={margin}
+          error={error}
+          helperText={helperText}
+          InputProps={{
+            ...params.InputProps,
+            endAdornment: (
+              <>
+                {loading ? <CircularProgress color="inherit" size={20} /> : null}
+                {params.InputProps.endAdornment}
+              </>
+            ),
+          }}
+          InputLabelProps={{ shrink: true }}
+        />
+      )}
+    />
+  );
+}
+
+export default LookupAutocomplete;
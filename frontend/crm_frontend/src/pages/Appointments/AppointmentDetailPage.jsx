@@ -23,6 +23,8 @@ function AppointmentDetailPage() {
   const navigate = useNavigate();
   const [appointment, setAppointment] = useState(null);
   const [actions, setActions] = useState([]); // Almacena las acciones combinadas de la cita y el lead
+  const [actionsNext, setActionsNext] = useState(null); // URL de la siguiente página de acciones (cursor)
+  const [loadingMoreActions, setLoadingMoreActions] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -41,7 +43,8 @@ function AppointmentDetailPage() {
       // 2. Obtener las acciones combinadas de la cita y su lead asociado
       // Usaremos el endpoint personalizado /appointments/{id}/actions/ que creamos en el backend
       const combinedActions = await appointmentsService.getAppointmentActions(id);
-      setActions(combinedActions);
+      setActions(combinedActions.results);
+      setActionsNext(combinedActions.next);
 
     } catch (err) {
       setError('Error al cargar los detalles de la cita o sus acciones.');
@@ -55,6 +58,19 @@ function AppointmentDetailPage() {
     fetchAppointmentAndActions();
   }, [fetchAppointmentAndActions]);
 
+  const handleLoadMoreActions = async () => {
+    setLoadingMoreActions(true);
+    try {
+      const moreActions = await appointmentsService.getAppointmentActions(id, actionsNext);
+      setActions(prev => [...prev, ...moreActions.results]);
+      setActionsNext(moreActions.next);
+    } catch (err) {
+      setError('Error al cargar más acciones.');
+    } finally {
+      setLoadingMoreActions(false);
+    }
+  };
+
   // Handlers para el modal de edición de la cita
   const handleOpenEditAppointmentModal = () => {
     setEditingAppointmentData(appointment); // Pasa los datos actuales de la cita al modal
@@ -204,6 +220,13 @@ function AppointmentDetailPage() {
             ))}
           </List>
         )}
+        {actionsNext && (
+          <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+            <Button variant="outlined" onClick={handleLoadMoreActions} disabled={loadingMoreActions}>
+              {loadingMoreActions ? <CircularProgress size={20} /> : 'Cargar más acciones'}
+            </Button>
+          </Box>
+        )}
       </Paper>
 
       {/* El modal de formulario de citas se renderiza aquí para la edición */}
@@ -29,7 +29,6 @@ import {
 
 import { useNavigate } from 'react-router-dom';
 import appointmentsService from '../../services/appointments';
-import leadsService from '../../services/leads';
 import AppointmentFormModal from '../../components/appointments/AppointmentFormModal';
 
 const localizer = momentLocalizer(moment);
@@ -49,8 +48,6 @@ function AppointmentsPage() {
   const [error, setError] = useState('');
   const [openModal, setOpenModal] = useState(false);
   const [currentAppointment, setCurrentAppointment] = useState(null);
-  const [leads, setLeads] = useState([]);
-  const [asesores, setAsesores] = useState([]);
 
   const [searchTerm, setSearchTerm] = useState('');
   const [filterFechaHoraDesde, setFilterFechaHoraDesde] = useState('');
@@ -63,20 +60,6 @@ function AppointmentsPage() {
   const [totalAppointments, setTotalAppointments] = useState(0);
 
 
-  const fetchLeadsAndAsesores = useCallback(async () => {
-    try {
-      const [leadsData, asesoresData] = await Promise.all([
-        leadsService.getLeads({ page_size: 1000, ordering: 'nombre' }),
-        leadsService.getUsers({ page_size: 1000, ordering: 'username' }),
-      ]);
-      setLeads(leadsData.results || []);
-      setAsesores(asesoresData.results || []);
-    } catch (err) {
-      console.error('Error fetching leads or asesores for form:', err);
-      setError('Error al cargar datos para el formulario de citas.');
-    }
-  }, []);
-
   const fetchAppointments = useCallback(async () => {
     setLoading(true);
     setError('');
@@ -108,10 +91,10 @@ function AppointmentsPage() {
   }, [searchTerm, page, rowsPerPage, filterFechaHoraDesde, filterFechaHoraHasta]);
 
 
+  // El formulario de citas busca leads y asesores bajo demanda (/api/lookup/)
   useEffect(() => {
-    fetchLeadsAndAsesores();
     fetchAppointments();
-  }, [fetchLeadsAndAsesores, fetchAppointments]);
+  }, [fetchAppointments]);
 
   const handleSelectEvent = (event) => {
     navigate(`/appointments/${event.id}`);
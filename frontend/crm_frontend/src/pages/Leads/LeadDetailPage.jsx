@@ -33,6 +33,8 @@ function LeadDetailPage() {
   const { user } = useAuth();
   const [lead, setLead] = useState(null);
   const [actions, setActions] = useState([]);
+  const [actionsNext, setActionsNext] = useState(null);
+  const [loadingMoreActions, setLoadingMoreActions] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -47,11 +49,11 @@ function LeadDetailPage() {
     setLoading(true);
     setError('');
     try {
-      const leadData = await leadsService.getLeadById(id);
-      setLead(leadData);
-
-      const actionsData = await leadsService.getLeadActions(id);
-      setActions(actionsData);
+      // Lead y primeras acciones en una sola petición; el resto del historial se pide con el cursor
+      const fullData = await leadsService.getLeadFull(id);
+      setLead(fullData.lead);
+      setActions(fullData.actions.results);
+      setActionsNext(fullData.actions.next);
     } catch (err) {
       setError('Error al cargar los detalles del lead o sus acciones.');
       console.error('Error fetching lead details or actions:', err);
@@ -64,6 +66,19 @@ function LeadDetailPage() {
     fetchLeadAndActions();
   }, [fetchLeadAndActions]);
 
+  const handleLoadMoreActions = async () => {
+    setLoadingMoreActions(true);
+    try {
+      const actionsData = await leadsService.getLeadActions(id, actionsNext);
+      setActions(prev => [...prev, ...actionsData.results]);
+      setActionsNext(actionsData.next);
+    } catch (err) {
+      setError('Error al cargar más acciones.');
+    } finally {
+      setLoadingMoreActions(false);
+    }
+  };
+
   const handleOpenEditLeadModal = () => {
     setEditingLeadId(lead.id);
     setOpenLeadFormModal(true);
@@ -253,6 +268,13 @@ function LeadDetailPage() {
             ))}
           </List>
         )}
+        {actionsNext && (
+          <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+            <Button variant="outlined" onClick={handleLoadMoreActions} disabled={loadingMoreActions}>
+              {loadingMoreActions ? <CircularProgress size={20} /> : 'Cargar más acciones'}
+            </Button>
+          </Box>
+        )}
       </Paper>
 
       <LeadFormModal
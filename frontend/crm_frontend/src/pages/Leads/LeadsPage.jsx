@@ -42,6 +42,8 @@ import {
   ClearAll as ClearAllIcon,
   SwapHoriz as ReassignIcon,
   Assessment as AssessmentIcon,
+  FileDownload as FileDownloadIcon,
+  PhoneForwarded as PhoneForwardedIcon,
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
 import leadsService from '../../services/leads';
@@ -140,6 +142,36 @@ function LeadsPage() {
     }
   }, [page, rowsPerPage, searchTerm, filterTipificacion, filterAsesor, filterFechaCreacionDesde, filterFechaCreacionHasta]);
 
+  const handleExport = async (formato) => {
+    try {
+      await leadsService.exportLeads({
+        search: searchTerm || undefined,
+        tipificacion: filterTipificacion || undefined,
+        asesor: filterAsesor || undefined,
+        'fecha_creacion_after': filterFechaCreacionDesde || undefined,
+        'fecha_creacion_before': filterFechaCreacionHasta || undefined,
+        ordering: '-fecha_creacion',
+        context: 'gestion',
+      }, formato);
+    } catch (err) {
+      setError('Error al exportar los leads.');
+    }
+  };
+
+  // Toma de la cola el siguiente lead a llamar (queda reservado para este operador)
+  const handleNextCall = async () => {
+    try {
+      const data = await leadsService.claimNextLead();
+      if (data.lead) {
+        navigate(`/leads/${data.lead.id}`);
+      } else {
+        setError(data.message);
+      }
+    } catch (err) {
+      setError('Error al obtener el siguiente lead de la cola.');
+    }
+  };
+
   const fetchMetrics = useCallback(async () => {
     setMetricsLoading(true);
     try {
@@ -296,7 +328,10 @@ function LeadsPage() {
       setSelectedLeads([]);
       fetchLeads();
     } catch (err) {
-      setReassignError('Error al reasignar leads.');
+      // Si falló a mitad, los bloques anteriores ya quedaron reasignados
+      const data = err.response?.data;
+      setReassignError(data?.error || 'Error al reasignar leads.');
+      if (data?.reasignados) fetchLeads();
     } finally {
       setReassignLoading(false);
     }
@@ -471,6 +506,17 @@ function LeadsPage() {
                 Nuevo Lead
               </Button>
             </Grid>
+            <Grid item xs={12} sx={{ display: 'flex', justifyContent: 'flex-end', gap: 1 }}>
+              <Button variant="contained" color="secondary" startIcon={<PhoneForwardedIcon />} onClick={handleNextCall}>
+                Siguiente llamada
+              </Button>
+              <Button variant="outlined" startIcon={<FileDownloadIcon />} onClick={() => handleExport('csv')}>
+                Exportar CSV
+              </Button>
+              <Button variant="outlined" startIcon={<FileDownloadIcon />} onClick={() => handleExport('xlsx')}>
+                Exportar Excel
+              </Button>
+            </Grid>
           </Grid>
         </Paper>
 
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import {
   Box,
   Typography,
@@ -16,10 +16,6 @@ import {
   IconButton,
   TablePagination,
   Button,
-  FormControl,
-  InputLabel,
-  Select,
-  MenuItem,
   Tooltip,
   Grid,
   Card,
@@ -43,9 +39,15 @@ import {
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
 import leadsService from '../../services/leads';
-import opcPersonnelService from '../../services/opcPersonnel';
 import opcMetricsService from '../../services/opcMetrics';
+import eventsService from '../../services/events';
 import LeadFormModal from '../../components/leads/LeadFormModal';
+import LookupAutocomplete from '../../components/common/LookupAutocomplete';
+
+// Campos de lead que usan las métricas OPC: otros cambios no obligan a recalcularlas
+const METRICS_FIELDS = ['asesor', 'es_lead_opc', 'fecha_captacion', 'personal_opc_captador', 'supervisor_opc_captador', 'tipificacion'];
+// Espera tras un evento en vivo antes de recargar, para agrupar ráfagas de cambios
+const LIVE_RELOAD_DELAY_MS = 1500;
 
 const MEDIO_CAPTACION_CHOICES = [
   { value: '', label: 'Todos los Medios' },
@@ -82,8 +84,6 @@ function OPCLeadsPage() {
   const [filterTipificacion, setFilterTipificacion] = useState('');
   const [filterOPC, setFilterOPC] = useState('');
 
-  const [opcPersonnelList, setOpcPersonnelList] = useState([]);
-  const [opcSupervisorsList, setOpcSupervisorsList] = useState([]);
 
   const [openLeadFormModal, setOpenLeadFormModal] = useState(false);
   const [editingLeadId, setEditingLeadId] = useState(null);
@@ -143,24 +143,51 @@ function OPCLeadsPage() {
     }
   }, [filterPersonalOPC, filterSupervisorOPC, filterFechaCaptacionDesde, filterFechaCaptacionHasta]);
 
-  const fetchOpcPersonnelForFilters = useCallback(async () => {
-    try {
-        const [opcData, supervisorsData] = await Promise.all([
-            opcPersonnelService.getPersonnel({ page_size: 1000 }),
-            opcPersonnelService.getPersonnel({ rol: 'SUPERVISOR', page_size: 1000 }),
-        ]);
-        setOpcPersonnelList(opcData.results || []);
-        setOpcSupervisorsList(supervisorsData.results || []);
-    } catch (err) {
-        console.error('Error fetching OPC personnel for filters:', err);
-    }
-  }, []);
-
   useEffect(() => {
-    fetchOpcPersonnelForFilters();
     fetchLeads();
     fetchMetrics();
-  }, [fetchOpcPersonnelForFilters, fetchLeads, fetchMetrics]);
+  }, [fetchLeads, fetchMetrics]);
+
+  // Eventos en vivo: se recarga solo lo afectado por el cambio (la página si el lead está en
+  // ella o se creó/eliminó uno; las métricas si cambió un campo que cuentan)
+  const liveConnected = useRef(false);
+  const latest = useRef({});
+  latest.current = { leads, fetchLeads, fetchMetrics };
+  const reloadTimers = useRef({});
+
+  const scheduleReload = useCallback((key) => {
+    if (reloadTimers.current[key]) return;
+    reloadTimers.current[key] = setTimeout(() => {
+      reloadTimers.current[key] = null;
+      latest.current[key]();
+    }, LIVE_RELOAD_DELAY_MS);
+  }, []);
+
+  useEffect(() => {
+    const unsubscribe = eventsService.subscribe({ scope: 'opc' }, {
+      onStatus: (connected) => { liveConnected.current = connected; },
+      onResync: () => {
+        scheduleReload('fetchLeads');
+        scheduleReload('fetchMetrics');
+      },
+      onChange: (change) => {
+        if (change.entidad !== 'lead') return;
+        const ids = change.ids || [change.id];
+        const enPagina = latest.current.leads.some((lead) => ids.includes(lead.id));
+        if (change.operacion !== 'actualizar' || enPagina) {
+          scheduleReload('fetchLeads');
+        }
+        if (!change.campos || change.campos.some((campo) => METRICS_FIELDS.includes(campo))) {
+          scheduleReload('fetchMetrics');
+        }
+      },
+    });
+    const timers = reloadTimers.current;
+    return () => {
+      unsubscribe();
+      Object.values(timers).forEach((timer) => timer && clearTimeout(timer));
+    };
+  }, [scheduleReload]);
 
   const handleOpenNewLeadModal = () => {
     setEditingLeadId(null);
@@ -177,8 +204,11 @@ function OPCLeadsPage() {
   };
 
   const handleLeadSaveSuccess = () => {
-    fetchLeads(); // Recargar la lista después de guardar
-    fetchMetrics(); // Recargar métricas
+    // Con eventos en vivo la recarga llega con el propio cambio
+    if (!liveConnected.current) {
+      fetchLeads(); // Recargar la lista después de guardar
+      fetchMetrics(); // Recargar métricas
+    }
     handleCloseLeadFormModal();
   };
 
@@ -187,13 +217,13 @@ function OPCLeadsPage() {
     setPage(0);
   };
 
-  const handleFilterPersonalOPCChange = (event) => {
-    setFilterPersonalOPC(event.target.value);
+  const handleFilterPersonalOPCChange = (id) => {
+    setFilterPersonalOPC(id);
     setPage(0);
   };
 
-  const handleFilterSupervisorOPCChange = (event) => {
-    setFilterSupervisorOPC(event.target.value);
+  const handleFilterSupervisorOPCChange = (id) => {
+    setFilterSupervisorOPC(id);
     setPage(0);
   };
 
@@ -229,8 +259,10 @@ function OPCLeadsPage() {
     if (window.confirm('¿Estás seguro de que quieres eliminar este lead OPC?')) {
       try {
         await leadsService.deleteLead(id);
-        fetchLeads();
-        fetchMetrics();
+        if (!liveConnected.current) {
+          fetchLeads();
+          fetchMetrics();
+        }
       } catch (err) {
         setError('Error al eliminar el lead OPC.');
         console.error('Error deleting OPC lead:', err);
@@ -337,38 +369,22 @@ function OPCLeadsPage() {
             />
           </Grid>
           <Grid item xs={12} sm={6} md={2}>
-            <FormControl fullWidth>
-              <InputLabel>Personal OPC</InputLabel>
-              <Select
-                value={filterPersonalOPC}
-                onChange={handleFilterPersonalOPCChange}
-                label="Personal OPC"
-              >
-                <MenuItem value="">Todos</MenuItem>
-                {opcPersonnelList.map((personnel) => (
-                  <MenuItem key={personnel.id} value={personnel.id}>
-                    {personnel.nombre}
-                  </MenuItem>
-                ))}
-              </Select>
-            </FormControl>
+            {/* Búsqueda bajo demanda (/api/lookup/): no se precarga todo el personal */}
+            <LookupAutocomplete
+              entity="opc-personnel"
+              label="Personal OPC"
+              value={filterPersonalOPC}
+              onChange={handleFilterPersonalOPCChange}
+            />
           </Grid>
           <Grid item xs={12} sm={6} md={2}>
-            <FormControl fullWidth>
-              <InputLabel>Supervisor OPC</InputLabel>
-              <Select
-                value={filterSupervisorOPC}
-                onChange={handleFilterSupervisorOPCChange}
-                label="Supervisor OPC"
-              >
-                <MenuItem value="">Todos</MenuItem>
-                {opcSupervisorsList.map((supervisor) => (
-                  <MenuItem key={supervisor.id} value={supervisor.id}>
-                    {supervisor.nombre}
-                  </MenuItem>
-                ))}
-              </Select>
-            </FormControl>
+            <LookupAutocomplete
+              entity="opc-personnel"
+              rol="SUPERVISOR"
+              label="Supervisor OPC"
+              value={filterSupervisorOPC}
+              onChange={handleFilterSupervisorOPCChange}
+            />
           </Grid>
           <Grid item xs={12} sm={6} md={2}>
             <TextField
@@ -59,10 +59,11 @@ const appointmentsService = {
 
   // NUEVO MÉTODO: Obtener historial de acciones de una cita (y su lead)
   // Llama al endpoint personalizado que creamos en AppointmentViewSet
-  getAppointmentActions: async (appointmentId) => {
+  // Paginado por cursor: para la página siguiente se pasa la URL 'next' de la respuesta anterior
+  getAppointmentActions: async (appointmentId, nextUrl = null) => {
     try {
-      const response = await apiClient.get(`/appointments/${appointmentId}/actions/`);
-      return response.data; // El backend ya devuelve una lista combinada y ordenada
+      const response = await apiClient.get(nextUrl || `/appointments/${appointmentId}/actions/`);
+      return response.data; // { next, previous, results } con las acciones de la cita y del lead, sin repetir
     } catch (error) {
       console.error(`Error fetching actions for appointment ID ${appointmentId}:`, error);
       throw error;
@@ -17,9 +17,16 @@ const login = async (username, password) => {
 };
 
 const logout = () => {
+  const accessToken = localStorage.getItem('access_token');
+  const refreshToken = localStorage.getItem('refresh_token');
   localStorage.removeItem('access_token');
   localStorage.removeItem('refresh_token');
-  // Opcional: invalidar token en el backend si tu JWT blacklisting lo soporta
+  // Revocar los tokens en el backend (la autenticación ya no lee el usuario en cada petición)
+  if (accessToken) {
+    axios.post(`${apiClient.defaults.baseURL}/token/revoke/`, { refresh: refreshToken }, {
+      headers: { Authorization: `Bearer ${accessToken}` },
+    }).catch(() => {});
+  }
 };
 
 // Puedes añadir una función para decodificar el token JWT si necesitas los datos del usuario en el frontend
@@ -32,6 +39,8 @@ const getUserFromToken = () => {
       return {
         id: payload.user_id, // Asume que user_id está en el payload
         username: payload.username, // Asume que username está en el payload
+        rol: payload.rol,
+        opc_profile_id: payload.opc_profile_id,
         // Otros datos que hayas configurado en tu token de Django
       };
     } catch (e) {
@@ -0,0 +1,29 @@
+// frontend/crm_frontend/src/services/events.js
+import { API_BASE_URL } from '../utils/constants';
+
+const eventsService = {
+  // Suscripción a los eventos en vivo de leads y citas (Server-Sent Events).
+  // options: { scope: 'opc', asesor: 'me' | id }. Devuelve una función que cierra la conexión.
+  // Sin is_staff el backend limita la suscripción a los leads y citas del propio usuario.
+  // onStatus(true/false) indica si hay conexión: sin servidor ASGI el backend responde 501
+  // y la página debe seguir recargando por su cuenta.
+  subscribe: (options = {}, { onChange, onResync, onStatus } = {}) => {
+    const token = localStorage.getItem('access_token');
+    if (!token || typeof EventSource === 'undefined') {
+      onStatus?.(false);
+      return () => {};
+    }
+    const params = new URLSearchParams({ token });
+    if (options.scope) params.set('scope', options.scope);
+    if (options.asesor) params.set('asesor', options.asesor);
+
+    const source = new EventSource(`${API_BASE_URL}/events/?${params.toString()}`);
+    source.onopen = () => onStatus?.(true);
+    source.onerror = () => onStatus?.(false);
+    source.addEventListener('cambio', (event) => onChange?.(JSON.parse(event.data)));
+    source.addEventListener('resync', () => onResync?.());
+    return () => source.close();
+  },
+};
+
+export default eventsService;
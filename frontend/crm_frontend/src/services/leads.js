@@ -57,10 +57,22 @@ const leadsService = {
     }
   },
 
-  // Obtener historial de acciones de un lead
-  getLeadActions: async (leadId) => {
+  // Detalle completo en una sola petición: { lead, actions: { next, results }, appointments, duplicates }
+  getLeadFull: async (id) => {
     try {
-      const response = await apiClient.get(`/leads/${leadId}/actions/`); // Endpoint personalizado en el backend
+      const response = await apiClient.get(`/leads/${id}/full/`);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching full detail for lead ID ${id}:`, error);
+      throw error;
+    }
+  },
+
+  // Obtener historial de acciones de un lead, paginado por cursor ({ next, previous, results }).
+  // Para la página siguiente se pasa la URL 'next' de la respuesta anterior.
+  getLeadActions: async (leadId, nextUrl = null) => {
+    try {
+      const response = await apiClient.get(nextUrl || `/leads/${leadId}/actions/`); // Endpoint personalizado en el backend
       return response.data;
     } catch (error) {
       console.error(`Error fetching actions for lead ID ${leadId}:`, error);
@@ -82,6 +94,49 @@ const leadsService = {
     }
   },
 
+  // Exportar los leads filtrados (mismos filtros del listado) y descargar el archivo
+  exportLeads: async (filters, formato = 'csv') => {
+    try {
+      const response = await apiClient.get('/leads/export/', {
+        params: { ...filters, formato },
+        responseType: 'blob',
+      });
+      const url = window.URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `leads.${formato}`;
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Error exporting leads:', error);
+      throw error;
+    }
+  },
+
+  // Cola de llamadas: reserva el siguiente lead a llamar ({ lead, prioridad, reservado_hasta })
+  claimNextLead: async () => {
+    try {
+      const response = await apiClient.post('/work-queue/next/');
+      return response.data;
+    } catch (error) {
+      console.error('Error claiming next lead from work queue:', error);
+      throw error;
+    }
+  },
+
+  // Cola de llamadas: devolver el lead reservado sin tipificarlo
+  releaseClaimedLead: async () => {
+    try {
+      const response = await apiClient.post('/work-queue/release/');
+      return response.data;
+    } catch (error) {
+      console.error('Error releasing claimed lead:', error);
+      throw error;
+    }
+  },
+
   // Obtener la lista de usuarios (asesores) para los selectores
   getUsers: async (params) => {
     try {
@@ -137,6 +192,18 @@ const leadsService = {
     }
   },
 
+  // Operación masiva sobre todos los leads que cumplen los filtros del listado
+  // payload: { operacion, valor, preview?, todos? }
+  bulkOperation: async (filters, payload) => {
+    try {
+      const response = await apiClient.post('/leads/bulk/', payload, { params: filters });
+      return response.data;
+    } catch (error) {
+      console.error('Error applying bulk operation to leads:', error);
+      throw error;
+    }
+  },
+
   // Obtener operadores (usuarios con rol operador)
   getOperators: async (params) => {
     try {
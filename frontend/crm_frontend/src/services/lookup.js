@@ -0,0 +1,18 @@
+// frontend/crm_frontend/src/services/lookup.js
+import apiClient from './api';
+
+// Búsqueda ligera para selectores (/api/lookup/<entity>/): solo id y etiqueta
+const lookupService = {
+  // entity: 'leads' | 'users' | 'opc-personnel'; params: q, ids, rol, limit
+  search: async (entity, params = {}) => {
+    try {
+      const response = await apiClient.get(`/lookup/${entity}/`, { params });
+      return response.data.results || [];
+    } catch (error) {
+      console.error(`Error searching ${entity}:`, error);
+      throw error;
+    }
+  },
+};
+
+export default lookupService;